@@ -3,6 +3,7 @@
 from typing import List, Optional, Dict, Any, Type, Tuple
 from abc import ABC, abstractmethod
 from datetime import datetime
+import asyncio
 import uuid
 import re
 import logging
@@ -11,6 +12,7 @@ from langchain_openai import ChatOpenAI
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 from langchain_core.messages import SystemMessage, HumanMessage, AIMessage, BaseMessage
 from langchain_core.output_parsers import StrOutputParser
+from langchain_core.callbacks import AsyncCallbackHandler
 from langchain_classic.agents import AgentExecutor, create_openai_tools_agent
 
 from states.agent_state import (
@@ -24,16 +26,27 @@ from memory.short_term import ShortTermMemory
 from memory.long_term import LongTermMemory
 from rag.retriever import RetrieveReflectRetryRAG
 from rag.vector_store import VectorStore
-from tools.web_search import ResearchToolkit
+from tools.web_search import get_research_toolkit
 from config.settings import settings
 from config.logging_config import setup_logging
 from config.logging_config import setup_logging
 from prompts.agent_prompts import get_base_agent_system_prompt
-from agents.llm import DeepSeekChatOpenAI
+from agents.llm import get_llm
 
 # Initialize logger
 logger = logging.getLogger(__name__)
 
+
+class _ToolOutputRecorder(AsyncCallbackHandler):
+    """Collects tool outputs as they arrive so a timed-out run can still report them."""
+    
+    def __init__(self, outputs: List[str]):
+        self.outputs = outputs
+    
+    async def on_tool_end(self, output: Any, **kwargs: Any) -> None:
+        self.outputs.append(str(getattr(output, "content", output)))
+
+
 class BaseResearchAgent(ABC):
     """
     Base class for all research agents.
@@ -50,6 +63,7 @@ class BaseResearchAgent(ABC):
     FIELD: str = "general"
     DISPLAY_NAME: str = "Research Agent"
     AGENT_TYPE: str = "domain"  # or "support"
+    LLM_CALL_SITE: Optional[str] = None  # defaults to "<AGENT_TYPE>_agent"; see settings.llm_model_tiers
     
     def __init__(
         self,
@@ -77,23 +91,14 @@ class BaseResearchAgent(ABC):
         
         logger.info(f"Initializing {self.DISPLAY_NAME} ({self.agent_id})")
         
-        # Initialize LLM
-        if llm:
-            self._llm = llm
-        else:
-            llm_kwargs = {
-                "model": settings.openai_model,
-                "temperature": 0.7,
-                "openai_api_key": settings.openai_api_key
-            }
-            if settings.openai_base_url:
-                llm_kwargs["openai_api_base"] = settings.openai_base_url
-            
-            # Use custom class to handle DeepSeek reasoning
-            self._llm = DeepSeekChatOpenAI(**llm_kwargs)
+        # Initialize LLM (shared client that handles DeepSeek reasoning)
+        self._llm = llm or get_llm(
+            temperature=0.7,
+            call_site=self.LLM_CALL_SITE or f"{self.AGENT_TYPE}_agent"
+        )
         
         # Initialize tools
-        self._toolkit = ResearchToolkit()
+        self._toolkit = get_research_toolkit()
         self._tools = tools or self._get_default_tools()
         
         # Initialize memory
@@ -131,11 +136,17 @@ class BaseResearchAgent(ABC):
         self._agent_executor = self._build_agent_executor()
     
     def _seed_rag_if_needed(self):
-        """Seed RAG with foundational papers if enabled."""
+        """
+        Seed RAG with foundational papers if enabled.
+        
+        Seeding runs in the background by default, so the agent is usable
+        immediately and searches whatever is already indexed.
+        """
         if settings.rag_seed_enabled and self.AGENT_TYPE == "domain":
             try:
-                from rag.seed_rag import seed_rag_if_empty
-                seed_rag_if_empty(
+                from rag.seed_rag import seed_rag_if_empty, start_background_seeding
+                seed = start_background_seeding if settings.rag_seed_background else seed_rag_if_empty
+                seed(
                     self._vector_store, 
                     self.FIELD, 
                     num_papers=settings.rag_seed_papers_per_field
@@ -166,57 +177,86 @@ class BaseResearchAgent(ABC):
             max_iterations=5
         )
 
-    async def research(self, query: ResearchQuery) -> ResearchResult:
+    async def research(self, query: ResearchQuery, timeout: Optional[float] = None) -> ResearchResult:
         """
         Conduct research on a query.
+        
+        The run is cancelled once the deadline passes (aborting in-flight LLM
+        and HTTP calls) and a degraded result is built from whatever was
+        gathered so far.
+        
+        Args:
+            query: Research query
+            timeout: Deadline in seconds (defaults to settings.agent_timeout)
         """
         logger.info(f"Starting research for query: {query.query}")
         self._state.update_status(AgentStatus.RESEARCHING, query.query)
         
+        timeout = timeout if timeout is not None else settings.agent_timeout
+        progress: Dict[str, Any] = {"papers": [], "tool_outputs": []}
+        
         try:
-            # 1. Retrieve Context
-            context, existing_papers, rag_confidence = await self._retrieve_context(query)
-            
-            # 2. Execute Agent
-            output, result = await self._execute_agent(query, context)
-            
-            # 3. Process Results (Extract papers, insights)
-            papers = self._process_papers(existing_papers, result, output)
-            
-            # 4. Update Memory
-            self._update_memory(query, output, papers, rag_confidence)
-            
-            # 5. Build Result
-            research_result = self._build_research_result(query, output, papers, rag_confidence)
-            
-            logger.info(f"Research completed. Found {len(papers)} papers. Confidence: {research_result.confidence_score:.2f}")
+            research_result = await asyncio.wait_for(self._run_research(query, progress), timeout=timeout)
+            logger.info(f"Research completed. Found {len(research_result.papers)} papers. Confidence: {research_result.confidence_score:.2f}")
             return research_result
-            
+        
+        except asyncio.TimeoutError:
+            logger.warning(f"{self.agent_id} timed out after {timeout:g}s; returning partial result")
+            return self._create_partial_result(query, progress, f"timed out after {timeout:g}s")
+        
         except Exception as e:
             logger.error(f"Error during research: {e}", exc_info=True)
             self._state.update_status(AgentStatus.ERROR)
             return self._create_error_result(query, str(e))
+    
+    async def _run_research(self, query: ResearchQuery, progress: Dict[str, Any]) -> ResearchResult:
+        """Run the research steps, recording partial progress as it goes."""
+        # 1. Retrieve Context
+        context, existing_papers, rag_confidence = await self._retrieve_context(query)
+        progress["papers"] = existing_papers
+        
+        # 2. Execute Agent
+        output, result = await self._execute_agent(query, context, progress["tool_outputs"])
+        
+        # 3. Process Results (Extract papers, insights); embedding new papers
+        # into the RAG store runs in the executor so other agents keep going
+        papers = await asyncio.to_thread(self._process_papers, existing_papers, result, output)
+        
+        # 4. Update Memory
+        self._update_memory(query, output, papers, rag_confidence)
+        
+        # 5. Build Result
+        return self._build_research_result(query, output, papers, rag_confidence)
 
     async def _retrieve_context(self, query: ResearchQuery) -> Tuple[str, List[Paper], float]:
-        """Retrieve relevant context from RAG."""
-        # Note: RAG retrieval is currently synchronous in the original code, 
-        # but we wrap it here for future async support
-        context, existing_papers, rag_confidence = self._rag.get_context_for_query(
-            query.query
+        """Retrieve relevant context from RAG without blocking other agents."""
+        variants = self.get_specialized_queries(query.query) if settings.rag_multi_query_enabled else None
+        context, existing_papers, rag_confidence = await self._rag.aget_context_for_query(
+            query.query,
+            query_variants=variants
         )
         return context, existing_papers, rag_confidence
 
-    async def _execute_agent(self, query: ResearchQuery, context: str) -> Tuple[str, Dict[str, Any]]:
-        """Execute the LangChain agent."""
+    async def _execute_agent(
+        self,
+        query: ResearchQuery,
+        context: str,
+        tool_outputs: Optional[List[str]] = None
+    ) -> Tuple[str, Dict[str, Any]]:
+        """Execute the LangChain agent, appending each tool output to tool_outputs."""
         chat_history = self._short_term.get_langchain_messages(limit=5)
         enhanced_input = self._build_research_input(query, context)
         
         self._state.update_status(AgentStatus.REFLECTING)
         
-        result = await self._agent_executor.ainvoke({
-            "input": enhanced_input,
-            "chat_history": chat_history
-        })
+        callbacks = [_ToolOutputRecorder(tool_outputs)] if tool_outputs is not None else []
+        result = await self._agent_executor.ainvoke(
+            {
+                "input": enhanced_input,
+                "chat_history": chat_history
+            },
+            config={"callbacks": callbacks}
+        )
         
         output = result.get("output", "")
         return output, result
@@ -290,6 +330,35 @@ class BaseResearchAgent(ABC):
             summary=f"Error during research: {error_summary}",
             confidence_score=0.0
         )
+    
+    def _create_partial_result(self, query: ResearchQuery, progress: Dict[str, Any], reason: str) -> ResearchResult:
+        """Create a degraded ResearchResult from the papers gathered before a deadline."""
+        papers = list(progress.get("papers", []))
+        seen_ids = {p.id for p in papers}
+        for output in progress.get("tool_outputs", []):
+            for paper in self._parse_papers_from_text(output):
+                if paper.id not in seen_ids:
+                    papers.append(paper)
+                    seen_ids.add(paper.id)
+        
+        self._state.update_status(AgentStatus.RESPONDING)
+        self._state.retrieved_papers = papers
+        
+        return ResearchResult(
+            agent_id=self.agent_id,
+            agent_field=self.FIELD,
+            query=query.query,
+            summary=(
+                f"Research incomplete ({reason}). "
+                f"{len(papers)} paper(s) were gathered before the deadline and are listed below."
+            ),
+            papers=papers,
+            confidence_score=min(self._calculate_confidence("", papers), 0.3),
+            sources_used=query.sources_required,
+            reflection_notes=self._state.reflection_notes,
+            degraded=True,
+            degraded_reason=reason
+        )
 
     def research_sync(self, query: ResearchQuery) -> ResearchResult:
         """Synchronous version of research."""
@@ -420,6 +489,10 @@ class BaseResearchAgent(ABC):
             
         return min(max(confidence, 0.0), 1.0)
     
+    def get_specialized_queries(self, base_query: str) -> List[str]:
+        """Query variants searched together during RAG retrieval (domain agents add field-specific ones)."""
+        return [base_query]
+    
     def add_papers_to_rag(self, papers: List[Paper]):
         self._rag.add_papers(papers)
     
@@ -433,5 +506,20 @@ class BaseResearchAgent(ABC):
     def get_memory_stats(self) -> Dict[str, Any]:
         return {
             "short_term": {"size": self._short_term.size},
-            "rag": {"documents": self._vector_store.count}
+            "rag": {
+                "documents": self._vector_store.count,
+                "seeding": self._seeding_progress(),
+                "retrieval": self._rag.get_stats(),
+                "search_cache": self._search_cache_stats()
+            }
         }
+    
+    @staticmethod
+    def _search_cache_stats() -> Dict[str, Any]:
+        from rag.search_cache import get_search_cache
+        cache = get_search_cache()
+        return cache.stats() if cache is not None else {}
+    
+    def _seeding_progress(self) -> Dict[str, Any]:
+        from rag.seed_rag import get_seeding_progress
+        return get_seeding_progress(self.FIELD)
@@ -0,0 +1,223 @@
+"""Hedged LLM requests: race a duplicate call when the first one stalls.
+
+Each call site keeps two latency histories. Streams record time to the
+first chunk and are hedged on it. Non-streaming calls have no first token,
+so they record and are hedged on their completion latency. Mixing the two
+would inflate the streaming delay until hedges never fire.
+"""
+
+from typing import Any, AsyncIterator, Awaitable, Callable, Deque, Dict, Optional
+from collections import deque
+import asyncio
+import logging
+import threading
+import time
+
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+# Number of recent latencies kept per call site and kind
+LATENCY_WINDOW = 200
+
+# Latency kinds: time to the first streamed chunk, and time to a full response
+FIRST_TOKEN = "first_token"
+COMPLETION = "completion"
+
+
+class _CallSiteStats:
+    """Latency history and hedge counters for one call site."""
+    
+    def __init__(self):
+        self.latencies: Dict[str, Deque[float]] = {
+            FIRST_TOKEN: deque(maxlen=LATENCY_WINDOW),
+            COMPLETION: deque(maxlen=LATENCY_WINDOW),
+        }
+        self.calls = 0
+        self.hedges_fired = 0
+        self.hedges_won = 0
+
+
+_stats: Dict[str, _CallSiteStats] = {}
+_stats_lock = threading.Lock()
+
+
+def _site(call_site: str) -> _CallSiteStats:
+    with _stats_lock:
+        if call_site not in _stats:
+            _stats[call_site] = _CallSiteStats()
+        return _stats[call_site]
+
+
+def hedge_delay(call_site: str, kind: str = FIRST_TOKEN) -> float:
+    """
+    Delay before a duplicate request is fired for a call site.
+    
+    Uses the settings.llm_hedge_percentile of the call site's recent
+    latencies of the given kind (FIRST_TOKEN for streams, COMPLETION for
+    non-streaming calls) once settings.llm_hedge_min_samples have been
+    observed, and settings.llm_hedge_initial_delay before that. Never below
+    settings.llm_hedge_min_delay.
+    """
+    stats = _site(call_site)
+    with _stats_lock:
+        samples = sorted(stats.latencies[kind])
+    
+    if len(samples) < settings.llm_hedge_min_samples:
+        delay = settings.llm_hedge_initial_delay
+    else:
+        index = min(len(samples) - 1, int(len(samples) * settings.llm_hedge_percentile / 100))
+        delay = samples[index]
+    return max(delay, settings.llm_hedge_min_delay)
+
+
+def _record(call_site: str, kind: str, latency: Optional[float] = None, fired: bool = False, won: bool = False):
+    stats = _site(call_site)
+    with _stats_lock:
+        stats.calls += 1
+        if latency is not None:
+            stats.latencies[kind].append(latency)
+        if fired:
+            stats.hedges_fired += 1
+        if won:
+            stats.hedges_won += 1
+
+
+async def _settle(tasks: set) -> Any:
+    """Return the first successful task result, cancelling the rest; raise if all fail."""
+    error = None
+    pending = set(tasks)
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    return task
+                error = task.exception()
+        raise error
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+async def hedged_call(call_site: str, make_call: Callable[[], Awaitable[Any]]) -> Any:
+    """
+    Run make_call(), firing a duplicate if it has not finished within the hedge delay.
+    
+    The first successful result wins and the other call is cancelled. The
+    hedge delay comes from the call site's completion latencies.
+    
+    Args:
+        call_site: Call site name (keys latency history and counters)
+        make_call: Factory returning a fresh awaitable for each attempt
+    """
+    delay = hedge_delay(call_site, COMPLETION)
+    started = time.perf_counter()
+    primary = asyncio.ensure_future(make_call())
+    
+    try:
+        done, _ = await asyncio.wait({primary}, timeout=delay)
+        if done:
+            result = primary.result()
+            _record(call_site, COMPLETION, latency=time.perf_counter() - started)
+            return result
+        
+        logger.info(f"Hedging {call_site} LLM call after {delay:.2f}s")
+        hedge_started = time.perf_counter()
+        backup = asyncio.ensure_future(make_call())
+        winner = await _settle({primary, backup})
+        won = winner is backup
+        latency = time.perf_counter() - (hedge_started if won else started)
+        _record(call_site, COMPLETION, latency=latency, fired=True, won=won)
+        return winner.result()
+    except BaseException:
+        primary.cancel()
+        raise
+
+
+async def hedged_stream(
+    call_site: str,
+    make_stream: Callable[[], AsyncIterator[Any]]
+) -> AsyncIterator[Any]:
+    """
+    Stream from make_stream(), racing a duplicate stream if the first chunk is late.
+    
+    Whichever stream yields its first chunk first is kept; the other is
+    closed, which aborts its HTTP request. The hedge delay comes from the
+    call site's first-chunk latencies.
+    
+    Args:
+        call_site: Call site name (keys latency history and counters)
+        make_stream: Factory returning a fresh async iterator for each attempt
+    """
+    delay = hedge_delay(call_site, FIRST_TOKEN)
+    started = time.perf_counter()
+    streams = {}
+    
+    primary = make_stream()
+    first = asyncio.ensure_future(primary.__anext__())
+    streams[first] = primary
+    
+    try:
+        done, _ = await asyncio.wait({first}, timeout=delay)
+        fired = not done
+        if done:
+            winner = first
+        else:
+            logger.info(f"Hedging {call_site} LLM stream after {delay:.2f}s without a first token")
+            hedge_started = time.perf_counter()
+            backup = make_stream()
+            second = asyncio.ensure_future(backup.__anext__())
+            streams[second] = backup
+            winner = await _settle({first, second})
+        
+        won = fired and streams[winner] is not primary
+        latency = time.perf_counter() - (hedge_started if won else started)
+        _record(call_site, FIRST_TOKEN, latency=latency, fired=fired, won=won)
+        # Take the winner out of the streams closed below only once it produced a chunk
+        first_chunk = winner.result()
+        stream = streams.pop(winner)
+    except StopAsyncIteration:
+        return
+    finally:
+        for task, loser in streams.items():
+            if task.done() and not task.cancelled():
+                task.exception()
+            else:
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+            await loser.aclose()
+    
+    try:
+        yield first_chunk
+        async for chunk in stream:
+            yield chunk
+    finally:
+        await stream.aclose()
+
+
+def get_hedging_stats() -> Dict[str, Dict[str, Any]]:
+    """Get per-call-site hedge counters, sample counts and hedge delays per latency kind."""
+    with _stats_lock:
+        sites = list(_stats.keys())
+    
+    report = {}
+    for call_site in sites:
+        stats = _site(call_site)
+        with _stats_lock:
+            report[call_site] = {
+                "calls": stats.calls,
+                "hedges_fired": stats.hedges_fired,
+                "hedges_won": stats.hedges_won,
+                "samples": {kind: len(latencies) for kind, latencies in stats.latencies.items()},
+            }
+        report[call_site]["hedge_delay_seconds"] = {
+            kind: hedge_delay(call_site, kind) for kind in (FIRST_TOKEN, COMPLETION)
+        }
+    return report
+
+
+def reset_hedging_stats():
+    """Clear latency history and counters."""
+    with _stats_lock:
+        _stats.clear()
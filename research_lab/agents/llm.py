@@ -1,32 +1,276 @@
-"""Custom LLM wrappers."""
+"""Custom LLM wrappers and the shared LLM client registry."""
 
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple, Iterator, AsyncIterator
+from contextlib import nullcontext
+import asyncio
+import fnmatch
+import itertools
+import threading
+import time
+import weakref
+
+import httpx
 from langchain_openai import ChatOpenAI
-from langchain_core.messages import BaseMessage, AIMessage, AIMessageChunk
-from langchain_core.outputs import ChatGenerationChunk
+from langchain_core.messages import BaseMessage, AIMessage
+from langchain_core.outputs import ChatGenerationChunk, ChatResult
+
+from .llm_cache import SQLiteLLMCache
+from .llm_logging import log_llm_call, should_sample
+from .hedging import get_hedging_stats, hedged_call, hedged_stream
+from .rate_limiter import (
+    LLM_PRIORITY_NORMAL, get_rate_limiter, get_rate_limiter_stats, reset_rate_limiters
+)
+
+
+def _prompt_tokens(messages: List[BaseMessage]) -> int:
+    """Rough prompt token count (about 4 characters per token)."""
+    return sum(len(str(m.content)) for m in messages) // 4 + 1
+
+
+def _estimate_tokens(messages: List[BaseMessage], max_tokens: Optional[int]) -> int:
+    """
+    Tokens reserved in the rate limiter before a call.
+    
+    max_tokens is a ceiling, not a typical completion, so the reservation is
+    the prompt plus settings.llm_completion_token_estimate (capped by
+    max_tokens); it is reconciled with the actual usage after the call.
+    """
+    from config.settings import settings
+    
+    completion = settings.llm_completion_token_estimate
+    if max_tokens:
+        completion = min(completion, max_tokens)
+    return _prompt_tokens(messages) + completion
+
+
+def _usage_from_result(result: ChatResult) -> Optional[int]:
+    usage = (result.llm_output or {}).get("token_usage") or {}
+    return usage.get("total_tokens")
+
+
+def _usage_from_chunk(chunk: ChatGenerationChunk) -> Optional[int]:
+    usage = getattr(chunk.message, "usage_metadata", None)
+    return usage.get("total_tokens") if usage else None
+
+
+def _settle_usage(ticket, messages: List[BaseMessage], output_chars: int):
+    """Estimate usage from the text when the provider reported none, so the reservation is still reconciled."""
+    if ticket is not None and ticket.actual_tokens is None:
+        ticket.actual_tokens = _prompt_tokens(messages) + output_chars // 4 + 1
+
+
+def _first_attempt_governed(make_attempt):
+    """
+    Attempt factory for hedging where only the first attempt is rate limited.
+    
+    A hedged duplicate bypasses the limiter instead of taking a second slot
+    and token reservation: the original call's reservation covers it (if
+    the original is cancelled, its estimate is kept rather than refunded).
+    """
+    attempts = itertools.count()
+    return lambda: make_attempt(next(attempts) > 0)
+
 
 class DeepSeekChatOpenAI(ChatOpenAI):
     """Custom ChatOpenAI that handles DeepSeek's reasoning_content field."""
     
+    rate_limit_priority: int = LLM_PRIORITY_NORMAL
+    """Queue priority in the process-wide LLM rate limiter (higher is served first)."""
+    
+    call_site: Optional[str] = None
+    """Logical call site (router, synthesis, ...) this client was configured for."""
+    
+    hedge: bool = False
+    """Race a duplicate async request when the first one stalls (see agents.hedging)."""
+    
+    def _slot(self, messages: List[BaseMessage]):
+        limiter = get_rate_limiter(self.model_name, self.openai_api_base)
+        if limiter is None:
+            return nullcontext()
+        return limiter.slot(_estimate_tokens(messages, self.max_tokens), self.rate_limit_priority)
+    
+    def _aslot(self, messages: List[BaseMessage], duplicate: bool = False):
+        limiter = get_rate_limiter(self.model_name, self.openai_api_base)
+        if limiter is None or duplicate:
+            return nullcontext()
+        return limiter.aslot(_estimate_tokens(messages, self.max_tokens), self.rate_limit_priority)
+    
+    def _log_result(
+        self,
+        messages: List[BaseMessage],
+        started: float,
+        sampled: bool,
+        message: BaseMessage,
+        llm_output: Optional[Dict[str, Any]] = None
+    ):
+        if not sampled:
+            return
+        usage = (llm_output or {}).get("token_usage") or getattr(message, "usage_metadata", None)
+        log_llm_call(
+            self.model_name,
+            messages,
+            time.perf_counter() - started,
+            sampled,
+            output=str(message.content),
+            reasoning=message.additional_kwargs.get("reasoning_content"),
+            usage=usage,
+            call_site=self.call_site
+        )
+    
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Any = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        # Streaming generation is delegated to _stream, which governs and logs the call itself
+        if self.streaming:
+            return super()._generate(messages, stop=stop, run_manager=run_manager, **kwargs)
+        
+        sampled, started = should_sample(), time.perf_counter()
+        try:
+            with self._slot(messages) as ticket:
+                result = super()._generate(messages, stop=stop, run_manager=run_manager, **kwargs)
+                if ticket is not None:
+                    ticket.actual_tokens = _usage_from_result(result)
+                    _settle_usage(ticket, messages, len(result.generations[0].text))
+        except Exception as e:
+            log_llm_call(self.model_name, messages, time.perf_counter() - started, sampled, error=e, call_site=self.call_site)
+            raise
+        
+        self._log_result(messages, started, sampled, result.generations[0].message, result.llm_output)
+        return result
+    
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Any = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        if self.streaming:
+            return await super()._agenerate(messages, stop=stop, run_manager=run_manager, **kwargs)
+        if self.hedge and self.call_site:
+            return await hedged_call(
+                self.call_site,
+                _first_attempt_governed(
+                    lambda duplicate: self._agenerate_once(
+                        messages, stop=stop, run_manager=run_manager, duplicate=duplicate, **kwargs
+                    )
+                )
+            )
+        return await self._agenerate_once(messages, stop=stop, run_manager=run_manager, **kwargs)
+    
+    async def _agenerate_once(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Any = None,
+        duplicate: bool = False,
+        **kwargs: Any,
+    ) -> ChatResult:
+        sampled, started = should_sample(), time.perf_counter()
+        try:
+            async with self._aslot(messages, duplicate) as ticket:
+                result = await super()._agenerate(messages, stop=stop, run_manager=run_manager, **kwargs)
+                if ticket is not None:
+                    ticket.actual_tokens = _usage_from_result(result)
+                    _settle_usage(ticket, messages, len(result.generations[0].text))
+        except Exception as e:
+            log_llm_call(self.model_name, messages, time.perf_counter() - started, sampled, error=e, call_site=self.call_site)
+            raise
+        
+        self._log_result(messages, started, sampled, result.generations[0].message, result.llm_output)
+        return result
+    
+    def _stream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Any = None,
+        **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        sampled, started = should_sample(), time.perf_counter()
+        merged = None
+        output_chars = 0
+        try:
+            with self._slot(messages) as ticket:
+                for chunk in super()._stream(messages, stop=stop, run_manager=run_manager, **kwargs):
+                    if ticket is not None:
+                        ticket.actual_tokens = _usage_from_chunk(chunk) or ticket.actual_tokens
+                    output_chars += len(chunk.text)
+                    if sampled:
+                        merged = chunk if merged is None else merged + chunk
+                    yield chunk
+                _settle_usage(ticket, messages, output_chars)
+        except Exception as e:
+            log_llm_call(self.model_name, messages, time.perf_counter() - started, sampled, error=e, call_site=self.call_site)
+            raise
+        
+        if merged is not None:
+            self._log_result(messages, started, sampled, merged.message)
+    
+    async def _astream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Any = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        if self.hedge and self.call_site:
+            # Token callbacks for the winning stream are emitted by the caller, so
+            # the duplicate streams run without the run manager
+            stream = hedged_stream(
+                self.call_site,
+                _first_attempt_governed(
+                    lambda duplicate: self._astream_once(
+                        messages, stop=stop, run_manager=None, duplicate=duplicate, **kwargs
+                    )
+                )
+            )
+        else:
+            stream = self._astream_once(messages, stop=stop, run_manager=run_manager, **kwargs)
+        async for chunk in stream:
+            yield chunk
+    
+    async def _astream_once(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Any = None,
+        duplicate: bool = False,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        sampled, started = should_sample(), time.perf_counter()
+        merged = None
+        output_chars = 0
+        try:
+            async with self._aslot(messages, duplicate) as ticket:
+                async for chunk in super()._astream(messages, stop=stop, run_manager=run_manager, **kwargs):
+                    if ticket is not None:
+                        ticket.actual_tokens = _usage_from_chunk(chunk) or ticket.actual_tokens
+                    output_chars += len(chunk.text)
+                    if sampled:
+                        merged = chunk if merged is None else merged + chunk
+                    yield chunk
+                _settle_usage(ticket, messages, output_chars)
+        except Exception as e:
+            log_llm_call(self.model_name, messages, time.perf_counter() - started, sampled, error=e, call_site=self.call_site)
+            raise
+        
+        if merged is not None:
+            self._log_result(messages, started, sampled, merged.message)
+    
     def _create_message_dicts(
         self, messages: List[BaseMessage], stop: Optional[List[str]]
     ) -> List[Dict[str, Any]]:
         dicts = super()._create_message_dicts(messages, stop)
-        
-        # Log the full prompt being sent
-        import logging
-        logger = logging.getLogger(__name__)
-        try:
-            import json
-            logger.debug(f"LLM REQUEST MESSAGES:\n{json.dumps(dicts, indent=2, ensure_ascii=False)}")
-        except:
-            pass
-            
         for d, m in zip(dicts, messages):
             if isinstance(m, AIMessage) and "reasoning_content" in m.additional_kwargs:
                 d["reasoning_content"] = m.additional_kwargs["reasoning_content"]
         return dicts
-
+    
     def _create_chat_result(self, response: Any, *args: Any, **kwargs: Any) -> Any:
         """Override to capture reasoning_content from the API response."""
         chat_result = super()._create_chat_result(response, *args, **kwargs)
@@ -37,7 +281,7 @@ class DeepSeekChatOpenAI(ChatOpenAI):
             choices = response.choices
         elif isinstance(response, dict) and "choices" in response:
             choices = response["choices"]
-            
+        
         for i, choice in enumerate(choices):
             reasoning = None
             # Check if choice is object or dict
@@ -53,39 +297,320 @@ class DeepSeekChatOpenAI(ChatOpenAI):
                 reasoning = message.get("reasoning_content")
             
             if reasoning and i < len(chat_result.generations):
-                # Add to additional_kwargs of the generated message
+                # Add to additional_kwargs of the generated message (logged by the call log)
                 chat_result.generations[i].message.additional_kwargs["reasoning_content"] = reasoning
-                
-                # Log reasoning for visibility
-                import logging
-                logger = logging.getLogger(__name__)
-                logger.info(f"\n{'='*40}\nAGENT REASONING:\n{reasoning}\n{'='*40}\n")
-                    
+        
         return chat_result
-
-    async def _astream(
+    
+    def _convert_chunk_to_generation_chunk(
         self,
-        messages: List[BaseMessage],
-        stop: Optional[List[str]] = None,
-        run_manager: Any = None,
-        **kwargs: Any,
-    ):
-        """Override _astream to force non-streaming and capture reasoning_content."""
-        # Fallback to _agenerate to use our patched _create_chat_result
-        # This effectively disables streaming but ensures we capture the reasoning_content
-        result = await self._agenerate(messages, stop=stop, run_manager=run_manager, **kwargs)
+        chunk: dict,
+        default_chunk_class: type,
+        base_generation_info: Optional[Dict[str, Any]],
+    ) -> Optional[ChatGenerationChunk]:
+        """Override to carry reasoning_content deltas through SSE streaming.
         
-        # Convert ChatResult to ChatGenerationChunk
-        for generation in result.generations:
-            # Create a chunk that looks like the full message
-            message_chunk = AIMessageChunk(
-                content=generation.message.content,
-                additional_kwargs=generation.message.additional_kwargs,
-                response_metadata=generation.message.response_metadata,
-                id=generation.message.id
-            )
-            
-            yield ChatGenerationChunk(
-                message=message_chunk,
-                generation_info=generation.generation_info
+        Each reasoning delta is attached to the chunk's additional_kwargs, so
+        merging the chunks concatenates the full reasoning_content while the
+        content tokens are yielded to callers as they arrive.
+        """
+        generation_chunk = super()._convert_chunk_to_generation_chunk(
+            chunk, default_chunk_class, base_generation_info
+        )
+        if generation_chunk is None:
+            return None
+        
+        choices = chunk.get("choices", []) or chunk.get("chunk", {}).get("choices", [])
+        if choices:
+            delta = choices[0].get("delta") or {}
+            reasoning = delta.get("reasoning_content")
+            if reasoning:
+                generation_chunk.message.additional_kwargs["reasoning_content"] = reasoning
+        
+        return generation_chunk
+
+
+class _LoopAwareAsyncTransport(httpx.AsyncBaseTransport):
+    """
+    Async transport that keeps one connection pool per running event loop.
+    
+    httpx async connections cannot be reused across event loops, and the
+    workflow is driven from several loops (Streamlit reruns, run_sync,
+    asyncio.run in tests). Every shared client routes through this single
+    transport, which hands each loop its own pooled AsyncHTTPTransport.
+    """
+    
+    def __init__(self, limits: httpx.Limits):
+        self._limits = limits
+        self._transports: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncHTTPTransport]" = (
+            weakref.WeakKeyDictionary()
+        )
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._requests = 0
+    
+    def _transport_for_loop(self) -> httpx.AsyncHTTPTransport:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            transport = self._transports.get(loop)
+            if transport is None:
+                transport = httpx.AsyncHTTPTransport(limits=self._limits)
+                self._transports[loop] = transport
+            return transport
+    
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        transport = self._transport_for_loop()
+        with self._lock:
+            self._in_flight += 1
+            self._requests += 1
+        try:
+            return await transport.handle_async_request(request)
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+    
+    async def aclose(self) -> None:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            transport = self._transports.pop(loop, None)
+        if transport is not None:
+            await transport.aclose()
+    
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            pools = [t._pool for t in self._transports.values()]
+            stats = {
+                "event_loops": len(pools),
+                "requests": self._requests,
+                "in_flight": self._in_flight,
+            }
+        stats.update(_connection_stats(pools))
+        return stats
+
+
+def _connection_stats(pools: List[Any]) -> Dict[str, int]:
+    """Summarize connections held by httpcore connection pools."""
+    total = idle = 0
+    for pool in pools:
+        for connection in getattr(pool, "connections", []):
+            total += 1
+            if connection.is_idle():
+                idle += 1
+    return {"connections": total, "idle_connections": idle, "active_connections": total - idle}
+
+
+# Process-wide LLM registry
+_llm_registry: Dict[Tuple, DeepSeekChatOpenAI] = {}
+_llm_registry_lock = threading.Lock()
+_llm_registry_stats = {"hits": 0, "misses": 0}
+_http_client: Optional[httpx.Client] = None
+_http_async_client: Optional[httpx.AsyncClient] = None
+_llm_cache: Optional[SQLiteLLMCache] = None
+
+
+def _get_http_clients() -> Tuple[httpx.Client, httpx.AsyncClient]:
+    """Create (once) the pooled HTTP clients shared by every chat model."""
+    global _http_client, _http_async_client
+    
+    if _http_client is None:
+        from config.settings import settings
+        
+        limits = httpx.Limits(
+            max_connections=settings.llm_max_connections,
+            max_keepalive_connections=settings.llm_max_keepalive_connections,
+            keepalive_expiry=settings.llm_keepalive_expiry
+        )
+        _http_client = httpx.Client(limits=limits)
+        _http_async_client = httpx.AsyncClient(transport=_LoopAwareAsyncTransport(limits))
+    return _http_client, _http_async_client
+
+
+def get_llm_cache() -> Optional[SQLiteLLMCache]:
+    """
+    Get the persistent LLM response cache.
+    
+    Returns:
+        Shared SQLiteLLMCache, or None when settings.llm_cache_enabled is off
+    """
+    global _llm_cache
+    from config.settings import settings
+    
+    if not settings.llm_cache_enabled:
+        return None
+    
+    with _llm_registry_lock:
+        if _llm_cache is None:
+            _llm_cache = SQLiteLLMCache(
+                path=settings.llm_cache_path,
+                ttl_seconds=settings.llm_cache_ttl_seconds,
+                max_bytes=settings.llm_cache_max_mb * 1024 * 1024
             )
+        return _llm_cache
+
+
+def resolve_call_site(call_site: str) -> Tuple[str, Optional[int]]:
+    """
+    Look up the model and max_tokens configured for a call site.
+    
+    Entries in settings.llm_model_tiers are matched exactly first, then by
+    wildcard (e.g. "hypothesis_*"). The model may be "fast" (settings.
+    llm_fast_model, falling back to openai_model), "default" (openai_model)
+    or an explicit model name.
+    
+    Args:
+        call_site: Call site name
+    
+    Returns:
+        Tuple of (model name, max_tokens or None)
+    """
+    from config.settings import settings
+    
+    tiers = settings.llm_model_tiers
+    tier = tiers.get(call_site)
+    if tier is None:
+        tier = next(
+            (value for pattern, value in tiers.items() if fnmatch.fnmatchcase(call_site, pattern)),
+            {}
+        )
+    
+    model = tier.get("model", "default")
+    if model == "fast":
+        model = settings.llm_fast_model or settings.openai_model
+    elif model == "default":
+        model = settings.openai_model
+    return model, tier.get("max_tokens")
+
+
+def get_llm(
+    temperature: float = 0.7,
+    max_tokens: Optional[int] = None,
+    model: Optional[str] = None,
+    cache: bool = False,
+    priority: int = LLM_PRIORITY_NORMAL,
+    call_site: Optional[str] = None,
+    **kwargs: Any
+) -> DeepSeekChatOpenAI:
+    """
+    Get a shared chat model from the process-wide registry.
+    
+    Models are keyed by model name, base URL and sampling parameters, so
+    every agent, RAG instance and graph node asking for the same
+    configuration receives the same client. All clients share one pooled
+    sync and async HTTP transport.
+    
+    Args:
+        temperature: Sampling temperature
+        max_tokens: Optional completion token limit (defaults to the call
+            site's tier)
+        model: Model name (defaults to the call site's tier, else
+            settings.openai_model)
+        cache: Serve repeated identical prompts from the persistent response
+            cache (only for deterministic, low-temperature call sites; has no
+            effect unless settings.llm_cache_enabled is on)
+        priority: Rate limiter queue priority (LLM_PRIORITY_HIGH for
+            user-facing calls such as synthesis)
+        call_site: Call site name looked up in settings.llm_model_tiers (and
+            settings.llm_hedge_call_sites for request hedging)
+        **kwargs: Extra ChatOpenAI parameters (part of the registry key)
+    
+    Returns:
+        Shared DeepSeekChatOpenAI instance
+    """
+    from config.settings import settings
+    
+    if call_site:
+        tier_model, tier_max_tokens = resolve_call_site(call_site)
+        model = model or tier_model
+        max_tokens = max_tokens if max_tokens is not None else tier_max_tokens
+    
+    model = model or settings.openai_model
+    hedge = bool(call_site) and settings.llm_hedging_enabled and call_site in settings.llm_hedge_call_sites
+    base_url = settings.openai_base_url or None
+    response_cache = get_llm_cache() if cache else None
+    key = (
+        model,
+        base_url,
+        temperature,
+        max_tokens,
+        response_cache is not None,
+        priority,
+        call_site,
+        hedge,
+        tuple(sorted((k, repr(v)) for k, v in kwargs.items()))
+    )
+    
+    with _llm_registry_lock:
+        llm = _llm_registry.get(key)
+        if llm is not None:
+            _llm_registry_stats["hits"] += 1
+            return llm
+        
+        _llm_registry_stats["misses"] += 1
+        http_client, http_async_client = _get_http_clients()
+        
+        llm_kwargs = {
+            "model": model,
+            "temperature": temperature,
+            "openai_api_key": settings.openai_api_key,
+            "http_client": http_client,
+            "http_async_client": http_async_client,
+            "rate_limit_priority": priority,
+            "call_site": call_site,
+            "hedge": hedge,
+            **kwargs
+        }
+        if max_tokens is not None:
+            llm_kwargs["max_tokens"] = max_tokens
+        if response_cache is not None:
+            llm_kwargs["cache"] = response_cache
+        if base_url:
+            llm_kwargs["openai_api_base"] = base_url
+        
+        llm = DeepSeekChatOpenAI(**llm_kwargs)
+        _llm_registry[key] = llm
+        return llm
+
+
+def get_llm_pool_stats() -> Dict[str, Any]:
+    """
+    Report registry and connection pool statistics.
+    
+    Returns:
+        Dictionary with registry size, hit/miss counts and per-transport
+        connection counts, useful for sizing llm_max_connections.
+    """
+    with _llm_registry_lock:
+        stats = {
+            "clients": len(_llm_registry),
+            "registry_hits": _llm_registry_stats["hits"],
+            "registry_misses": _llm_registry_stats["misses"],
+        }
+    
+    if _llm_cache is not None:
+        stats["response_cache"] = _llm_cache.stats()
+    
+    stats["rate_limiters"] = get_rate_limiter_stats()
+    stats["hedging"] = get_hedging_stats()
+    
+    if _http_client is not None:
+        stats["sync_pool"] = _connection_stats([_http_client._transport._pool])
+        stats["async_pool"] = _http_async_client._transport.stats()
+    
+    return stats
+
+
+def reset_llm_registry():
+    """Drop all shared chat models, rate limiters, the pooled sync transport and the response cache."""
+    global _http_client, _http_async_client, _llm_cache
+    
+    reset_rate_limiters()
+    with _llm_registry_lock:
+        _llm_registry.clear()
+        _llm_registry_stats.update(hits=0, misses=0)
+        if _http_client is not None:
+            _http_client.close()
+        if _llm_cache is not None:
+            _llm_cache.close()
+        _http_client = None
+        _http_async_client = None
+        _llm_cache = None
@@ -0,0 +1,139 @@
+"""Structured, sampled logging of LLM calls."""
+
+from typing import Any, Callable, Dict, List, Optional
+import json
+import logging
+import random
+import re
+
+from langchain_core.messages import BaseMessage
+
+from config.settings import settings
+
+logger = logging.getLogger("research_lab.llm")
+
+_SECRET_PATTERN = re.compile(r"(sk-[A-Za-z0-9_\-]{8,}|Bearer\s+[A-Za-z0-9_\-\.]{8,})")
+
+
+def default_redactor(text: str) -> str:
+    """Mask API keys and bearer tokens."""
+    return _SECRET_PATTERN.sub("[REDACTED]", text)
+
+
+_redactor: Callable[[str], str] = default_redactor
+
+
+def set_llm_log_redactor(redactor: Optional[Callable[[str], str]]):
+    """
+    Install a redaction hook applied to every prompt, response and reasoning
+    text before it is logged.
+    
+    Args:
+        redactor: Function mapping text to redacted text (None restores the default)
+    """
+    global _redactor
+    _redactor = redactor or default_redactor
+
+
+def _cap(text: str) -> str:
+    limit = settings.llm_log_max_chars
+    if limit and len(text) > limit:
+        return f"{text[:limit]}... [{len(text) - limit} chars truncated]"
+    return text
+
+
+class _LazyText:
+    """Defers building, redacting and truncating a log payload until it is emitted."""
+    
+    def __init__(self, build: Callable[[], str]):
+        self._build = build
+    
+    def __str__(self) -> str:
+        try:
+            return _cap(_redactor(self._build()))
+        except Exception as e:
+            return f"<unloggable payload: {e}>"
+
+
+def _dump_messages(messages: List[BaseMessage]) -> str:
+    return json.dumps(
+        [{"role": m.type, "content": m.content} for m in messages],
+        indent=2,
+        ensure_ascii=False,
+        default=str
+    )
+
+
+def should_sample() -> bool:
+    """Decide (once per call) whether a successful LLM call is logged."""
+    rate = settings.llm_log_sample_rate
+    return rate >= 1.0 or (rate > 0 and random.random() < rate)
+
+
+def log_llm_call(
+    model: str,
+    messages: List[BaseMessage],
+    latency: float,
+    sampled: bool,
+    output: Optional[str] = None,
+    reasoning: Optional[str] = None,
+    usage: Optional[Dict[str, Any]] = None,
+    error: Optional[BaseException] = None,
+    call_site: Optional[str] = None
+):
+    """
+    Emit one structured record for an LLM call.
+    
+    Failures are always logged at WARNING. Successful calls are logged at
+    INFO when sampled; the full prompt, response and reasoning are only
+    dumped (at DEBUG, lazily formatted, redacted and size-capped) when
+    settings.llm_log_prompts is on.
+    
+    Args:
+        model: Model name
+        messages: Prompt messages
+        latency: Wall-clock duration in seconds
+        sampled: Result of should_sample() taken when the call started
+        output: Response text
+        reasoning: DeepSeek reasoning_content, if any
+        usage: Token usage reported by the provider
+        error: Exception raised by the call
+        call_site: Configured call site of the client, if any
+    """
+    if error is None and not (sampled and logger.isEnabledFor(logging.INFO)):
+        return
+    
+    usage = usage or {}
+    record = {
+        "model": model,
+        "call_site": call_site,
+        "messages": len(messages),
+        "prompt_chars": sum(len(str(m.content)) for m in messages),
+        "output_chars": len(output or ""),
+        "reasoning_chars": len(reasoning or ""),
+        "prompt_tokens": usage.get("prompt_tokens") or usage.get("input_tokens"),
+        "completion_tokens": usage.get("completion_tokens") or usage.get("output_tokens"),
+        "latency_ms": round(latency * 1000),
+    }
+    
+    if error is not None:
+        record["error"] = type(error).__name__
+        logger.warning(
+            "LLM call failed site=%s model=%s latency_ms=%d error=%s",
+            call_site, model, record["latency_ms"], record["error"],
+            extra={"llm_call": record}
+        )
+    else:
+        logger.info(
+            "LLM call site=%s model=%s messages=%d prompt_chars=%d completion_tokens=%s latency_ms=%d",
+            call_site, model, record["messages"], record["prompt_chars"],
+            record["completion_tokens"], record["latency_ms"],
+            extra={"llm_call": record}
+        )
+    
+    if settings.llm_log_prompts and logger.isEnabledFor(logging.DEBUG):
+        logger.debug("LLM prompt:\n%s", _LazyText(lambda: _dump_messages(messages)))
+        if output:
+            logger.debug("LLM response:\n%s", _LazyText(lambda: output))
+        if reasoning:
+            logger.debug("LLM reasoning:\n%s", _LazyText(lambda: reasoning))
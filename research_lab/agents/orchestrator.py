@@ -1,13 +1,13 @@
 """Orchestrator agent for coordinating the research team."""
 
-from typing import List, Dict, Any, Optional, Type
+from typing import List, Dict, Any, Optional, Type, Callable, Iterable, Iterator, Mapping
 from datetime import datetime
 import asyncio
+import threading
 import uuid
 import logging
 import json
 
-from langchain_openai import ChatOpenAI
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser, JsonOutputParser
 from pydantic import BaseModel, Field
@@ -25,7 +25,8 @@ from agents.support import SUPPORT_AGENT_REGISTRY
 from config.settings import settings, FIELD_DISPLAY_NAMES
 from config.logging_config import setup_logging
 from prompts.agent_prompts import ROUTING_SYSTEM_PROMPT, SYNTHESIS_SYSTEM_PROMPT
-from agents.llm import DeepSeekChatOpenAI
+from agents.llm import get_llm
+from agents.rate_limiter import LLM_PRIORITY_HIGH
 
 logger = logging.getLogger(__name__)
 
@@ -38,6 +39,94 @@ class RoutingDecision(BaseModel):
     reasoning: str = Field(default="", description="Reasoning for this routing decision")
 
 
+class LazyAgentRegistry(Mapping[str, BaseResearchAgent]):
+    """
+    Mapping of configured agents that builds each agent on first access.
+    
+    Membership and iteration only consult the configured names, so routing
+    never constructs anything. Construction happens once per agent under a
+    per-agent lock, from any thread or event loop.
+    """
+    
+    def __init__(self, factories: Dict[str, Callable[[], BaseResearchAgent]], kind: str):
+        """
+        Initialize the registry.
+        
+        Args:
+            factories: Agent name -> zero-argument constructor
+            kind: "domain" or "support" (for log messages)
+        """
+        self._factories = factories
+        self._kind = kind
+        self._agents: Dict[str, BaseResearchAgent] = {}
+        self._failed: Dict[str, str] = {}
+        self._locks = {name: threading.Lock() for name in factories}
+    
+    def __getitem__(self, name: str) -> BaseResearchAgent:
+        agent = self._agents.get(name)
+        if agent is not None:
+            return agent
+        if name not in self._factories:
+            raise KeyError(name)
+        
+        with self._locks[name]:
+            if name in self._agents:
+                return self._agents[name]
+            if name in self._failed:
+                raise KeyError(f"{self._kind} agent {name} failed to initialize: {self._failed[name]}")
+            try:
+                agent = self._factories[name]()
+            except Exception as e:
+                logger.error(f"Failed to initialize {self._kind} agent {name}: {e}")
+                self._failed[name] = str(e)
+                raise KeyError(f"{self._kind} agent {name} failed to initialize: {e}") from e
+            self._agents[name] = agent
+            return agent
+    
+    def __contains__(self, name: object) -> bool:
+        return name in self._factories and name not in self._failed
+    
+    def __iter__(self) -> Iterator[str]:
+        return (name for name in self._factories if name not in self._failed)
+    
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+    
+    async def aget(self, name: str) -> BaseResearchAgent:
+        """Get an agent, building it in a worker thread so the event loop keeps running."""
+        agent = self._agents.get(name)
+        if agent is not None:
+            return agent
+        return await asyncio.to_thread(self.__getitem__, name)
+    
+    def prewarm(self, names: Optional[Iterable[str]] = None) -> threading.Thread:
+        """
+        Build agents in a background thread.
+        
+        Args:
+            names: Agents to build (defaults to all configured agents)
+        
+        Returns:
+            The started daemon thread
+        """
+        names = [n for n in (names if names is not None else self._factories) if n in self]
+        
+        def build():
+            for name in names:
+                try:
+                    self[name]
+                except KeyError:
+                    pass
+        
+        thread = threading.Thread(target=build, name=f"prewarm-{self._kind}-agents", daemon=True)
+        thread.start()
+        return thread
+    
+    def built(self) -> Dict[str, BaseResearchAgent]:
+        """Get the agents constructed so far."""
+        return dict(self._agents)
+
+
 class Orchestrator:
     """Main orchestrator that coordinates the research team."""
     
@@ -47,19 +136,16 @@ class Orchestrator:
         
         logger.info(f"Initializing Orchestrator for team: {team_config.team_id}")
         
-        llm_kwargs = {
-            "model": settings.openai_model,
-            "temperature": 0.3,
-            "openai_api_key": settings.openai_api_key
-        }
-        if settings.openai_base_url:
-            llm_kwargs["openai_api_base"] = settings.openai_base_url
-        self._llm = DeepSeekChatOpenAI(**llm_kwargs)
+        # Routing prompts repeat across sessions, so serve them from the response cache
+        self._llm = get_llm(temperature=0.3, cache=True, call_site="router")
         
-        self._domain_agents: Dict[str, BaseResearchAgent] = {}
-        self._support_agents: Dict[str, BaseResearchAgent] = {}
+        self._domain_agents: LazyAgentRegistry
+        self._support_agents: LazyAgentRegistry
         self._init_agents()
         
+        # Optionally build the agents routing is likely to pick in the background
+        if settings.agent_prewarm and settings.agent_prewarm_fields:
+            self._domain_agents.prewarm(names=settings.agent_prewarm_fields)
 
         
         # Routing Prompt
@@ -89,29 +175,32 @@ Please synthesize these findings into a comprehensive research response.""")
         ])
     
     def _init_agents(self):
-        """Initialize all agents in the team."""
-        for field in self.team_config.domain_agents:
-            if field in DOMAIN_AGENT_REGISTRY:
-                try:
-                    self._domain_agents[field] = DOMAIN_AGENT_REGISTRY[field]()
-                except Exception as e:
-                    logger.error(f"Failed to initialize domain agent {field}: {e}")
-        
-        for agent_type in self.team_config.support_agents:
-            if agent_type in SUPPORT_AGENT_REGISTRY:
-                try:
-                    self._support_agents[agent_type] = SUPPORT_AGENT_REGISTRY[agent_type]()
-                except Exception as e:
-                    logger.error(f"Failed to initialize support agent {agent_type}: {e}")
+        """Register all agents in the team; each is constructed on first use."""
+        self._domain_agents = LazyAgentRegistry(
+            {
+                field: DOMAIN_AGENT_REGISTRY[field]
+                for field in self.team_config.domain_agents
+                if field in DOMAIN_AGENT_REGISTRY
+            },
+            kind="domain"
+        )
+        self._support_agents = LazyAgentRegistry(
+            {
+                agent_type: SUPPORT_AGENT_REGISTRY[agent_type]
+                for agent_type in self.team_config.support_agents
+                if agent_type in SUPPORT_AGENT_REGISTRY
+            },
+            kind="support"
+        )
 
     @property
-    def domain_agents(self) -> Dict[str, BaseResearchAgent]:
-        """Get the initialized domain agents."""
+    def domain_agents(self) -> LazyAgentRegistry:
+        """Get the team's domain agents (built on first access)."""
         return self._domain_agents
 
     @property
-    def support_agents(self) -> Dict[str, BaseResearchAgent]:
-        """Get the initialized support agents."""
+    def support_agents(self) -> LazyAgentRegistry:
+        """Get the team's support agents (built on first access)."""
         return self._support_agents
     
     async def route_query(self, query: str) -> RoutingDecision:
@@ -160,7 +249,7 @@ Please synthesize these findings into a comprehensive research response.""")
         tasks = []
         for f in routing.domain_agents:
             if f in self._domain_agents:
-                tasks.append(self._domain_agents[f].research(research_query))
+                tasks.append(self._research_with(f, research_query))
         
         if not tasks:
             logger.warning("No domain agents selected for execution.")
@@ -188,12 +277,16 @@ Please synthesize these findings into a comprehensive research response.""")
             "timestamp": datetime.now().isoformat()
         }
     
+    async def _research_with(self, field: str, research_query: ResearchQuery) -> ResearchResult:
+        agent = await self._domain_agents.aget(field)
+        return await agent.research(research_query)
+    
     async def _synthesize_response(self, query: str, domain_results: List[ResearchResult], support_results: Dict) -> str:
         """Synthesize findings from all agents."""
         domain_text = "\n\n".join([r.to_markdown() for r in domain_results]) or "No domain results."
         support_text = "No support input."
         
-        chain = self._synthesis_prompt | self._llm | StrOutputParser()
+        chain = self._synthesis_prompt | get_llm(temperature=0.3, priority=LLM_PRIORITY_HIGH, call_site="synthesis") | StrOutputParser()
         return await chain.ainvoke({
             "query": query,
             "domain_results": domain_text,
@@ -210,9 +303,10 @@ Please synthesize these findings into a comprehensive research response.""")
         }
 
     def get_agent_states(self) -> Dict[str, AgentState]:
+        """Get states of the agents built so far (unbuilt agents are idle)."""
         states = {}
-        for field, agent in self._domain_agents.items():
+        for field, agent in self._domain_agents.built().items():
             states[f"domain_{field}"] = agent.get_state()
-        for agent_type, agent in self._support_agents.items():
+        for agent_type, agent in self._support_agents.built().items():
             states[f"support_{agent_type}"] = agent.get_state()
         return states
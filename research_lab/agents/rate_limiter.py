@@ -0,0 +1,348 @@
+"""Process-wide rate limiting and concurrency governance for LLM traffic."""
+
+from typing import Any, Dict, List, Optional
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+import asyncio
+import heapq
+import itertools
+import threading
+import time
+
+from config.settings import settings
+
+
+# Request priorities (higher is served first)
+LLM_PRIORITY_NORMAL = 0
+LLM_PRIORITY_HIGH = 10
+
+# Upper bounds (seconds) of the queue wait histogram buckets
+WAIT_BUCKETS = [0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0, float("inf")]
+
+_current_session: ContextVar[str] = ContextVar("llm_session", default="default")
+
+
+@contextmanager
+def llm_session(session_id: str):
+    """
+    Attribute LLM calls made inside this context to a session.
+    
+    The limiter queues sessions fairly against each other, so one busy
+    research session cannot starve the others.
+    """
+    token = _current_session.set(session_id)
+    try:
+        yield
+    finally:
+        _current_session.reset(token)
+
+
+class TokenBucket:
+    """Token bucket refilled continuously at capacity-per-minute."""
+    
+    def __init__(self, capacity_per_minute: int):
+        self.capacity = float(capacity_per_minute)
+        self.rate = self.capacity / 60.0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+    
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+    
+    def wait_time(self, amount: float, now: float) -> float:
+        """Seconds until `amount` can be consumed (0 if available now)."""
+        self._refill(now)
+        # Requests larger than the bucket only need a full bucket
+        needed = min(amount, self.capacity)
+        if self.tokens >= needed:
+            return 0.0
+        return (needed - self.tokens) / self.rate
+    
+    def consume(self, amount: float):
+        self.tokens -= amount
+    
+    def refund(self, amount: float):
+        self.tokens = min(self.capacity, self.tokens + amount)
+
+
+@dataclass
+class LimiterTicket:
+    """A queued or granted LLM request."""
+    session: str
+    priority: int
+    tokens: int
+    enqueued_at: float
+    sort_key: tuple = ()
+    granted: bool = False
+    cancelled: bool = False
+    actual_tokens: Optional[int] = None
+    # Future an async waiter sleeps on until the limiter state changes
+    wakeup: Optional[asyncio.Future] = None
+    
+    def __lt__(self, other: "LimiterTicket") -> bool:
+        return self.sort_key < other.sort_key
+
+
+class LLMRateLimiter:
+    """
+    Rate limiter for one provider/model.
+    
+    Enforces requests per minute, tokens per minute and a maximum number of
+    in-flight calls. Waiting requests are served by priority first and then
+    by start-time fair queuing across sessions, so sessions take turns.
+    
+    Grants, releases and cancellations wake the waiters: sync callers
+    block on a condition, async callers on a future resolved on their own
+    event loop. Sync callers must not run on an event loop thread (use
+    asyncio.to_thread or the async API there).
+    """
+    
+    def __init__(self, name: str, requests_per_minute: int, tokens_per_minute: int, max_in_flight: int):
+        """
+        Initialize the limiter.
+        
+        Args:
+            name: Provider/model key used in metrics
+            requests_per_minute: Request budget per minute
+            tokens_per_minute: Prompt + completion token budget per minute
+            max_in_flight: Maximum concurrent calls
+        """
+        self.name = name
+        self.max_in_flight = max_in_flight
+        self._requests = TokenBucket(requests_per_minute)
+        self._tokens = TokenBucket(tokens_per_minute)
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+        self._queue: List[LimiterTicket] = []
+        self._seq = itertools.count()
+        self._virtual_time = 0.0
+        self._session_finish: Dict[str, float] = {}
+        # Queued + in-flight tickets per session; idle sessions are forgotten
+        self._session_tickets: Dict[str, int] = {}
+        self._in_flight = 0
+        self._metrics = {
+            "granted": 0,
+            "wait_count": 0,
+            "wait_total_seconds": 0.0,
+            "wait_max_seconds": 0.0,
+            "wait_histogram": [0] * len(WAIT_BUCKETS),
+        }
+    
+    def _enqueue(self, tokens: int, priority: int) -> LimiterTicket:
+        session = _current_session.get()
+        with self._lock:
+            # Start-time fair queuing: each session's next request starts
+            # after its previous one in virtual time
+            start = max(self._virtual_time, self._session_finish.get(session, 0.0))
+            self._session_finish[session] = start + 1.0
+            self._session_tickets[session] = self._session_tickets.get(session, 0) + 1
+            ticket = LimiterTicket(
+                session=session,
+                priority=priority,
+                tokens=tokens,
+                enqueued_at=time.monotonic(),
+                sort_key=(-priority, start, next(self._seq))
+            )
+            heapq.heappush(self._queue, ticket)
+        return ticket
+    
+    def _try_grant(self, ticket: LimiterTicket) -> Optional[float]:
+        """
+        Grant the ticket if it is at the head and capacity allows (call with _lock held).
+        
+        Returns:
+            0.0 when granted, seconds until the rate budgets allow it, or None
+            when it has to wait for another ticket to be granted or released
+        """
+        now = time.monotonic()
+        while self._queue and self._queue[0].cancelled:
+            heapq.heappop(self._queue)
+        
+        if not self._queue or self._queue[0] is not ticket:
+            return None
+        if self._in_flight >= self.max_in_flight:
+            return None
+        
+        wait = max(self._requests.wait_time(1, now), self._tokens.wait_time(ticket.tokens, now))
+        if wait > 0:
+            return min(wait, 0.5)
+        
+        heapq.heappop(self._queue)
+        self._requests.consume(1)
+        self._tokens.consume(ticket.tokens)
+        self._in_flight += 1
+        self._virtual_time = max(self._virtual_time, ticket.sort_key[1])
+        ticket.granted = True
+        self._record_wait(now - ticket.enqueued_at)
+        self._notify()
+        return 0.0
+    
+    def _notify(self):
+        """Wake every sync and async waiter to re-check its ticket (call with _lock held)."""
+        self._changed.notify_all()
+        for waiting in self._queue:
+            if waiting.wakeup is not None:
+                waiting.wakeup.get_loop().call_soon_threadsafe(_resolve, waiting.wakeup)
+                waiting.wakeup = None
+    
+    def _record_wait(self, waited: float):
+        self._metrics["granted"] += 1
+        self._metrics["wait_count"] += 1
+        self._metrics["wait_total_seconds"] += waited
+        self._metrics["wait_max_seconds"] = max(self._metrics["wait_max_seconds"], waited)
+        for i, bound in enumerate(WAIT_BUCKETS):
+            if waited <= bound:
+                self._metrics["wait_histogram"][i] += 1
+                break
+    
+    def _retire(self, ticket: LimiterTicket):
+        """Forget the ticket's session once it has nothing queued or in flight (call with _lock held)."""
+        remaining = self._session_tickets.get(ticket.session, 1) - 1
+        if remaining > 0:
+            self._session_tickets[ticket.session] = remaining
+        else:
+            self._session_tickets.pop(ticket.session, None)
+            self._session_finish.pop(ticket.session, None)
+        self._notify()
+    
+    def _cancel(self, ticket: LimiterTicket):
+        with self._lock:
+            ticket.cancelled = True
+            ticket.wakeup = None
+            self._retire(ticket)
+    
+    async def aacquire(self, tokens: int, priority: int = LLM_PRIORITY_NORMAL) -> LimiterTicket:
+        """Wait (asynchronously) for a slot."""
+        loop = asyncio.get_running_loop()
+        ticket = self._enqueue(tokens, priority)
+        try:
+            while True:
+                with self._lock:
+                    wait = self._try_grant(ticket)
+                    if wait == 0.0:
+                        return ticket
+                    wakeup = ticket.wakeup = loop.create_future()
+                # Sleep until the limiter state changes, or until the rate budgets allow the ticket
+                await asyncio.wait([wakeup], timeout=wait)
+        except BaseException:
+            if not ticket.granted:
+                self._cancel(ticket)
+            raise
+    
+    def acquire(self, tokens: int, priority: int = LLM_PRIORITY_NORMAL) -> LimiterTicket:
+        """Wait (blocking the calling thread) for a slot."""
+        ticket = self._enqueue(tokens, priority)
+        try:
+            with self._lock:
+                while True:
+                    wait = self._try_grant(ticket)
+                    if wait == 0.0:
+                        return ticket
+                    self._changed.wait(wait)
+        except BaseException:
+            if not ticket.granted:
+                self._cancel(ticket)
+            raise
+    
+    def release(self, ticket: LimiterTicket):
+        """Return the in-flight slot and reconcile the token estimate with actual usage."""
+        with self._lock:
+            self._in_flight -= 1
+            if ticket.actual_tokens is not None:
+                difference = ticket.tokens - ticket.actual_tokens
+                if difference > 0:
+                    self._tokens.refund(difference)
+                else:
+                    self._tokens.consume(-difference)
+            self._retire(ticket)
+    
+    @asynccontextmanager
+    async def aslot(self, tokens: int, priority: int = LLM_PRIORITY_NORMAL):
+        """Async context manager holding a slot for one LLM call."""
+        ticket = await self.aacquire(tokens, priority)
+        try:
+            yield ticket
+        finally:
+            self.release(ticket)
+    
+    @contextmanager
+    def slot(self, tokens: int, priority: int = LLM_PRIORITY_NORMAL):
+        """Context manager holding a slot for one LLM call."""
+        ticket = self.acquire(tokens, priority)
+        try:
+            yield ticket
+        finally:
+            self.release(ticket)
+    
+    def stats(self) -> Dict[str, Any]:
+        """Get queue, in-flight and queue wait time metrics."""
+        with self._lock:
+            metrics = dict(self._metrics)
+            metrics["wait_histogram"] = {
+                ("+Inf" if bound == float("inf") else str(bound)): count
+                for bound, count in zip(WAIT_BUCKETS, self._metrics["wait_histogram"])
+            }
+            metrics.update(
+                queued=sum(1 for t in self._queue if not t.cancelled),
+                in_flight=self._in_flight,
+                max_in_flight=self.max_in_flight,
+            )
+        count = metrics["wait_count"]
+        metrics["wait_mean_seconds"] = metrics["wait_total_seconds"] / count if count else 0.0
+        return metrics
+
+
+def _resolve(future: asyncio.Future):
+    if not future.done():
+        future.set_result(None)
+
+
+# Global registry of limiters keyed by provider/model
+_limiters: Dict[str, LLMRateLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(model: str, base_url: Optional[str] = None) -> Optional[LLMRateLimiter]:
+    """
+    Get the shared limiter for a provider/model.
+    
+    Limits come from settings.llm_rate_limits[model] when present, falling
+    back to the global llm_requests_per_minute / llm_tokens_per_minute /
+    llm_max_in_flight values.
+    
+    Args:
+        model: Model name
+        base_url: Provider base URL (None for the default OpenAI endpoint)
+    
+    Returns:
+        LLMRateLimiter, or None when rate limiting is disabled
+    """
+    if not settings.llm_rate_limit_enabled:
+        return None
+    
+    key = f"{base_url or 'openai'}:{model}"
+    with _limiters_lock:
+        if key not in _limiters:
+            overrides = settings.llm_rate_limits.get(model, {})
+            _limiters[key] = LLMRateLimiter(
+                name=key,
+                requests_per_minute=overrides.get("rpm", settings.llm_requests_per_minute),
+                tokens_per_minute=overrides.get("tpm", settings.llm_tokens_per_minute),
+                max_in_flight=overrides.get("max_in_flight", settings.llm_max_in_flight)
+            )
+        return _limiters[key]
+
+
+def get_rate_limiter_stats() -> Dict[str, Dict[str, Any]]:
+    """Get metrics for every provider/model limiter."""
+    with _limiters_lock:
+        limiters = list(_limiters.values())
+    return {limiter.name: limiter.stats() for limiter in limiters}
+
+
+def reset_rate_limiters():
+    """Drop all limiters (used when settings change and in tests)."""
+    with _limiters_lock:
+        _limiters.clear()
@@ -1,9 +1,10 @@
 """Cross-Domain Synthesizer support agent."""
 
-from typing import List, Dict, Any, Set
+from typing import List, Dict, Any, Set, Tuple
 
 from agents.base_agent import BaseResearchAgent
-from states.agent_state import ResearchResult
+from config.settings import settings
+from states.agent_state import Paper, ResearchQuery, ResearchResult
 
 
 class CrossDomainSynthesizer(BaseResearchAgent):
@@ -39,4 +40,18 @@ Key interdisciplinary connections:
 - Chemistry + Medicine → Drug discovery
 
 Always explain connections in accessible terms and highlight collaboration opportunities."""
-
+    
+    async def _retrieve_context(self, query: ResearchQuery) -> Tuple[str, List[Paper], float]:
+        """Retrieve the best evidence from every field's collection, not just this agent's."""
+        if not settings.rag_federated_search_enabled:
+            return await super()._retrieve_context(query)
+        
+        from rag.federated_search import afederated_search
+        
+        documents = await afederated_search(query.query, n_results=settings.rag_federated_n_results)
+        if not documents:
+            return await super()._retrieve_context(query)
+        
+        result = self._rag.result_from_documents(query.query, documents)
+        context = "\n\n---\n\n".join(f"[{doc['field']}] {doc['content']}" for doc in result.documents)
+        return context, result.papers, result.confidence
@@ -22,6 +22,7 @@ class HypothesisCriticAgent(BaseResearchAgent):
     FIELD = "hypothesis_critique"
     DISPLAY_NAME = "Hypothesis Critic"
     AGENT_TYPE = "support"
+    LLM_CALL_SITE = "hypothesis_critic"
     
     def __init__(self, agent_id: Optional[str] = None):
         """Initialize the Hypothesis Critic agent."""
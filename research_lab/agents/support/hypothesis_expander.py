@@ -20,6 +20,7 @@ class HypothesisExpanderAgent(BaseResearchAgent):
     FIELD = "hypothesis_expansion"
     DISPLAY_NAME = "Hypothesis Expander (Scientist_2)"
     AGENT_TYPE = "support"
+    LLM_CALL_SITE = "hypothesis_expander"
     
     def __init__(self, agent_id: Optional[str] = None):
         """Initialize the Hypothesis Expander agent."""
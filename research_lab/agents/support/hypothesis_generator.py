@@ -25,6 +25,7 @@ class HypothesisGeneratorAgent(BaseResearchAgent):
     FIELD = "hypothesis_generation"
     DISPLAY_NAME = "Hypothesis Generator (Scientist_1)"
     AGENT_TYPE = "support"
+    LLM_CALL_SITE = "hypothesis_generator"
     
     def __init__(self, agent_id: Optional[str] = None):
         """Initialize the Hypothesis Generator agent."""
@@ -1,15 +1,33 @@
+import atexit
 import logging
+import logging.handlers
+import queue
 import sys
 from pathlib import Path
 
-def setup_logging(log_level=logging.DEBUG, log_file="research_lab.log"):
+# Background listener writing queued records to the real handlers
+_listener = None
+
+def setup_logging(log_level=None, log_file="research_lab.log"):
     """
     Setup standard logging configuration.
     
+    Records are handed to a queue and written to the console and log file
+    by a background listener thread, so callers never block on disk I/O.
+    The message itself (arguments and any traceback) is still rendered in
+    the logging thread, so records stay correct if their arguments change
+    later; only the handler formatters and the writes run on the listener.
+    
     Args:
-        log_level: Logging level (default: DEBUG)
+        log_level: Logging level (default: settings.log_level)
         log_file: Path to log file (default: research_lab.log)
     """
+    global _listener
+    
+    if log_level is None:
+        from config.settings import settings
+        log_level = settings.log_level.upper()
+    
     # Create logs directory if it doesn't exist
     log_path = Path("logs")
     log_path.mkdir(exist_ok=True)
@@ -21,6 +39,11 @@ def setup_logging(log_level=logging.DEBUG, log_file="research_lab.log"):
     # Remove existing handlers to avoid duplicates
     for handler in logger.handlers[:]:
         logger.removeHandler(handler)
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
     
     # Console Handler
     console_handler = logging.StreamHandler(sys.stdout)
@@ -30,7 +53,6 @@ def setup_logging(log_level=logging.DEBUG, log_file="research_lab.log"):
         datefmt='%H:%M:%S'
     )
     console_handler.setFormatter(console_formatter)
-    logger.addHandler(console_handler)
     
     # File Handler
     file_handler = logging.FileHandler(log_path / log_file, encoding='utf-8')
@@ -39,7 +61,14 @@ def setup_logging(log_level=logging.DEBUG, log_file="research_lab.log"):
         '%(asctime)s - %(name)s - %(levelname)s - %(filename)s:%(lineno)d - %(message)s'
     )
     file_handler.setFormatter(file_formatter)
-    logger.addHandler(file_handler)
+    
+    # Queue Handler (the message is rendered here; handler formatting and I/O happen on the listener thread)
+    log_queue = queue.SimpleQueue()
+    logger.addHandler(logging.handlers.QueueHandler(log_queue))
+    _listener = logging.handlers.QueueListener(
+        log_queue, console_handler, file_handler, respect_handler_level=True
+    )
+    _listener.start()
     
     # Enable third-party libraries for full visibility
     logging.getLogger("httpx").setLevel(logging.WARNING)
@@ -47,3 +76,10 @@ def setup_logging(log_level=logging.DEBUG, log_file="research_lab.log"):
     logging.getLogger("openai").setLevel(logging.WARNING)
 
     return logger
+
+
+@atexit.register
+def _stop_listener():
+    """Flush queued records on interpreter exit."""
+    if _listener is not None:
+        _listener.stop()
@@ -1,6 +1,6 @@
 """Application settings and configuration."""
 
-from typing import Literal
+from typing import Any, Dict, List, Literal
 from pydantic_settings import BaseSettings, SettingsConfigDict
 from pydantic import Field
 
@@ -19,13 +19,90 @@ class Settings(BaseSettings):
     openai_base_url: str = Field(default="", description="OpenAI base URL (for custom endpoints like DeepSeek)")
     openai_model: str = Field(default="gpt-4o", description="OpenAI model to use")
     
+    # LLM Model Tiering Configuration
+    llm_fast_model: str = Field(default="", description="Cheaper model for short JSON-only jobs (empty = openai_model)")
+    llm_model_tiers: Dict[str, Dict[str, Any]] = Field(
+        default_factory=lambda: {
+            "router": {"model": "fast", "max_tokens": 1000},
+            "reflector": {"model": "fast", "max_tokens": 1000},
+            "reformulator": {"model": "fast", "max_tokens": 300},
+            "kg_extractor": {"model": "fast", "max_tokens": 4000},
+            "kg_definitions": {"model": "fast", "max_tokens": 4000},
+            "url_context": {"model": "fast", "max_tokens": 4000},
+            "domain_agent": {"model": "default"},
+            "support_agent": {"model": "default"},
+            "hypothesis_*": {"model": "default", "max_tokens": 4000},
+            "synthesis": {"model": "default", "max_tokens": 8000},
+        },
+        description="Model and max_tokens per LLM call site; model is 'fast', 'default' or an explicit model name, keys may use * wildcards"
+    )
+    
+    # LLM Request Hedging Configuration
+    llm_hedging_enabled: bool = Field(default=False, description="Fire a duplicate LLM request when the first has no token after the hedge delay")
+    llm_hedge_call_sites: List[str] = Field(default_factory=lambda: ["router", "synthesis"], description="Call sites whose async LLM requests are hedged")
+    llm_hedge_percentile: float = Field(default=95.0, description="Percentile of recent first-token latency used as the hedge delay")
+    llm_hedge_min_samples: int = Field(default=20, description="Latency samples needed before the percentile delay is used")
+    llm_hedge_initial_delay: float = Field(default=5.0, description="Hedge delay in seconds until enough samples are collected")
+    llm_hedge_min_delay: float = Field(default=0.5, description="Lower bound for the hedge delay in seconds")
+    
+    # LLM Client Pool Configuration
+    llm_max_connections: int = Field(default=100, description="Max open connections in the shared LLM HTTP pool")
+    llm_max_keepalive_connections: int = Field(default=20, description="Max idle keep-alive connections in the shared LLM HTTP pool")
+    llm_keepalive_expiry: float = Field(default=30.0, description="Seconds an idle LLM connection is kept alive")
+    
+    # Research Tool HTTP Pool Configuration
+    tool_max_connections: int = Field(default=50, description="Max open connections in the HTTP pool shared by research tools")
+    tool_max_keepalive_connections: int = Field(default=10, description="Max idle keep-alive connections in the research tool HTTP pool")
+    tool_keepalive_expiry: float = Field(default=30.0, description="Seconds an idle research tool connection is kept alive")
+    
+    # LLM Response Cache Configuration
+    llm_cache_enabled: bool = Field(default=False, description="Cache deterministic LLM calls (routing, reflection, KG extraction) on disk")
+    llm_cache_path: str = Field(default="./data/llm_cache.sqlite", description="SQLite file for the LLM response cache")
+    llm_cache_ttl_seconds: int = Field(default=7 * 24 * 3600, description="Lifetime of cached LLM responses in seconds (0 = never expire)")
+    llm_cache_max_mb: int = Field(default=256, description="Max LLM response cache size in MB before LRU eviction")
+    
+    # LLM Rate Limiting Configuration
+    llm_rate_limit_enabled: bool = Field(default=True, description="Enforce process-wide rate limits on LLM calls")
+    llm_requests_per_minute: int = Field(default=500, description="Max LLM requests per minute per provider/model")
+    llm_tokens_per_minute: int = Field(default=200000, description="Max LLM tokens (prompt + completion) per minute per provider/model")
+    llm_max_in_flight: int = Field(default=16, description="Max concurrent LLM calls per provider/model")
+    llm_completion_token_estimate: int = Field(default=512, description="Completion tokens reserved per LLM call before its usage is known (capped by max_tokens, reconciled after the call)")
+    llm_rate_limits: Dict[str, Dict[str, int]] = Field(
+        default_factory=dict,
+        description="Per-model overrides, e.g. {\"gpt-4o\": {\"rpm\": 500, \"tpm\": 30000, \"max_in_flight\": 8}}"
+    )
+    
+    # Logging Configuration
+    log_level: str = Field(default="INFO", description="Root log level (DEBUG, INFO, WARNING, ...)")
+    llm_log_sample_rate: float = Field(default=1.0, description="Fraction of successful LLM calls written to the structured call log (failures are always logged)")
+    llm_log_prompts: bool = Field(default=False, description="Dump full prompts, responses and reasoning at DEBUG (redacted and size-capped)")
+    llm_log_max_chars: int = Field(default=4000, description="Max characters of each dumped prompt/response/reasoning (0 = no cap)")
+    
     # Embeddings Configuration
-    embeddings_provider: Literal["bge-m3", "openai"] = Field(default="bge-m3", description="Embeddings provider: 'bge-m3' (free, local) or 'openai' (API)")
+    embeddings_provider: Literal["bge-m3", "bge-m3-onnx", "openai"] = Field(default="bge-m3", description="Embeddings provider: 'bge-m3' (free, local), 'bge-m3-onnx' (local, ONNX Runtime / int8 for CPU-only hosts) or 'openai' (API)")
     openai_embeddings_api_key: str = Field(default="", description="API key for OpenAI embeddings (only needed if embeddings_provider='openai')")
     openai_embeddings_base_url: str = Field(default="https://api.openai.com/v1", description="Base URL for OpenAI embeddings API")
     openai_embeddings_model: str = Field(default="text-embedding-3-small", description="OpenAI embeddings model to use")
     bge_m3_model_name: str = Field(default="BAAI/bge-m3", description="BGE-M3 model name from Hugging Face")
     bge_m3_use_fp16: bool = Field(default=True, description="Use FP16 for BGE-M3 (faster, slight performance trade-off)")
+    bge_m3_batch_size: int = Field(default=16, description="Texts per BGE-M3 forward pass (texts are sorted by token length before batching)")
+    bge_m3_max_length: int = Field(default=8192, description="BGE-M3 token limit for full-text documents")
+    bge_m3_abstract_max_length: int = Field(default=1024, description="BGE-M3 token limit for paper documents (title, abstract, then authors)")
+    bge_m3_query_max_length: int = Field(default=512, description="BGE-M3 token limit for search queries")
+    bge_m3_onnx_path: str = Field(default="", description="Directory with the BGE-M3 model.onnx and tokenizer.json (default: download the onnx/ export of bge_m3_model_name)")
+    bge_m3_onnx_quantize: bool = Field(default=True, description="Run a dynamically int8-quantized copy of the ONNX model")
+    bge_m3_onnx_threads: int = Field(default=0, description="ONNX Runtime intra-op threads (0 = runtime default)")
+    bge_m3_onnx_cache_dir: str = Field(default="./data/onnx_cache", description="Directory for int8-quantized copies of the ONNX model")
+    
+    # Embedding Cache Configuration
+    embedding_cache_enabled: bool = Field(default=True, description="Cache embeddings on disk keyed by content hash")
+    embedding_cache_dir: str = Field(default="./data/embedding_cache", description="Directory for the on-disk embedding cache (one subdirectory per model)")
+    embedding_cache_max_entries: int = Field(default=50000, description="Vectors kept per model before least-recently-used entries are evicted")
+    
+    # Embedding Worker Configuration (local models)
+    embedding_worker_enabled: bool = Field(default=True, description="Run local embedding models on a shared worker thread that micro-batches concurrent requests")
+    embedding_worker_max_batch_size: int = Field(default=32, description="Maximum texts the embedding worker coalesces into one batch")
+    embedding_worker_max_wait_ms: float = Field(default=10.0, description="Milliseconds the embedding worker waits for more requests before running a batch")
     
     # Gemini Configuration (for URL context tool)
     gemini_api_key: str = Field(default="", description="Google Gemini API key for url_context tool")
@@ -42,6 +119,15 @@ class Settings(BaseSettings):
         default="research_lab",
         description="Prefix for ChromaDB collections"
     )
+    chroma_server_host: str = Field(
+        default="",
+        description="Chroma server host for client/server mode (empty = embedded PersistentClient)"
+    )
+    chroma_server_port: int = Field(default=8000, description="Chroma server port")
+    chroma_server_autostart: bool = Field(
+        default=False,
+        description="Start a local 'chroma run' server on chroma_persist_directory if none is listening"
+    )
     
     # Memory Configuration
     short_term_memory_size: int = Field(
@@ -63,11 +149,42 @@ class Settings(BaseSettings):
     
     # Agent Configuration
     max_retries: int = Field(default=3, description="Maximum retry attempts")
-    agent_timeout: int = Field(default=60, description="Agent timeout in seconds")
+    agent_timeout: int = Field(default=60, description="Agent timeout in seconds (timed-out agents return partial, degraded results)")
+    agent_prewarm: bool = Field(default=False, description="Build likely domain agents in the background at team setup instead of on first query")
+    agent_prewarm_fields: List[str] = Field(default_factory=list, description="Domain agents prewarmed when agent_prewarm is on (only those in the team; others are built on first use)")
+    node_timeout: int = Field(default=240, description="Deadline in seconds for agent-driven workflow nodes (domain research, synthesis)")
+    
+    # RAG Ingestion Configuration
+    rag_ingest_batch_size: int = Field(default=32, description="Papers embedded and upserted per batch by VectorStore.add_papers")
+    
+    # RAG Retrieval Configuration
+    rag_fast_path_enabled: bool = Field(default=True, description="Accept or reject clear-cut retrievals heuristically and only ask the LLM reflector about ambiguous ones")
+    rag_fast_accept_similarity: float = Field(default=0.6, description="Mean similarity of the top min_documents results needed to accept without LLM reflection")
+    rag_fast_reject_similarity: float = Field(default=0.4, description="Best-result similarity below which retrieval is rejected without LLM reflection")
+    rag_fast_min_overlap: float = Field(default=0.5, description="Share of query terms found in the top results needed to accept without LLM reflection")
+    rag_multi_query_enabled: bool = Field(default=True, description="Retrieve with each agent's specialized query variants in one multi-vector query before falling back to LLM reformulation")
+    rag_rrf_k: int = Field(default=60, description="Reciprocal-rank fusion constant used to merge multi-query results")
+    rag_sparse_index_enabled: bool = Field(default=False, description="Maintain a BM25 keyword index alongside each Chroma collection (not for temp_* collections or a shared Chroma server)")
+    rag_hybrid_search: bool = Field(default=False, description="Blend BM25 keyword scores into VectorStore.search (needs rag_sparse_index_enabled)")
+    rag_hybrid_dense_weight: float = Field(default=0.7, description="Weight of dense similarity in hybrid search scores")
+    rag_hybrid_sparse_weight: float = Field(default=0.3, description="Weight of the max-normalized BM25 score in hybrid search scores")
+    rag_reranker: Literal["none", "cross-encoder", "colbert"] = Field(default="none", description="Second-stage reranker applied to over-fetched search results (colbert needs embeddings_provider='bge-m3')")
+    rag_reranker_model: str = Field(default="BAAI/bge-reranker-v2-m3", description="Cross-encoder model used when rag_reranker='cross-encoder'")
+    rag_rerank_candidates: int = Field(default=50, description="Candidates fetched per search before reranking")
+    rag_context_token_budget: int = Field(default=4000, description="Approximate token budget for reranked documents kept as context (0 = no limit)")
+    rag_search_cache_enabled: bool = Field(default=False, description="Cache VectorStore search results in memory, invalidated by a per-collection version bumped on every write; only for a single process writing to the store (ignored in Chroma client/server mode)")
+    rag_search_cache_size: int = Field(default=256, description="Searches kept in the result cache before least-recently-used entries are evicted")
+    rag_federated_search_enabled: bool = Field(default=False, description="Give synthesis and the cross-domain synthesizer evidence from every rag_{field} collection via one federated search")
+    rag_federated_n_results: int = Field(default=10, description="Results returned by federated cross-field search")
+    rag_federated_per_field: int = Field(default=3, description="Maximum federated search results taken from any one field")
     
     # RAG Seeding Configuration
     rag_seed_enabled: bool = Field(default=True, description="Enable automatic RAG seeding with foundational papers")
     rag_seed_papers_per_field: int = Field(default=10, description="Number of seed papers to fetch per field")
+    rag_seed_background: bool = Field(default=True, description="Seed RAG in a background thread instead of blocking agent construction")
+    rag_seed_batch_size: int = Field(default=16, description="Papers embedded per batch while seeding")
+    rag_seed_max_concurrent_requests: int = Field(default=2, description="Semantic Scholar requests in flight at once while seeding, shared by every field")
+    rag_seed_bundle_path: str = Field(default="./data/seed_bundle.npz", description="Pre-embedded seed bundle imported instead of fetching papers (see rag.seed_bundle)")
     
     # Streamlit Configuration
     streamlit_port: int = Field(default=8501, description="Streamlit port")
@@ -1,17 +1,21 @@
 """LangGraph workflow definition for the research lab - Academic Paper Quality Output."""
 
-from typing import Dict, Any, List, Optional, Literal
+from typing import Dict, Any, List, Optional, Literal, Callable
 from datetime import datetime
 import asyncio
 import json
+import logging
 
 from langgraph.graph import StateGraph, END, START
 from langgraph.checkpoint.memory import MemorySaver
 from langchain_core.messages import HumanMessage, AIMessage
+from langchain_core.runnables import RunnableConfig
 
 from states.workflow_state import WorkflowState, create_initial_state
 from states.agent_state import ResearchQuery, ResearchResult, TeamConfiguration, Paper
 from agents.orchestrator import Orchestrator
+from agents.llm import get_llm
+from agents.rate_limiter import LLM_PRIORITY_HIGH, llm_session
 from config.settings import settings, FIELD_DISPLAY_NAMES
 from agents.support import (
     OntologistAgent,
@@ -25,6 +29,8 @@ from agents.base_agent import BaseResearchAgent
 from knowledge_graph.service import KnowledgeGraphService, PathSamplingResult, GraphPath
 from rag.vector_store import VectorStore
 
+logger = logging.getLogger(__name__)
+
 
 # Academic paper synthesis prompt - produces publication-quality output
 SYNTHESIS_SYSTEM_PROMPT = """You are a principal investigator synthesizing multi-domain research into a comprehensive academic research brief.
@@ -295,17 +301,46 @@ class ResearchGraph:
         
         query = state["current_query"]
         
-        # Execute each domain agent
-        tasks = []
+        # Execute each domain agent; agents stop before the node deadline and return partial
+        # results, keeping a grace period (within node_timeout) to assemble them. The agent
+        # deadline is absolute so time spent building an agent on first use counts against it
+        grace = min(10.0, settings.node_timeout * 0.1)
+        agent_timeout = min(settings.agent_timeout, settings.node_timeout - grace)
+        agent_deadline = asyncio.get_running_loop().time() + agent_timeout
+        tasks = {}
         for field in state["active_domain_agents"]:
             if field in self.orchestrator.domain_agents:
-                tasks.append(self._run_domain_agent(field, query, state))
+                task = asyncio.ensure_future(self._run_domain_agent(field, query, state, agent_deadline))
+                tasks[task] = field
         
         if tasks:
-            results = await asyncio.gather(*tasks, return_exceptions=True)
-            state["domain_results"] = [r for r in results if isinstance(r, ResearchResult)]
-        
-        state["phase_details"]["domain_research"]["status"] = "complete"
+            # Agents still running at the node deadline are cancelled
+            done, pending = await asyncio.wait(tasks, timeout=agent_timeout + grace)
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.wait(pending)
+            
+            results = []
+            for task, field in tasks.items():
+                if task in pending:
+                    logger.warning(f"{field} agent cancelled at the domain research deadline")
+                    results.append(self._degraded_result(field, query, "cancelled at the node deadline"))
+                    continue
+                if task.cancelled():
+                    logger.warning(f"{field} agent was cancelled")
+                    results.append(self._degraded_result(field, query, "cancelled"))
+                    continue
+                error = task.exception()
+                if error is not None:
+                    logger.error(f"{field} agent failed: {error}")
+                    results.append(self._degraded_result(field, query, f"failed: {error}"))
+                elif isinstance(task.result(), ResearchResult):
+                    results.append(task.result())
+            state["domain_results"] = results
+        
+        degraded_count = sum(1 for r in state["domain_results"] if r.degraded)
+        state["phase_details"]["domain_research"]["status"] = "degraded" if degraded_count else "complete"
         state["phase_details"]["domain_research"]["results_count"] = len(state["domain_results"])
         
         # Store node output with detailed agent results
@@ -321,26 +356,41 @@ class ResearchGraph:
                 "summary": result.summary[:200] + "..." if len(result.summary) > 200 else result.summary,
                 "papers_found": len(result.papers),
                 "confidence": result.confidence_score,
-                "insights_count": len(result.insights)
+                "insights_count": len(result.insights),
+                "degraded": result.degraded
             })
             total_papers += len(result.papers)
         
+        output = f"Domain research completed. {len(state['domain_results'])} agent(s) found {total_papers} papers."
+        if degraded_count:
+            output += f" {degraded_count} agent(s) hit the deadline or failed and returned partial results."
         state["node_outputs"]["domain_research"] = {
-            "status": "complete",
+            "status": "degraded" if degraded_count else "complete",
             "timestamp": datetime.now().isoformat(),
-            "output": f"Domain research completed. {len(state['domain_results'])} agent(s) found {total_papers} papers.",
+            "output": output,
             "details": {
                 "agents": agent_summaries,
                 "total_papers": total_papers,
-                "results_count": len(state["domain_results"])
+                "results_count": len(state["domain_results"]),
+                "degraded_count": degraded_count
             }
         }
         
         return state
     
-    async def _run_domain_agent(self, field: str, query: ResearchQuery, state: WorkflowState) -> ResearchResult:
-        """Run a single domain agent and track its activity."""
-        agent = self.orchestrator.domain_agents[field]
+    async def _run_domain_agent(
+        self,
+        field: str,
+        query: ResearchQuery,
+        state: WorkflowState,
+        deadline: Optional[float] = None
+    ) -> ResearchResult:
+        """
+        Run a single domain agent and track its activity.
+        
+        Args:
+            deadline: Event loop time by which the agent returns (partial) results
+        """
         display_name = FIELD_DISPLAY_NAMES.get(field, field)
         
         # Track activity
@@ -352,8 +402,12 @@ class ResearchGraph:
         }
         
         try:
-            result = await agent.research(query)
-            activity["status"] = "complete"
+            agent = await self.orchestrator.domain_agents.aget(field)
+            timeout = None
+            if deadline is not None:
+                timeout = max(0.0, deadline - asyncio.get_running_loop().time())
+            result = await agent.research(query, timeout=timeout)
+            activity["status"] = "degraded" if result.degraded else "complete"
             activity["papers_found"] = len(result.papers)
             activity["confidence"] = result.confidence_score
             return result
@@ -362,6 +416,18 @@ class ResearchGraph:
             activity["error"] = str(e)
             raise
     
+    @staticmethod
+    def _degraded_result(field: str, query: ResearchQuery, reason: str) -> ResearchResult:
+        """Placeholder result for an agent that produced nothing."""
+        return ResearchResult(
+            agent_id=f"{field}_agent",
+            agent_field=field,
+            query=query.query,
+            summary=f"Research incomplete ({reason}).",
+            degraded=True,
+            degraded_reason=reason
+        )
+    
     async def _support_review_node(self, state: WorkflowState) -> WorkflowState:
         """Run support agents to review and enhance findings."""
         state["current_phase"] = "support_review"
@@ -389,7 +455,7 @@ class ResearchGraph:
         
         return state
     
-    async def _synthesis_node(self, state: WorkflowState) -> WorkflowState:
+    async def _synthesis_node(self, state: WorkflowState, config: Optional[RunnableConfig] = None) -> WorkflowState:
         state["current_phase"] = "synthesis"
         state["phase_details"]["synthesis"] = {
             "status": "in_progress",
@@ -402,12 +468,15 @@ class ResearchGraph:
         
         for result in state["domain_results"]:
             field_name = FIELD_DISPLAY_NAMES.get(result.agent_field, result.agent_field)
+            status_line = ""
+            if result.degraded:
+                status_line = f"**Status:** Partial result ({result.degraded_reason}); treat these findings as incomplete\n"
             
             finding_text = f"""
 ## {field_name} Domain Report
 **Agent ID:** {result.agent_id}
 **Confidence Score:** {result.confidence_score:.2f}
-
+{status_line}
 ### Summary
 {result.summary}
 
@@ -429,6 +498,10 @@ class ResearchGraph:
         
         domain_findings = "\n---\n".join(domain_findings_parts) if domain_findings_parts else "No domain research completed."
         
+        # Add the strongest stored evidence from every field, including fields no agent covered
+        if settings.rag_federated_search_enabled:
+            all_papers.extend(await self._federated_papers(state["current_query"].query, all_papers))
+        
         # Format papers list for synthesis
         papers_list_parts = []
         for i, paper in enumerate(all_papers, 1):
@@ -446,20 +519,11 @@ class ResearchGraph:
         ])
         
         # Run synthesis with academic paper prompt
-        from langchain_openai import ChatOpenAI
         from langchain_core.prompts import ChatPromptTemplate
         from langchain_core.output_parsers import StrOutputParser
         
-        llm_kwargs = {
-            "model": settings.openai_model,
-            "openai_api_key": settings.openai_api_key,
-            "temperature": 0.4,  # Slightly higher for more creative synthesis
-            "max_tokens": 8000  # Allow for longer output
-        }
-        if settings.openai_base_url:
-            llm_kwargs["openai_api_base"] = settings.openai_base_url
-        
-        llm = ChatOpenAI(**llm_kwargs)
+        # Slightly higher temperature for more creative synthesis; long output budget comes from the synthesis tier
+        llm = get_llm(temperature=0.4, priority=LLM_PRIORITY_HIGH, call_site="synthesis")
         
         prompt = ChatPromptTemplate.from_messages([
             ("system", SYNTHESIS_SYSTEM_PROMPT),
@@ -468,20 +532,43 @@ class ResearchGraph:
         
         chain = prompt | llm | StrOutputParser()
         
-        state["final_response"] = await chain.ainvoke({
-            "query": state["current_query"].query,
-            "active_domains": active_domains,
-            "domain_findings": domain_findings,
-            "papers_list": papers_list
-        })
+        # Stream tokens so callers can render the brief as it is generated
+        on_token = (config or {}).get("configurable", {}).get("on_synthesis_token")
+        response_parts = []
+        
+        async def stream_synthesis():
+            async for token in chain.astream({
+                "query": state["current_query"].query,
+                "active_domains": active_domains,
+                "domain_findings": domain_findings,
+                "papers_list": papers_list
+            }):
+                response_parts.append(token)
+                if on_token:
+                    try:
+                        on_token(token)
+                    except Exception as e:
+                        logger.warning(f"Synthesis token callback failed: {e}")
         
-        state["phase_details"]["synthesis"]["status"] = "complete"
+        # Keep whatever was streamed if the deadline passes
+        degraded = any(r.degraded for r in state["domain_results"])
+        try:
+            await asyncio.wait_for(stream_synthesis(), timeout=settings.node_timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Synthesis exceeded {settings.node_timeout}s; keeping the partial brief")
+            response_parts.append(
+                f"\n\n---\n*Synthesis stopped at the {settings.node_timeout}s deadline; this brief is incomplete.*"
+            )
+            degraded = True
+        state["final_response"] = "".join(response_parts)
+        
+        state["phase_details"]["synthesis"]["status"] = "degraded" if degraded else "complete"
         
         # Store node output
         if "node_outputs" not in state:
             state["node_outputs"] = {}
         state["node_outputs"]["synthesis"] = {
-            "status": "complete",
+            "status": "degraded" if degraded else "complete",
             "timestamp": datetime.now().isoformat(),
             "output": f"Synthesis completed. Generated {len(state['final_response'])} character research brief.",
             "details": {
@@ -493,6 +580,25 @@ class ResearchGraph:
         
         return state
     
+    async def _federated_papers(self, query: str, known: List[Paper]) -> List[Paper]:
+        """Top papers across all rag_{field} collections that the domain agents did not already cite."""
+        from rag.federated_search import afederated_search_papers
+        
+        try:
+            results = await afederated_search_papers(query, n_results=settings.rag_federated_n_results)
+        except Exception as e:
+            logger.warning(f"Federated search for synthesis failed: {e}")
+            return []
+        
+        seen = {p.id for p in known} | {p.title.strip().lower() for p in known}
+        papers = []
+        for paper, _ in results:
+            if paper.id in seen or paper.title.strip().lower() in seen:
+                continue
+            seen.update((paper.id, paper.title.strip().lower()))
+            papers.append(paper)
+        return papers
+    
     async def _complete_node(self, state: WorkflowState) -> WorkflowState:
         state["current_phase"] = "complete"
         state["completed_at"] = datetime.now().isoformat()
@@ -598,21 +704,25 @@ class ResearchGraph:
             # Create a temporary vector store with the found papers
             # Use a combined collection for all domains
             temp_collection = f"temp_kg_{state['session_id']}"
-            vector_store = VectorStore(collection_name=temp_collection)
+            vector_store = await asyncio.to_thread(VectorStore, collection_name=temp_collection)
             
-            # Add all found papers to the temporary collection
-            for paper in all_papers:
+            try:
+                # Add all found papers to the temporary collection
+                # (papers that fail to embed are skipped)
+                await asyncio.to_thread(vector_store.add_papers, all_papers)
+                
+                # Build knowledge graph from these papers
+                kg_service = KnowledgeGraphService(vector_store=vector_store, field=None)  # No field filter
+                
+                # Build graph from all found papers (its LLM calls wait in the rate
+                # limiter, so they run off the event loop)
+                stats = await asyncio.to_thread(kg_service.build_graph, max_papers=len(all_papers))
+            finally:
+                # The graph holds everything it needs; drop the per-session collection
                 try:
-                    vector_store.add_paper(paper)
+                    await asyncio.to_thread(vector_store.drop)
                 except Exception as e:
-                    # Skip papers that fail to add
-                    continue
-            
-            # Build knowledge graph from these papers
-            kg_service = KnowledgeGraphService(vector_store=vector_store, field=None)  # No field filter
-            
-            # Build graph from all found papers
-            stats = kg_service.build_graph(max_papers=len(all_papers))
+                    logger.warning(f"Could not delete {temp_collection}: {e}")
             
             # Sample path (random for novelty)
             # Extract key terms from query for better path sampling
@@ -628,7 +738,8 @@ class ResearchGraph:
             source = keywords[0] if keywords and len(keywords) > 0 else None
             target = keywords[1] if keywords and len(keywords) > 1 else None
             
-            path_result = kg_service.sample_path(
+            path_result = await asyncio.to_thread(
+                kg_service.sample_path,
                 source=source,
                 target=target,
                 path_type="random",
@@ -706,11 +817,11 @@ class ResearchGraph:
             # Collect contributions from each domain agent
             for field in domain_agents:
                 if field in self.orchestrator.domain_agents:
-                    agent = self.orchestrator.domain_agents[field]
                     field_name = FIELD_DISPLAY_NAMES.get(field, field)
                     
                     # Each agent analyzes the graph path from their field perspective
                     try:
+                        agent = await self.orchestrator.domain_agents.aget(field)
                         field_ontology = await self._generate_field_ontology(
                             agent, graph_path, query, field_name
                         )
@@ -734,7 +845,7 @@ class ResearchGraph:
             if not collaborative_ontology["definitions"]:
                 # Fallback to single ontologist if collaboration fails
                 ontologist = OntologistAgent()
-                ontology_result = ontologist.generate_ontology(graph_path, query)
+                ontology_result = await asyncio.to_thread(ontologist.generate_ontology, graph_path, query)
                 if ontology_result["success"]:
                     collaborative_ontology = ontology_result["ontology"]
                 else:
@@ -834,7 +945,7 @@ Provide field-specific definitions and relationship explanations. Return only va
         chain = prompt | agent._llm | StrOutputParser()
         
         try:
-            response = chain.invoke({})
+            response = await chain.ainvoke({})
             
             # Extract JSON
             json_match = re.search(r'\{.*\}', response, re.DOTALL)
@@ -900,8 +1011,9 @@ FIELD CONTRIBUTIONS:
                 collaborative_context += f"- {field_name}: {contrib.get('concepts_defined', 0)} concepts, {contrib.get('relationships_identified', 0)} relationships\n"
             
             generator = HypothesisGeneratorAgent()
-            hypothesis_result = generator.generate_hypothesis(
-                ontology, 
+            hypothesis_result = await asyncio.to_thread(
+                generator.generate_hypothesis,
+                ontology,
                 path_context + "\n\n" + collaborative_context, 
                 query
             )
@@ -952,7 +1064,7 @@ FIELD CONTRIBUTIONS:
             ontology = state.get("ontology")
             
             expander = HypothesisExpanderAgent()
-            expansion_result = expander.expand_hypothesis(hypothesis, ontology)
+            expansion_result = await asyncio.to_thread(expander.expand_hypothesis, hypothesis, ontology)
             
             if expansion_result["success"]:
                 state["expanded_hypothesis"] = expansion_result["expanded_hypothesis"]
@@ -992,7 +1104,7 @@ FIELD CONTRIBUTIONS:
             expanded = state.get("expanded_hypothesis")
             
             critic = HypothesisCriticAgent()
-            critique_result = critic.critique_hypothesis(hypothesis, expanded)
+            critique_result = await asyncio.to_thread(critic.critique_hypothesis, hypothesis, expanded)
             
             if critique_result["success"]:
                 state["critique"] = critique_result["critique"]
@@ -1037,7 +1149,7 @@ FIELD CONTRIBUTIONS:
             critique = state.get("critique")
             
             planner = ResearchPlannerAgent()
-            plan_result = planner.create_research_plan(hypothesis, expanded, critique)
+            plan_result = await asyncio.to_thread(planner.create_research_plan, hypothesis, expanded, critique)
             
             if plan_result["success"]:
                 state["research_plan"] = plan_result["research_plan"]
@@ -1077,7 +1189,7 @@ FIELD CONTRIBUTIONS:
             expanded = state.get("expanded_hypothesis")
             
             novelty_checker = NoveltyCheckerAgent()
-            novelty_result = novelty_checker.check_novelty(hypothesis, expanded)
+            novelty_result = await asyncio.to_thread(novelty_checker.check_novelty, hypothesis, expanded)
             
             if novelty_result["success"]:
                 state["novelty_assessment"] = novelty_result["novelty_assessment"]
@@ -1105,7 +1217,22 @@ FIELD CONTRIBUTIONS:
         
         return state
     
-    async def run(self, query: str, thread_id: str = "default", workflow_mode: Literal["structured", "automated"] = "structured") -> WorkflowState:
+    async def run(
+        self,
+        query: str,
+        thread_id: str = "default",
+        workflow_mode: Literal["structured", "automated"] = "structured",
+        on_synthesis_token: Optional[Callable[[str], None]] = None
+    ) -> WorkflowState:
+        """
+        Run the workflow for a query.
+        
+        Args:
+            query: Research query
+            thread_id: Checkpointer thread ID
+            workflow_mode: "structured" or "automated"
+            on_synthesis_token: Optional callback receiving synthesis tokens as they stream
+        """
         initial_state = create_initial_state(
             session_id=thread_id, 
             team_config=self.team_config,
@@ -1113,10 +1240,18 @@ FIELD CONTRIBUTIONS:
         )
         initial_state["messages"] = [HumanMessage(content=query)]
         
-        config = {"configurable": {"thread_id": thread_id}}
-        return await self.compiled_graph.ainvoke(initial_state, config)
+        config = {"configurable": {"thread_id": thread_id, "on_synthesis_token": on_synthesis_token}}
+        # LLM calls from every node are queued fairly under this session
+        with llm_session(thread_id):
+            return await self.compiled_graph.ainvoke(initial_state, config)
     
-    def run_sync(self, query: str, thread_id: str = "default", workflow_mode: Literal["structured", "automated"] = "structured") -> WorkflowState:
+    def run_sync(
+        self,
+        query: str,
+        thread_id: str = "default",
+        workflow_mode: Literal["structured", "automated"] = "structured",
+        on_synthesis_token: Optional[Callable[[str], None]] = None
+    ) -> WorkflowState:
         import asyncio
         try:
             try:
@@ -1132,14 +1267,14 @@ FIELD CONTRIBUTIONS:
                 # We might need to use a thread pool.
                 import concurrent.futures
                 with concurrent.futures.ThreadPoolExecutor() as pool:
-                    future = pool.submit(asyncio.run, self.run(query, thread_id, workflow_mode))
+                    future = pool.submit(asyncio.run, self.run(query, thread_id, workflow_mode, on_synthesis_token))
                     return future.result()
             else:
-                return loop.run_until_complete(self.run(query, thread_id, workflow_mode))
+                return loop.run_until_complete(self.run(query, thread_id, workflow_mode, on_synthesis_token))
         except Exception as e:
             # Fallback for any other asyncio weirdness
             logger.error(f"Asyncio error in run_sync: {e}")
-            return asyncio.run(self.run(query, thread_id, workflow_mode))
+            return asyncio.run(self.run(query, thread_id, workflow_mode, on_synthesis_token))
 
 
 def create_research_graph(team_config: TeamConfiguration) -> ResearchGraph:
@@ -170,22 +170,14 @@ class KnowledgeGraphService:
         Returns:
             Tuple of (entities_list, relationships_list)
         """
-        from langchain_openai import ChatOpenAI
         from langchain_core.prompts import ChatPromptTemplate
         from langchain_core.output_parsers import StrOutputParser
+        from agents.llm import get_llm
         import json
         import re
         
-        # Use LLM to extract entities and relationships
-        llm_kwargs = {
-            "model": settings.openai_model,
-            "temperature": 0.1,
-            "openai_api_key": settings.openai_api_key
-        }
-        if settings.openai_base_url:
-            llm_kwargs["openai_api_base"] = settings.openai_base_url
-        
-        llm = ChatOpenAI(**llm_kwargs)
+        # Use the shared LLM to extract entities and relationships
+        llm = get_llm(temperature=0.1, cache=True, call_site="kg_extractor")
         
         prompt = ChatPromptTemplate.from_messages([
             ("system", """You are an expert at extracting scientific concepts and relationships from research papers.
@@ -464,20 +456,12 @@ Return only valid JSON, no markdown formatting.""")
         
         Uses LLM to generate definitions based on graph context.
         """
-        from langchain_openai import ChatOpenAI
         from langchain_core.prompts import ChatPromptTemplate
         from langchain_core.output_parsers import StrOutputParser
+        from agents.llm import get_llm
         import json
         
-        llm_kwargs = {
-            "model": settings.openai_model,
-            "temperature": 0.1,
-            "openai_api_key": settings.openai_api_key
-        }
-        if settings.openai_base_url:
-            llm_kwargs["openai_api_base"] = settings.openai_base_url
-        
-        llm = ChatOpenAI(**llm_kwargs)
+        llm = get_llm(temperature=0.1, cache=True, call_site="kg_definitions")
         
         # Get context for each node (neighbors, relationships)
         node_contexts = {}
@@ -5,10 +5,9 @@ from datetime import datetime
 import uuid
 import json
 
-import chromadb
-from chromadb.config import Settings as ChromaSettings
 from langchain_openai import OpenAIEmbeddings
 
+from rag.chroma_client import delete_collection, get_chroma_client, get_collection
 from states.agent_state import MemoryEntry, Paper
 from config.settings import settings
 
@@ -38,16 +37,14 @@ class LongTermMemory:
         self.agent_id = agent_id
         self.persist_directory = persist_directory or settings.chroma_persist_directory
         
-        # Initialize ChromaDB client
-        self._client = chromadb.PersistentClient(
-            path=self.persist_directory,
-            settings=ChromaSettings(anonymized_telemetry=False)
-        )
+        # Shared ChromaDB client
+        self._client = get_chroma_client(self.persist_directory)
         
         # Create or get collection
         self.collection_name = collection_name or f"{settings.chroma_collection_prefix}_{agent_id}"
-        self._collection = self._client.get_or_create_collection(
-            name=self.collection_name,
+        self._collection = get_collection(
+            self.collection_name,
+            self.persist_directory,
             metadata={"agent_id": agent_id, "created_at": datetime.now().isoformat()}
         )
         
@@ -324,9 +321,10 @@ class LongTermMemory:
     def clear(self):
         """Clear all memories for this agent."""
         # Delete and recreate collection
-        self._client.delete_collection(self.collection_name)
-        self._collection = self._client.create_collection(
-            name=self.collection_name,
+        delete_collection(self.collection_name, self.persist_directory)
+        self._collection = get_collection(
+            self.collection_name,
+            self.persist_directory,
             metadata={"agent_id": self.agent_id, "created_at": datetime.now().isoformat()}
         )
     
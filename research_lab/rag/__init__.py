@@ -1,8 +1,8 @@
 """RAG (Retrieve-Reflect-Retry) module for Research Lab."""
 
-from .vector_store import VectorStore
+from .vector_store import VectorStore, IngestReport
 from .embeddings import EmbeddingManager
 from .retriever import RetrieveReflectRetryRAG
 
-__all__ = ["VectorStore", "EmbeddingManager", "RetrieveReflectRetryRAG"]
+__all__ = ["VectorStore", "IngestReport", "EmbeddingManager", "RetrieveReflectRetryRAG"]
 
@@ -0,0 +1,201 @@
+"""Process-wide ChromaDB client and collection registry.
+
+Every VectorStore and LongTermMemory shares one client per persist directory
+(or per server in client/server mode) and one handle per collection, instead
+of opening a new PersistentClient for each agent.
+
+Client/server mode (settings.chroma_server_host) lets several Streamlit
+workers share one store without SQLite lock contention. With
+settings.chroma_server_autostart, the first client starts a local
+`chroma run` server on settings.chroma_persist_directory as a stand-in for a
+dedicated deployment. When several workers race to start it, the ones that
+lose the port wait for the winner's server instead of failing.
+"""
+
+from typing import Any, Dict, List, Optional, Tuple
+import atexit
+import os
+import shutil
+import subprocess
+import threading
+import time
+
+import chromadb
+import httpx
+from chromadb.config import Settings as ChromaSettings
+
+from config.settings import settings
+
+_clients: Dict[str, Any] = {}
+_collections: Dict[Tuple[str, str], Any] = {}
+_registry_lock = threading.Lock()
+_server_lock = threading.Lock()
+_server_process: Optional[subprocess.Popen] = None
+
+
+def _client_key(persist_directory: Optional[str]) -> str:
+    if settings.chroma_server_host:
+        return f"http://{settings.chroma_server_host}:{settings.chroma_server_port}"
+    return os.path.abspath(persist_directory or settings.chroma_persist_directory)
+
+
+def start_local_chroma_server(
+    path: Optional[str] = None,
+    host: Optional[str] = None,
+    port: Optional[int] = None,
+    timeout: float = 30.0
+) -> subprocess.Popen:
+    """
+    Start a local `chroma run` server and wait until it answers heartbeats.
+    
+    Args:
+        path: Directory the server persists to (default: settings.chroma_persist_directory)
+        host: Bind host (default: settings.chroma_server_host)
+        port: Bind port (default: settings.chroma_server_port)
+        timeout: Seconds to wait for the server to come up
+    
+    Returns:
+        The server process (stopped automatically at exit)
+    """
+    host = host or settings.chroma_server_host or "localhost"
+    port = port or settings.chroma_server_port
+    path = path or settings.chroma_persist_directory
+    
+    executable = shutil.which("chroma")
+    if executable is None:
+        raise RuntimeError("The 'chroma' CLI is not installed; cannot start a local Chroma server")
+    
+    process = subprocess.Popen(
+        [executable, "run", "--path", path, "--host", host, "--port", str(port)],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL
+    )
+    atexit.register(process.terminate)
+    
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Chroma server exited with code {process.returncode}")
+        try:
+            httpx.get(f"http://{host}:{port}/api/v2/heartbeat", timeout=1.0).raise_for_status()
+            return process
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    
+    process.terminate()
+    raise TimeoutError(f"Chroma server on {host}:{port} did not start within {timeout:g}s")
+
+
+def _server_is_up() -> bool:
+    url = f"http://{settings.chroma_server_host}:{settings.chroma_server_port}/api/v2/heartbeat"
+    try:
+        httpx.get(url, timeout=1.0).raise_for_status()
+        return True
+    except httpx.HTTPError:
+        return False
+
+
+def _ensure_local_server(timeout: float = 30.0):
+    """
+    Autostart the local server unless it is already up.
+    
+    Runs outside _registry_lock so lookups of existing clients are not blocked
+    while the server boots. If the start fails (typically because another
+    worker process bound the port first), waits for that server instead.
+    """
+    global _server_process
+    
+    with _server_lock:
+        if _server_process is not None or _server_is_up():
+            return
+        try:
+            _server_process = start_local_chroma_server(timeout=timeout)
+        except (RuntimeError, TimeoutError):
+            if shutil.which("chroma") is None:
+                raise
+            deadline = time.monotonic() + timeout
+            while time.monotonic() < deadline:
+                if _server_is_up():
+                    return
+                time.sleep(0.2)
+            raise
+
+
+def get_chroma_client(persist_directory: Optional[str] = None):
+    """
+    Get the shared Chroma client for a persist directory.
+    
+    In client/server mode persist_directory is ignored: the server owns the
+    storage and every caller shares one HttpClient.
+    
+    Args:
+        persist_directory: Directory for persistence (default: settings.chroma_persist_directory)
+    """
+    key = _client_key(persist_directory)
+    if settings.chroma_server_host and settings.chroma_server_autostart and key not in _clients:
+        _ensure_local_server()
+    
+    with _registry_lock:
+        if key not in _clients:
+            chroma_settings = ChromaSettings(anonymized_telemetry=False)
+            if settings.chroma_server_host:
+                _clients[key] = chromadb.HttpClient(
+                    host=settings.chroma_server_host,
+                    port=settings.chroma_server_port,
+                    settings=chroma_settings
+                )
+            else:
+                _clients[key] = chromadb.PersistentClient(path=key, settings=chroma_settings)
+        return _clients[key]
+
+
+def get_collection(
+    name: str,
+    persist_directory: Optional[str] = None,
+    metadata: Optional[Dict[str, Any]] = None
+):
+    """
+    Get (creating if needed) a cached collection handle.
+    
+    Args:
+        name: Collection name
+        persist_directory: Directory for persistence (default: settings.chroma_persist_directory)
+        metadata: Metadata used only when the collection is created
+    """
+    client = get_chroma_client(persist_directory)
+    key = (_client_key(persist_directory), name)
+    with _registry_lock:
+        if key not in _collections:
+            _collections[key] = client.get_or_create_collection(name=name, metadata=metadata)
+        return _collections[key]
+
+
+def list_collection_names(persist_directory: Optional[str] = None) -> List[str]:
+    """Names of the collections that exist on the client for a persist directory."""
+    client = get_chroma_client(persist_directory)
+    # Older chromadb versions return names, newer ones Collection objects
+    return [getattr(collection, "name", collection) for collection in client.list_collections()]
+
+
+def delete_collection(name: str, persist_directory: Optional[str] = None):
+    """Delete a collection, dropping its cached handle and its BM25 keyword index."""
+    from .sparse_index import drop_sparse_index
+    
+    client = get_chroma_client(persist_directory)
+    with _registry_lock:
+        _collections.pop((_client_key(persist_directory), name), None)
+    client.delete_collection(name)
+    drop_sparse_index(name, persist_directory)
+
+
+def reset_chroma_clients():
+    """Drop all cached clients and handles and stop an autostarted server (used in tests)."""
+    global _server_process
+    
+    with _registry_lock:
+        _collections.clear()
+        _clients.clear()
+    with _server_lock:
+        if _server_process is not None:
+            _server_process.terminate()
+            _server_process = None
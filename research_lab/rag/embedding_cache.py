@@ -0,0 +1,307 @@
+"""On-disk embedding cache keyed by content hash.
+
+Vectors live in a memory-mapped float16 file that grows on demand up to a
+fixed number of slots; a SQLite index maps the SHA-256 of each text to its
+slot and tracks access times for least-recently-used eviction. Each
+embedding model gets its own namespace directory, so vectors from different
+models never mix.
+
+The directory may be shared by several processes: slots are claimed and
+vectors written inside one write-locked (BEGIN IMMEDIATE) transaction, and
+every row carries a tag of the key it holds so a read that races an
+eviction in another process is treated as a miss rather than returning the
+wrong vector.
+"""
+
+from typing import Dict, Iterator, List, Optional, Sequence
+from contextlib import contextmanager
+from pathlib import Path
+import hashlib
+import re
+import sqlite3
+import threading
+import time
+
+import numpy as np
+
+from config.settings import settings
+
+# On-disk layout version (part of the stored shape; a change resets the cache)
+FORMAT_VERSION = 2
+
+# The vector file grows by at least this many slots at a time
+GROW_SLOTS = 1024
+
+# Buffered access-time updates are written once this many are pending or
+# this many seconds have passed (and always before an eviction)
+ACCESS_FLUSH_SIZE = 256
+ACCESS_FLUSH_INTERVAL = 30.0
+
+
+def _tag(key: str) -> int:
+    """Non-zero 64-bit tag of a key (0 marks a slot being written)."""
+    return int(key[:16], 16) or 1
+
+
+class EmbeddingCache:
+    """
+    Content-hash -> vector cache for one embedding model.
+    
+    Thread- and process-safe. Lookups and stores take lists so a batch
+    costs one index transaction; lookups only read, buffering access times.
+    """
+    
+    def __init__(self, directory: str, namespace: str, dimension: int, capacity: int):
+        """
+        Initialize (or reopen) the cache.
+        
+        Args:
+            directory: Root cache directory
+            namespace: Embedding model identifier (e.g. "bge-m3:BAAI/bge-m3")
+            dimension: Embedding dimension
+            capacity: Maximum number of cached vectors
+        """
+        self.namespace = namespace
+        self.dimension = dimension
+        self.capacity = capacity
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "writes": 0, "evictions": 0}
+        self._pending_access: Dict[str, float] = {}
+        self._last_access_flush = time.monotonic()
+        self._dtype = np.dtype([("tag", "<u8"), ("vector", "<f2", (dimension,))])
+        
+        slug = re.sub(r"[^A-Za-z0-9_.-]+", "_", namespace)
+        digest = hashlib.sha256(namespace.encode("utf-8")).hexdigest()[:8]
+        self.path = Path(directory) / f"{slug}-{digest}"
+        self.path.mkdir(parents=True, exist_ok=True)
+        self._vectors_path = self.path / "vectors.f16"
+        
+        # Transactions are explicit (autocommit otherwise)
+        self._conn = sqlite3.connect(
+            str(self.path / "index.sqlite"), timeout=30, isolation_level=None, check_same_thread=False
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        with self._transaction():
+            self._conn.execute(
+                """CREATE TABLE IF NOT EXISTS entries (
+                    key TEXT PRIMARY KEY,
+                    slot INTEGER NOT NULL UNIQUE,
+                    accessed_at REAL NOT NULL
+                )"""
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_entries_accessed ON entries (accessed_at)")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT NOT NULL)")
+            
+            # A changed shape or layout invalidates every stored vector
+            shape = f"v{FORMAT_VERSION}:{dimension}x{capacity}"
+            row = self._conn.execute("SELECT value FROM meta WHERE name = 'shape'").fetchone()
+            if row is None or row[0] != shape or not self._vectors_path.exists():
+                self._conn.execute("DELETE FROM entries")
+                self._conn.execute("INSERT OR REPLACE INTO meta (name, value) VALUES ('shape', ?)", (shape,))
+                with open(self._vectors_path, "wb") as f:
+                    f.truncate(min(GROW_SLOTS, capacity) * self._dtype.itemsize)
+            self._map()
+    
+    @contextmanager
+    def _transaction(self) -> Iterator[None]:
+        """Write transaction holding the index's write lock across processes."""
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+        self._conn.execute("COMMIT")
+    
+    def _map(self):
+        """(Re)map the vector file at its current size."""
+        slots = self._vectors_path.stat().st_size // self._dtype.itemsize
+        self._vectors = np.memmap(self._vectors_path, dtype=self._dtype, mode="r+", shape=(slots,))
+    
+    def _ensure_slot(self, slot: int):
+        """Grow the vector file so `slot` exists (write transaction held)."""
+        if slot < len(self._vectors):
+            return
+        slots = self._vectors_path.stat().st_size // self._dtype.itemsize
+        if slot >= slots:
+            self._vectors.flush()
+            grown = min(self.capacity, max(slot + 1, slots * 2, GROW_SLOTS))
+            with open(self._vectors_path, "r+b") as f:
+                f.truncate(grown * self._dtype.itemsize)
+        self._map()
+    
+    @staticmethod
+    def key(text: str) -> str:
+        """Content hash used as the cache key."""
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+    
+    def get_many(self, texts: Sequence[str]) -> List[Optional[List[float]]]:
+        """Return cached vectors (None for misses) in input order."""
+        keys = [self.key(text) for text in texts]
+        now = time.time()
+        found: Dict[str, int] = {}
+        
+        with self._lock:
+            unique = list(set(keys))
+            for start in range(0, len(unique), 500):
+                chunk = unique[start:start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                found.update(self._conn.execute(
+                    f"SELECT key, slot FROM entries WHERE key IN ({placeholders})", chunk
+                ).fetchall())
+            
+            vectors: Dict[str, List[float]] = {}
+            for key, slot in found.items():
+                if slot >= len(self._vectors):
+                    # Another process grew the file
+                    self._map()
+                if slot >= len(self._vectors):
+                    continue
+                vector = self._vectors["vector"][slot].astype(np.float32).tolist()
+                # Read the tag after the vector: a slot re-used meanwhile no longer carries this key
+                if int(self._vectors["tag"][slot]) == _tag(key):
+                    vectors[key] = vector
+                    self._pending_access[key] = now
+            
+            results = []
+            for key in keys:
+                if key in vectors:
+                    results.append(vectors[key])
+                    self._stats["hits"] += 1
+                else:
+                    results.append(None)
+                    self._stats["misses"] += 1
+            
+            if (
+                len(self._pending_access) >= ACCESS_FLUSH_SIZE
+                or time.monotonic() - self._last_access_flush >= ACCESS_FLUSH_INTERVAL
+            ):
+                with self._transaction():
+                    self._flush_access()
+        return results
+    
+    def _flush_access(self):
+        """Write buffered access times (lock and write transaction held)."""
+        if self._pending_access:
+            self._conn.executemany(
+                "UPDATE entries SET accessed_at = MAX(accessed_at, ?) WHERE key = ?",
+                [(accessed_at, key) for key, accessed_at in self._pending_access.items()]
+            )
+            self._pending_access.clear()
+        self._last_access_flush = time.monotonic()
+    
+    def put_many(self, texts: Sequence[str], vectors: Sequence[Sequence[float]]):
+        """Store vectors, evicting least-recently-used entries when full."""
+        entries = dict(zip((self.key(text) for text in texts), vectors))
+        now = time.time()
+        
+        with self._lock, self._transaction():
+            # Eviction must see the latest access times
+            self._flush_access()
+            for key, vector in entries.items():
+                if len(vector) != self.dimension:
+                    continue
+                
+                row = self._conn.execute("SELECT slot FROM entries WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    slot = row[0]
+                else:
+                    slot = self._free_slot()
+                self._ensure_slot(slot)
+                self._vectors["tag"][slot] = 0
+                self._vectors["vector"][slot] = np.asarray(vector, dtype=np.float16)
+                self._vectors["tag"][slot] = _tag(key)
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO entries (key, slot, accessed_at) VALUES (?, ?, ?)",
+                    (key, slot, now)
+                )
+                self._stats["writes"] += 1
+            
+            self._vectors.flush()
+    
+    def _free_slot(self) -> int:
+        """Pick an unused slot, evicting the least recently used entry if full (write transaction held)."""
+        count = self._conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+        if count < self.capacity:
+            used = self._conn.execute("SELECT COALESCE(MAX(slot), -1) FROM entries").fetchone()[0]
+            if used + 1 < self.capacity:
+                return used + 1
+            # Slots were freed below the high-water mark; find a gap
+            taken = {slot for (slot,) in self._conn.execute("SELECT slot FROM entries")}
+            return next(slot for slot in range(self.capacity) if slot not in taken)
+        
+        key, slot = self._conn.execute(
+            "SELECT key, slot FROM entries ORDER BY accessed_at ASC, rowid ASC LIMIT 1"
+        ).fetchone()
+        self._conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+        self._stats["evictions"] += 1
+        return slot
+    
+    def clear(self):
+        """Remove all cached vectors."""
+        with self._lock, self._transaction():
+            self._conn.execute("DELETE FROM entries")
+            self._pending_access.clear()
+    
+    def stats(self) -> Dict[str, float]:
+        """Get hit/miss counters and the number of cached vectors."""
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+            stats = dict(self._stats)
+            stats["allocated_slots"] = len(self._vectors)
+        
+        lookups = stats["hits"] + stats["misses"]
+        stats.update(
+            entries=entries,
+            capacity=self.capacity,
+            hit_rate=stats["hits"] / lookups if lookups else 0.0
+        )
+        return stats
+    
+    def close(self):
+        """Write buffered access times, flush vectors and close the index."""
+        with self._lock:
+            with self._transaction():
+                self._flush_access()
+            self._vectors.flush()
+            self._conn.close()
+
+
+# Shared caches keyed by namespace
+_caches: Dict[str, EmbeddingCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_embedding_cache(namespace: str, dimension: int) -> Optional[EmbeddingCache]:
+    """
+    Get the shared cache for an embedding model.
+    
+    Args:
+        namespace: Embedding model identifier
+        dimension: Embedding dimension
+    
+    Returns:
+        EmbeddingCache, or None when settings.embedding_cache_enabled is off
+    """
+    if not settings.embedding_cache_enabled:
+        return None
+    
+    with _caches_lock:
+        cache = _caches.get(namespace)
+        if cache is None or cache.dimension != dimension:
+            cache = EmbeddingCache(
+                settings.embedding_cache_dir,
+                namespace,
+                dimension,
+                settings.embedding_cache_max_entries
+            )
+            _caches[namespace] = cache
+        return cache
+
+
+def reset_embedding_caches():
+    """Close and drop all shared caches (used in tests)."""
+    with _caches_lock:
+        for cache in _caches.values():
+            cache.close()
+        _caches.clear()
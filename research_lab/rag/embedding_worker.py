@@ -0,0 +1,227 @@
+"""Embedding worker thread with dynamic micro-batching.
+
+Local models (BGE-M3) run one forward pass per encode call, so many agents
+each embedding a single query from their own threads contend for the CPU
+with batch-of-one passes. The worker owns the model: callers enqueue texts
+and get futures back, and the worker coalesces everything that arrives
+within a short latency window into length-bucketed batches.
+"""
+
+from typing import Any, Callable, Dict, List, Optional
+from concurrent.futures import Future
+import asyncio
+import queue
+import threading
+import time
+
+from config.settings import settings
+
+# Upper bounds of the batch size and latency histogram buckets
+BATCH_SIZE_BUCKETS = [1, 2, 4, 8, 16, 32, 64, float("inf")]
+LATENCY_BUCKETS = [0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0, float("inf")]
+
+# Texts are bucketed by log2 of their length in units of this many characters
+LENGTH_BUCKET_CHARS = 128
+
+_STOP = object()
+
+
+def _observe(histogram: List[int], bounds: List[float], value: float):
+    for i, bound in enumerate(bounds):
+        if value <= bound:
+            histogram[i] += 1
+            break
+
+
+def _histogram_dict(bounds: List[float], counts: List[int]) -> Dict[str, int]:
+    return {("+Inf" if bound == float("inf") else f"{bound:g}"): count for bound, count in zip(bounds, counts)}
+
+
+class EmbeddingWorker:
+    """
+    Single thread that runs every embedding request for one model.
+    
+    Requests arriving within max_wait seconds of each other (up to
+    max_batch_size texts) are grouped by length and encoded together.
+    """
+    
+    def __init__(
+        self,
+        embed_batch: Callable[..., List[List[float]]],
+        max_batch_size: int = 32,
+        max_wait: float = 0.01,
+        name: str = "embedding-worker"
+    ):
+        """
+        Initialize and start the worker.
+        
+        Args:
+            embed_batch: Function embedding a list of texts of one doc_type (a model's embed_documents)
+            max_batch_size: Maximum texts coalesced into one batch
+            max_wait: Seconds to wait for more requests after the first one arrives
+            name: Thread name
+        """
+        self.embed_batch = embed_batch
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max_wait
+        self._queue: "queue.Queue[Any]" = queue.Queue()
+        self._stats_lock = threading.Lock()
+        self._metrics = {
+            "requests": 0,
+            "batches": 0,
+            "errors": 0,
+            "batch_size_histogram": [0] * len(BATCH_SIZE_BUCKETS),
+            "latency_histogram": [0] * len(LATENCY_BUCKETS),
+        }
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+    
+    def submit(self, text: str, doc_type: Optional[str] = None) -> Future:
+        """Queue one text; the future resolves to its embedding."""
+        future: Future = Future()
+        self._queue.put((text, doc_type, future, time.monotonic()))
+        return future
+    
+    def embed_query(self, text: str) -> List[float]:
+        """Embed one query, blocking until its batch has run."""
+        return self.submit(text, "query").result()
+    
+    def embed_documents(self, texts: List[str], doc_type: Optional[str] = None) -> List[List[float]]:
+        """Embed many texts, blocking until all of them have run."""
+        futures = [self.submit(text, doc_type) for text in texts]
+        return [future.result() for future in futures]
+    
+    async def aembed_query(self, text: str) -> List[float]:
+        """Embed one query without blocking the event loop."""
+        return await asyncio.wrap_future(self.submit(text, "query"))
+    
+    async def aembed_documents(self, texts: List[str], doc_type: Optional[str] = None) -> List[List[float]]:
+        """Embed many texts without blocking the event loop."""
+        return list(await asyncio.gather(*(asyncio.wrap_future(self.submit(text, doc_type)) for text in texts)))
+    
+    def _collect(self, first) -> tuple:
+        """Gather requests arriving within the latency window after `first`."""
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is _STOP:
+                return batch, True
+            batch.append(item)
+        return batch, False
+    
+    def _run(self):
+        stop = False
+        while not stop:
+            first = self._queue.get()
+            if first is _STOP:
+                break
+            batch, stop = self._collect(first)
+            
+            # Skip requests whose callers gave up
+            batch = [item for item in batch if item[2].set_running_or_notify_cancel()]
+            
+            # Group by document type (truncation limit) and similar length so
+            # short texts are not padded to long ones
+            buckets: Dict[tuple, list] = {}
+            for item in batch:
+                key = (item[1] or "", (len(item[0]) // LENGTH_BUCKET_CHARS).bit_length())
+                buckets.setdefault(key, []).append(item)
+            
+            for key in sorted(buckets):
+                self._run_bucket(buckets[key])
+    
+    def _run_bucket(self, items: list):
+        texts = [item[0] for item in items]
+        try:
+            embeddings = self.embed_batch(texts, doc_type=items[0][1])
+            if len(embeddings) != len(texts):
+                raise RuntimeError(f"Embedding model returned {len(embeddings)} vectors for {len(texts)} texts")
+        except BaseException as e:
+            for _, _, future, _ in items:
+                future.set_exception(e)
+            with self._stats_lock:
+                self._metrics["errors"] += 1
+            return
+        
+        now = time.monotonic()
+        with self._stats_lock:
+            self._metrics["requests"] += len(items)
+            self._metrics["batches"] += 1
+            _observe(self._metrics["batch_size_histogram"], BATCH_SIZE_BUCKETS, len(items))
+            for _, _, _, enqueued_at in items:
+                _observe(self._metrics["latency_histogram"], LATENCY_BUCKETS, now - enqueued_at)
+        
+        for (_, _, future, _), embedding in zip(items, embeddings):
+            future.set_result(embedding)
+    
+    def stats(self) -> Dict[str, Any]:
+        """Get request/batch counts and batch size and latency histograms."""
+        with self._stats_lock:
+            metrics = dict(self._metrics)
+            metrics["batch_size_histogram"] = _histogram_dict(BATCH_SIZE_BUCKETS, self._metrics["batch_size_histogram"])
+            metrics["latency_histogram"] = _histogram_dict(LATENCY_BUCKETS, self._metrics["latency_histogram"])
+        metrics["queued"] = self._queue.qsize()
+        metrics["mean_batch_size"] = metrics["requests"] / metrics["batches"] if metrics["batches"] else 0.0
+        return metrics
+    
+    def shutdown(self, timeout: Optional[float] = None):
+        """Stop the worker after the queued requests have run."""
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+
+
+# Shared workers keyed by embedding model namespace
+_workers: Dict[str, EmbeddingWorker] = {}
+_workers_lock = threading.Lock()
+
+
+def get_embedding_worker(namespace: str, model) -> Optional[EmbeddingWorker]:
+    """
+    Get the shared worker for a local embedding model.
+    
+    Args:
+        namespace: Embedding model identifier
+        model: BaseEmbeddings instance the worker runs
+    
+    Returns:
+        EmbeddingWorker, or None when settings.embedding_worker_enabled is off
+    """
+    if not settings.embedding_worker_enabled:
+        return None
+    
+    with _workers_lock:
+        worker = _workers.get(namespace)
+        if worker is None or worker.embed_batch != model.embed_documents:
+            if worker is not None:
+                worker.shutdown()
+            worker = EmbeddingWorker(
+                model.embed_documents,
+                max_batch_size=settings.embedding_worker_max_batch_size,
+                max_wait=settings.embedding_worker_max_wait_ms / 1000,
+                name=f"embedding-worker-{namespace}"
+            )
+            _workers[namespace] = worker
+        return worker
+
+
+def get_embedding_worker_stats() -> Dict[str, Dict[str, Any]]:
+    """Get metrics for every embedding worker."""
+    with _workers_lock:
+        workers = dict(_workers)
+    return {namespace: worker.stats() for namespace, worker in workers.items()}
+
+
+def reset_embedding_workers():
+    """Stop and drop all workers (used in tests)."""
+    with _workers_lock:
+        workers = list(_workers.values())
+        _workers.clear()
+    for worker in workers:
+        worker.shutdown(timeout=5)
@@ -1,10 +1,15 @@
 """Embedding utilities for the RAG system.
 
-Supports BGE-M3 (free, local) and OpenAI (API-based) embeddings.
+Supports BGE-M3 (free, local), BGE-M3 on ONNX Runtime (optionally int8
+quantized, for CPU-only hosts) and OpenAI (API-based) embeddings.
 """
 
-from typing import List, Optional, Union
+from typing import Any, Dict, List, Optional, Union
 from abc import ABC, abstractmethod
+from pathlib import Path
+import asyncio
+import hashlib
+import threading
 import numpy as np
 
 from config.settings import settings
@@ -17,6 +22,16 @@ except ImportError:
     BGE_M3_AVAILABLE = False
     BGEM3FlagModel = None
 
+# Try to import ONNX Runtime (quantized CPU backend)
+try:
+    import onnxruntime as ort
+    from tokenizers import Tokenizer
+    ONNX_RUNTIME_AVAILABLE = True
+except ImportError:
+    ONNX_RUNTIME_AVAILABLE = False
+    ort = None
+    Tokenizer = None
+
 # Try to import OpenAI embeddings
 try:
     from langchain_openai import OpenAIEmbeddings
@@ -26,6 +41,55 @@ except ImportError:
     OpenAIEmbeddings = None
 
 
+# Document types with their own truncation policy
+DOC_TYPES = ("query", "abstract", "full_text")
+
+
+def embedding_model_id(model: Optional[str] = None) -> str:
+    """
+    Identifier of the configured embedding model.
+    
+    Vectors with the same identifier are interchangeable: it namespaces the
+    embedding cache and is recorded in seed bundles. The ONNX backend in
+    full precision runs the same weights as bge-m3 and shares its
+    identifier; int8 weights give different vectors and get their own.
+    
+    Args:
+        model: Model name (only used for OpenAI provider)
+    """
+    if settings.embeddings_provider == "openai":
+        return f"openai:{model or settings.openai_embeddings_model}"
+    model_id = f"bge-m3:{settings.bge_m3_model_name}"
+    if settings.embeddings_provider == "bge-m3-onnx" and settings.bge_m3_onnx_quantize:
+        model_id += ":int8"
+    return model_id
+
+
+def max_length_for(doc_type: Optional[str]) -> int:
+    """
+    Token limit used when encoding a document type with BGE-M3.
+    
+    Queries and paper abstracts are short, so truncating them early keeps
+    one stray long text from inflating their batches; full text keeps the
+    model's whole context.
+    
+    Args:
+        doc_type: One of DOC_TYPES (None means full text)
+    """
+    if doc_type == "query":
+        return settings.bge_m3_query_max_length
+    if doc_type == "abstract":
+        return settings.bge_m3_abstract_max_length
+    return settings.bge_m3_max_length
+
+
+def _length_sorted_batches(lengths: List[int], batch_size: int) -> List[List[int]]:
+    """Split indices into batches of similar token length, shortest first."""
+    order = sorted(range(len(lengths)), key=lambda i: lengths[i])
+    batch_size = max(1, batch_size)
+    return [order[start:start + batch_size] for start in range(0, len(order), batch_size)]
+
+
 class BaseEmbeddings(ABC):
     """Base class for embeddings models."""
     
@@ -35,8 +99,8 @@ class BaseEmbeddings(ABC):
         pass
     
     @abstractmethod
-    def embed_documents(self, texts: List[str]) -> List[List[float]]:
-        """Generate embeddings for multiple documents."""
+    def embed_documents(self, texts: List[str], doc_type: Optional[str] = None) -> List[List[float]]:
+        """Generate embeddings for multiple documents of one type (see DOC_TYPES)."""
         pass
     
     @abstractmethod
@@ -71,16 +135,20 @@ class BGEM3Embeddings(BaseEmbeddings):
         self.model_name = model_name
         self.use_fp16 = use_fp16
         self._model = None
+        # One fast tokenizer and model are shared by the embedding worker and
+        # the ColBERT reranker; loading and every model call hold this lock
+        self._lock = threading.RLock()
         self._dimension = 1024  # BGE-M3 produces 1024-dimensional embeddings
     
     @property
     def model(self):
         """Lazy load the model to avoid loading it at import time."""
-        if self._model is None:
-            print(f"Loading BGE-M3 model: {self.model_name}...")
-            self._model = BGEM3FlagModel(self.model_name, use_fp16=self.use_fp16)
-            print("BGE-M3 model loaded successfully!")
-        return self._model
+        with self._lock:
+            if self._model is None:
+                print(f"Loading BGE-M3 model: {self.model_name}...")
+                self._model = BGEM3FlagModel(self.model_name, use_fp16=self.use_fp16)
+                print("BGE-M3 model loaded successfully!")
+            return self._model
     
     def embed_query(self, text: str) -> List[float]:
         """
@@ -92,15 +160,15 @@ class BGEM3Embeddings(BaseEmbeddings):
         Returns:
             Embedding vector (1024 dimensions)
         """
-        result = self.model.encode([text], return_dense=True, return_sparse=False, return_colbert_vecs=False)
-        return result['dense_vecs'][0].tolist()
+        return self._encode([text], max_length_for("query"))[0]
     
-    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+    def embed_documents(self, texts: List[str], doc_type: Optional[str] = None) -> List[List[float]]:
         """
         Generate dense embeddings for multiple documents.
         
         Args:
             texts: List of texts to embed
+            doc_type: Document type selecting the truncation limit (default: full text)
             
         Returns:
             List of embedding vectors (each 1024 dimensions)
@@ -108,8 +176,185 @@ class BGEM3Embeddings(BaseEmbeddings):
         if not texts:
             return []
         
-        result = self.model.encode(texts, return_dense=True, return_sparse=False, return_colbert_vecs=False)
-        return [vec.tolist() for vec in result['dense_vecs']]
+        return self._encode(texts, max_length_for(doc_type))
+    
+    def compute_score(self, sentence_pairs: List[List[str]], **kwargs) -> Dict[str, List[float]]:
+        """
+        Score (query, passage) pairs with the model's compute_score.
+        
+        Args:
+            sentence_pairs: [query, passage] pairs
+            **kwargs: Passed through to BGEM3FlagModel.compute_score
+        
+        Returns:
+            Scores per retrieval mode (e.g. "colbert")
+        """
+        with self._lock:
+            return self.model.compute_score(sentence_pairs, **kwargs)
+    
+    def _encode(self, texts: List[str], max_length: int) -> List[List[float]]:
+        """
+        Encode texts in batches of similar token length.
+        
+        Texts are sorted by token count and split into batches of
+        settings.bge_m3_batch_size; each batch is padded only to its own
+        longest text instead of the longest text in the whole call.
+        """
+        with self._lock:
+            return self._encode_locked(texts, max_length)
+    
+    def _encode_locked(self, texts: List[str], max_length: int) -> List[List[float]]:
+        token_ids = self.model.tokenizer(texts, truncation=True, max_length=max_length)["input_ids"]
+        lengths = [len(ids) for ids in token_ids]
+        
+        vectors: List[Optional[List[float]]] = [None] * len(texts)
+        for batch in _length_sorted_batches(lengths, settings.bge_m3_batch_size):
+            result = self.model.encode(
+                [texts[i] for i in batch],
+                batch_size=len(batch),
+                max_length=max(lengths[i] for i in batch),
+                return_dense=True,
+                return_sparse=False,
+                return_colbert_vecs=False
+            )
+            for i, vec in zip(batch, result['dense_vecs']):
+                vectors[i] = vec.tolist()
+        return vectors
+    
+    def get_embedding_dimension(self) -> int:
+        """Get the dimension of embeddings produced by this model."""
+        return self._dimension
+
+
+class ONNXBGEM3Embeddings(BaseEmbeddings):
+    """
+    BGE-M3 dense embeddings on ONNX Runtime.
+    
+    Runs the ONNX export of the same model, optionally with int8 weights
+    from onnxruntime's dynamic quantization, for hosts where FP16 gives
+    no speedup. Output vectors stay close to the reference model (see
+    tests/test_rag.py for the parity bound).
+    """
+    
+    def __init__(
+        self,
+        model_name: str = "BAAI/bge-m3",
+        model_path: str = "",
+        quantize: bool = True,
+        num_threads: int = 0
+    ):
+        """
+        Initialize the ONNX backend (the model is loaded on first use).
+        
+        Args:
+            model_name: Hugging Face repository with an onnx/ export (used when model_path is empty)
+            model_path: Local directory containing model.onnx and tokenizer.json
+            quantize: Run a dynamically int8-quantized copy of the model
+            num_threads: ONNX Runtime intra-op threads (0 lets the runtime decide)
+        """
+        if not ONNX_RUNTIME_AVAILABLE:
+            raise ImportError(
+                "onnxruntime is not installed. Install it with: pip install onnxruntime tokenizers"
+            )
+        
+        self.model_name = model_name
+        self.model_path = model_path
+        self.quantize = quantize
+        self.num_threads = num_threads
+        self._session = None
+        self._tokenizer = None
+        self._lock = threading.Lock()
+        self._dimension = 1024
+    
+    def _resolve_model_dir(self) -> Path:
+        if self.model_path:
+            return Path(self.model_path)
+        
+        from huggingface_hub import snapshot_download
+        
+        snapshot = snapshot_download(self.model_name, allow_patterns=["onnx/*"])
+        return Path(snapshot) / "onnx"
+    
+    def _quantized_model(self, model_file: Path) -> Path:
+        """
+        Create (once) an int8 copy of the model in settings.bge_m3_onnx_cache_dir.
+        
+        The source directory may be a read-only Hugging Face snapshot, so
+        the copy is keyed by the source path instead of written beside it.
+        """
+        source = model_file.resolve()
+        digest = hashlib.sha256(str(source).encode("utf-8")).hexdigest()[:12]
+        quantized = Path(settings.bge_m3_onnx_cache_dir) / digest / "model_int8.onnx"
+        if not quantized.exists():
+            quantized.parent.mkdir(parents=True, exist_ok=True)
+            from onnxruntime.quantization import QuantType, quantize_dynamic
+            
+            print(f"Quantizing {model_file} to int8...")
+            quantize_dynamic(str(model_file), str(quantized), weight_type=QuantType.QInt8, use_external_data_format=True)
+        return quantized
+    
+    def _load(self):
+        """Load the tokenizer and inference session (lock held)."""
+        model_dir = self._resolve_model_dir()
+        model_file = model_dir / "model.onnx"
+        if self.quantize:
+            model_file = self._quantized_model(model_file)
+        
+        print(f"Loading BGE-M3 ONNX model: {model_file}...")
+        options = ort.SessionOptions()
+        if self.num_threads:
+            options.intra_op_num_threads = self.num_threads
+        self._session = ort.InferenceSession(str(model_file), options, providers=["CPUExecutionProvider"])
+        self._tokenizer = Tokenizer.from_file(str(model_dir / "tokenizer.json"))
+        print("BGE-M3 ONNX model loaded successfully!")
+    
+    def embed_query(self, text: str) -> List[float]:
+        """Generate dense embedding for a single query."""
+        return self._encode([text], max_length_for("query"))[0]
+    
+    def embed_documents(self, texts: List[str], doc_type: Optional[str] = None) -> List[List[float]]:
+        """Generate dense embeddings for multiple documents."""
+        if not texts:
+            return []
+        
+        return self._encode(texts, max_length_for(doc_type))
+    
+    def _encode(self, texts: List[str], max_length: int) -> List[List[float]]:
+        """Encode texts in batches of similar token length (CLS pooling, L2-normalized)."""
+        with self._lock:
+            if self._session is None:
+                self._load()
+            self._tokenizer.no_padding()
+            self._tokenizer.enable_truncation(max_length)
+            encodings = self._tokenizer.encode_batch(texts)
+        
+        pad_id = self._tokenizer.token_to_id("<pad>")
+        pad_id = 1 if pad_id is None else pad_id
+        input_names = {i.name for i in self._session.get_inputs()}
+        output_names = [o.name for o in self._session.get_outputs()]
+        output = "dense_vecs" if "dense_vecs" in output_names else output_names[0]
+        
+        vectors: List[Optional[List[float]]] = [None] * len(texts)
+        for batch in _length_sorted_batches([len(e.ids) for e in encodings], settings.bge_m3_batch_size):
+            width = max(len(encodings[i].ids) for i in batch)
+            input_ids = np.full((len(batch), width), pad_id, dtype=np.int64)
+            attention_mask = np.zeros((len(batch), width), dtype=np.int64)
+            for row, i in enumerate(batch):
+                ids = encodings[i].ids
+                input_ids[row, :len(ids)] = ids
+                attention_mask[row, :len(ids)] = 1
+            
+            feed = {"input_ids": input_ids, "attention_mask": attention_mask}
+            if "token_type_ids" in input_names:
+                feed["token_type_ids"] = np.zeros_like(input_ids)
+            result = np.asarray(self._session.run([output], feed)[0], dtype=np.float32)
+            if result.ndim == 3:
+                result = result[:, 0]  # CLS token
+            result /= np.linalg.norm(result, axis=1, keepdims=True).clip(min=1e-12)
+            
+            for row, i in enumerate(batch):
+                vectors[i] = result[row].tolist()
+        return vectors
     
     def get_embedding_dimension(self) -> int:
         """Get the dimension of embeddings produced by this model."""
@@ -148,8 +393,8 @@ class OpenAIEmbeddingsWrapper(BaseEmbeddings):
         """Generate embedding for a single query."""
         return self._embeddings.embed_query(text)
     
-    def embed_documents(self, texts: List[str]) -> List[List[float]]:
-        """Generate embeddings for multiple documents."""
+    def embed_documents(self, texts: List[str], doc_type: Optional[str] = None) -> List[List[float]]:
+        """Generate embeddings for multiple documents (the API truncates on its own)."""
         return self._embeddings.embed_documents(texts)
     
     def get_embedding_dimension(self) -> int:
@@ -173,7 +418,7 @@ def get_embeddings_model(model: Optional[str] = None) -> BaseEmbeddings:
     Uses a singleton pattern to ensure BGE-M3 is only loaded once,
     even when multiple agents/vector stores are created.
     
-    Supports BGE-M3 (free, local) and OpenAI (API-based).
+    Supports BGE-M3 (free, local), BGE-M3 on ONNX Runtime and OpenAI (API-based).
     
     Args:
         model: Model name (only used for OpenAI provider)
@@ -186,6 +431,8 @@ def get_embeddings_model(model: Optional[str] = None) -> BaseEmbeddings:
     # Create cache key based on provider and model
     if provider == "bge-m3":
         cache_key = f"bge-m3_{settings.bge_m3_model_name}_{settings.bge_m3_use_fp16}"
+    elif provider == "bge-m3-onnx":
+        cache_key = f"bge-m3-onnx_{settings.bge_m3_onnx_path or settings.bge_m3_model_name}_{settings.bge_m3_onnx_quantize}"
     else:
         cache_key = f"openai_{model or settings.openai_embeddings_model}"
     
@@ -203,6 +450,13 @@ def get_embeddings_model(model: Optional[str] = None) -> BaseEmbeddings:
             model_name=settings.bge_m3_model_name,
             use_fp16=settings.bge_m3_use_fp16
         )
+    elif provider == "bge-m3-onnx":
+        embeddings = ONNXBGEM3Embeddings(
+            model_name=settings.bge_m3_model_name,
+            model_path=settings.bge_m3_onnx_path,
+            quantize=settings.bge_m3_onnx_quantize,
+            num_threads=settings.bge_m3_onnx_threads
+        )
     elif provider == "openai":
         if not OPENAI_EMBEDDINGS_AVAILABLE:
             raise ImportError(
@@ -260,7 +514,8 @@ class EmbeddingManager:
     Manages embeddings generation for the RAG system.
     
     Provides a unified interface for generating embeddings using either
-    BGE-M3 (free, local) or OpenAI (API-based) models.
+    BGE-M3 (free, local) or OpenAI (API-based) models. Vectors are served
+    from the on-disk embedding cache when enabled.
     """
     
     def __init__(self, model: Optional[str] = None):
@@ -270,8 +525,24 @@ class EmbeddingManager:
         Args:
             model: Model name (only used for OpenAI provider)
         """
+        from .embedding_cache import get_embedding_cache
+        from .embedding_worker import get_embedding_worker
+        
         self._embeddings = get_embeddings_model(model)
-        self.model = model or (settings.bge_m3_model_name if settings.embeddings_provider == "bge-m3" else settings.openai_embeddings_model)
+        self.model = model or (settings.openai_embeddings_model if settings.embeddings_provider == "openai" else settings.bge_m3_model_name)
+        self._cache = get_embedding_cache(self.namespace, self.get_embedding_dimension())
+        
+        # Local models run behind the shared micro-batching worker; the OpenAI
+        # client batches requests itself
+        self._worker = None
+        if settings.embeddings_provider != "openai":
+            self._worker = get_embedding_worker(self.namespace, self._embeddings)
+        self._encoder = self._worker or self._embeddings
+    
+    @property
+    def namespace(self) -> str:
+        """Identifier of the model, used to keep cached vectors apart."""
+        return embedding_model_id(self.model)
     
     def embed_query(self, text: str) -> List[float]:
         """
@@ -283,19 +554,94 @@ class EmbeddingManager:
         Returns:
             Embedding vector
         """
-        return self._embeddings.embed_query(text)
+        if self._cache is None:
+            return self._encoder.embed_query(text)
+        
+        key = self._cache_keys([text], "query")
+        cached = self._cache.get_many(key)[0]
+        if cached is not None:
+            return cached
+        
+        embedding = self._encoder.embed_query(text)
+        self._cache.put_many(key, [embedding])
+        return embedding
     
-    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+    def _cache_keys(self, texts: List[str], doc_type: Optional[str]) -> List[str]:
+        """Cache keys for texts; truncation limits differ per type, so BGE-M3 keys include it."""
+        if settings.embeddings_provider == "openai":
+            return list(texts)
+        return [f"{max_length_for(doc_type)}\x00{text}" for text in texts]
+    
+    def embed_documents(self, texts: List[str], doc_type: Optional[str] = None) -> List[List[float]]:
         """
         Generate embeddings for multiple documents.
         
+        Only texts missing from the cache are sent to the model.
+        
         Args:
             texts: List of texts to embed
+            doc_type: Document type selecting the truncation limit (default: full text)
             
         Returns:
             List of embedding vectors
         """
-        return self._embeddings.embed_documents(texts)
+        if self._cache is None or not texts:
+            return self._encoder.embed_documents(texts, doc_type=doc_type)
+        
+        keys = self._cache_keys(texts, doc_type)
+        embeddings = self._cache.get_many(keys)
+        missing = [i for i, embedding in enumerate(embeddings) if embedding is None]
+        if missing:
+            computed = self._encoder.embed_documents([texts[i] for i in missing], doc_type=doc_type)
+            for i, embedding in zip(missing, computed):
+                embeddings[i] = embedding
+            self._cache.put_many([keys[i] for i in missing], computed)
+        return embeddings
+    
+    async def aembed_query(self, text: str) -> List[float]:
+        """
+        Generate embedding for a single query without blocking the event loop.
+        
+        Args:
+            text: Text to embed
+            
+        Returns:
+            Embedding vector
+        """
+        return (await self.aembed_documents([text], doc_type="query"))[0]
+    
+    async def aembed_documents(self, texts: List[str], doc_type: Optional[str] = None) -> List[List[float]]:
+        """
+        Generate embeddings for multiple documents without blocking the event loop.
+        
+        Args:
+            texts: List of texts to embed
+            doc_type: Document type selecting the truncation limit (default: full text)
+            
+        Returns:
+            List of embedding vectors
+        """
+        if not texts:
+            return []
+        
+        keys = self._cache_keys(texts, doc_type)
+        embeddings = self._cache.get_many(keys) if self._cache is not None else [None] * len(texts)
+        missing = [i for i, embedding in enumerate(embeddings) if embedding is None]
+        if missing:
+            missing_texts = [texts[i] for i in missing]
+            if self._worker is not None:
+                computed = await self._worker.aembed_documents(missing_texts, doc_type=doc_type)
+            else:
+                computed = await asyncio.to_thread(self._embeddings.embed_documents, missing_texts, doc_type)
+            for i, embedding in zip(missing, computed):
+                embeddings[i] = embedding
+            if self._cache is not None:
+                self._cache.put_many([keys[i] for i in missing], computed)
+        return embeddings
+    
+    def get_worker_stats(self) -> Optional[Dict[str, Any]]:
+        """Get batch size and latency histograms of the embedding worker, if one is used."""
+        return self._worker.stats() if self._worker is not None else None
     
     def similarity(self, embedding1: List[float], embedding2: List[float]) -> float:
         """
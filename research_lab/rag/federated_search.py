@@ -0,0 +1,191 @@
+"""Federated search across every field's RAG collection.
+
+Domain agents each search their own rag_{field} collection. Cross-domain
+synthesis needs the best evidence from all of them, so federated search
+embeds the query once and runs one nearest-neighbour query per collection
+concurrently.
+
+Every collection is embedded with the same model and queried with the same
+vector, so the dense similarity (1 / (1 + squared L2 distance)) is on one
+scale across fields and results merge by it directly. Hybrid BM25 scores are
+not used: they are normalized within a collection and would not compare.
+
+By default only rag_{field} collections that already exist are searched,
+through VectorStores cached for the life of the process.
+"""
+
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import logging
+import threading
+
+from .chroma_client import _client_key, list_collection_names
+from .embeddings import EmbeddingManager
+from .vector_store import VectorStore
+from config.settings import settings, RESEARCH_FIELDS
+from states.agent_state import Paper
+
+logger = logging.getLogger(__name__)
+
+_shared_stores: Dict[Tuple[str, str], VectorStore] = {}
+_shared_manager: Optional[EmbeddingManager] = None
+_shared_lock = threading.Lock()
+
+
+def field_stores(
+    fields: Optional[Sequence[str]] = None,
+    embedding_manager: Optional[EmbeddingManager] = None,
+    persist_directory: Optional[str] = None
+) -> Dict[str, VectorStore]:
+    """New VectorStores for the rag_{field} collections (created if missing), sharing one embedding manager."""
+    embedding_manager = embedding_manager or EmbeddingManager()
+    return {
+        field: VectorStore(f"rag_{field}", persist_directory=persist_directory, embedding_manager=embedding_manager)
+        for field in (fields or RESEARCH_FIELDS)
+    }
+
+
+def existing_field_stores(persist_directory: Optional[str] = None) -> Dict[str, VectorStore]:
+    """
+    Cached VectorStores for the rag_{field} collections that already exist.
+    
+    Fields this deployment never seeded are skipped instead of getting empty
+    collections, and stores are built once per process and reused.
+    """
+    global _shared_manager
+    
+    existing = set(list_collection_names(persist_directory))
+    client_key = _client_key(persist_directory)
+    stores = {}
+    with _shared_lock:
+        for field in RESEARCH_FIELDS:
+            key = (client_key, field)
+            if f"rag_{field}" not in existing:
+                _shared_stores.pop(key, None)
+                continue
+            if key not in _shared_stores:
+                _shared_manager = _shared_manager or EmbeddingManager()
+                _shared_stores[key] = VectorStore(
+                    f"rag_{field}", persist_directory=persist_directory, embedding_manager=_shared_manager
+                )
+            stores[field] = _shared_stores[key]
+    return stores
+
+
+def reset_field_stores():
+    """Drop the cached field stores (used in tests)."""
+    global _shared_manager
+    
+    with _shared_lock:
+        _shared_stores.clear()
+        _shared_manager = None
+
+
+def merge_field_results(
+    rankings: Dict[str, List[Dict[str, Any]]],
+    n_results: int,
+    per_field: int
+) -> List[Dict[str, Any]]:
+    """
+    Merge per-field rankings by similarity, keeping at most per_field results from each field.
+    
+    A document stored in several collections is kept once, with its best similarity.
+    """
+    merged: Dict[str, Dict[str, Any]] = {}
+    for field, ranking in rankings.items():
+        for result in ranking[:per_field]:
+            entry = merged.get(result["id"])
+            if entry is None or result["similarity"] > entry["similarity"]:
+                merged[result["id"]] = {**result, "field": field}
+    
+    return sorted(merged.values(), key=lambda r: r["similarity"], reverse=True)[:n_results]
+
+
+def _query_store(store: VectorStore, query_embedding: List[float], n_results: int, where: Optional[Dict[str, Any]]):
+    try:
+        return store.search_by_vector(query_embedding, n_results=n_results, where=where)
+    except Exception as e:
+        logger.warning(f"Federated search skipped {store.collection_name}: {e}")
+        return []
+
+
+def federated_search(
+    query: str,
+    stores: Optional[Dict[str, VectorStore]] = None,
+    n_results: int = 10,
+    per_field: Optional[int] = None,
+    where: Optional[Dict[str, Any]] = None
+) -> List[Dict[str, Any]]:
+    """
+    Search all field collections with one query embedding.
+    
+    Args:
+        query: Search query
+        stores: Field -> VectorStore (default: existing_field_stores())
+        n_results: Number of merged results to return
+        per_field: Maximum results taken from any one field (default: settings.rag_federated_per_field)
+        where: Optional filter applied in every collection
+    
+    Returns:
+        Merged results, best first, each tagged with its "field"
+    """
+    stores = stores if stores is not None else existing_field_stores()
+    if not stores:
+        return []
+    per_field = per_field or settings.rag_federated_per_field
+    
+    manager = next(iter(stores.values())).embedding_manager
+    query_embedding = manager.embed_query(query)
+    
+    with ThreadPoolExecutor(max_workers=len(stores), thread_name_prefix="federated-search") as pool:
+        futures = {
+            field: pool.submit(_query_store, store, query_embedding, per_field, where)
+            for field, store in stores.items()
+        }
+        rankings = {field: future.result() for field, future in futures.items()}
+    
+    return merge_field_results(rankings, n_results, per_field)
+
+
+async def afederated_search(
+    query: str,
+    stores: Optional[Dict[str, VectorStore]] = None,
+    n_results: int = 10,
+    per_field: Optional[int] = None,
+    where: Optional[Dict[str, Any]] = None
+) -> List[Dict[str, Any]]:
+    """Async version of federated_search."""
+    if stores is None:
+        stores = await asyncio.to_thread(existing_field_stores)
+    if not stores:
+        return []
+    per_field = per_field or settings.rag_federated_per_field
+    
+    manager = next(iter(stores.values())).embedding_manager
+    aembed_query = getattr(manager, "aembed_query", None)
+    if aembed_query is not None:
+        query_embedding = await aembed_query(query)
+    else:
+        query_embedding = await asyncio.to_thread(manager.embed_query, query)
+    
+    results = await asyncio.gather(*(
+        asyncio.to_thread(_query_store, store, query_embedding, per_field, where)
+        for store in stores.values()
+    ))
+    return merge_field_results(dict(zip(stores, results)), n_results, per_field)
+
+
+async def afederated_search_papers(
+    query: str,
+    stores: Optional[Dict[str, VectorStore]] = None,
+    n_results: int = 10,
+    per_field: Optional[int] = None
+) -> List[Tuple[Paper, float]]:
+    """Federated search restricted to papers, as (Paper, similarity_score) tuples."""
+    results = await afederated_search(query, stores, n_results, per_field, where={"doc_type": "paper"})
+    papers = VectorStore._results_to_papers(results)
+    for (paper, similarity), result in zip(papers, results):
+        paper.field = paper.field or result["field"]
+        paper.relevance_score = similarity
+    return papers
@@ -0,0 +1,185 @@
+"""Second-stage rerankers for retrieved documents.
+
+Retrieval over-fetches candidates by vector similarity; a reranker scores
+each (query, document) pair with a stronger local model and the best ones
+are kept up to a result count and a context token budget.
+
+Rerankers:
+- "cross-encoder": BGE reranker cross-encoder (FlagEmbedding FlagReranker)
+- "colbert": BGE-M3 multi-vector late interaction, reusing the shared
+  BGE-M3 embeddings model
+"""
+
+from typing import Any, Dict, List, Optional
+from abc import ABC, abstractmethod
+import threading
+
+from config.settings import settings
+
+# Try to import the FlagEmbedding cross-encoder
+try:
+    from FlagEmbedding import FlagReranker
+    FLAG_RERANKER_AVAILABLE = True
+except ImportError:
+    FLAG_RERANKER_AVAILABLE = False
+    FlagReranker = None
+
+
+class BaseReranker(ABC):
+    """Base class for rerankers."""
+    
+    @abstractmethod
+    def score(self, query: str, documents: List[str]) -> List[float]:
+        """Relevance score of each document for the query (higher is better)."""
+        pass
+
+
+class CrossEncoderReranker(BaseReranker):
+    """Cross-encoder reranker (default: BAAI/bge-reranker-v2-m3)."""
+    
+    def __init__(self, model_name: str = "BAAI/bge-reranker-v2-m3", use_fp16: bool = True):
+        if not FLAG_RERANKER_AVAILABLE:
+            raise ImportError(
+                "FlagEmbedding is not installed. Install it with: pip install FlagEmbedding"
+            )
+        
+        self.model_name = model_name
+        self.use_fp16 = use_fp16
+        self._model = None
+    
+    @property
+    def model(self):
+        """Lazy load the model to avoid loading it at import time."""
+        if self._model is None:
+            print(f"Loading reranker model: {self.model_name}...")
+            self._model = FlagReranker(self.model_name, use_fp16=self.use_fp16)
+            print("Reranker model loaded successfully!")
+        return self._model
+    
+    def score(self, query: str, documents: List[str]) -> List[float]:
+        if not documents:
+            return []
+        scores = self.model.compute_score(
+            [[query, doc] for doc in documents],
+            normalize=True,
+            max_length=settings.bge_m3_abstract_max_length
+        )
+        return [float(s) for s in (scores if isinstance(scores, list) else [scores])]
+
+
+class ColBERTReranker(BaseReranker):
+    """
+    BGE-M3 late-interaction (ColBERT) reranker on the shared BGE-M3 model.
+    
+    Scoring goes through BGEM3Embeddings.compute_score, which holds the
+    model lock so it never overlaps an encode on the embedding worker.
+    """
+    
+    def __init__(self, embeddings=None):
+        """
+        Args:
+            embeddings: BGEM3Embeddings instance (default: the shared model)
+        """
+        if embeddings is None:
+            from .embeddings import get_embeddings_model
+            embeddings = get_embeddings_model()
+        # Checked on the class: reading embeddings.model would load the model here
+        if not callable(getattr(type(embeddings), "compute_score", None)):
+            raise ValueError("The colbert reranker needs embeddings_provider='bge-m3'")
+        self._embeddings = embeddings
+    
+    def score(self, query: str, documents: List[str]) -> List[float]:
+        if not documents:
+            return []
+        scores = self._embeddings.compute_score(
+            [[query, doc] for doc in documents],
+            batch_size=settings.bge_m3_batch_size,
+            max_query_length=settings.bge_m3_query_max_length,
+            max_passage_length=settings.bge_m3_abstract_max_length,
+            weights_for_different_modes=[0.0, 0.0, 1.0]
+        )
+        return [float(s) for s in scores["colbert"]]
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about 4 characters per token)."""
+    return len(text) // 4 + 1
+
+
+def rerank(
+    reranker: BaseReranker,
+    query: str,
+    documents: List[Dict[str, Any]],
+    top_k: int,
+    token_budget: Optional[int] = None
+) -> List[Dict[str, Any]]:
+    """
+    Reorder search results by reranker score and cut them to size.
+    
+    Args:
+        reranker: Scorer to use
+        query: Search query
+        documents: Over-fetched search results (dicts with "content")
+        top_k: Maximum documents to keep
+        token_budget: Maximum total content tokens to keep (the best document is always kept)
+    
+    Returns:
+        Best documents first, each with a "rerank_score"
+    """
+    if not documents:
+        return []
+    
+    scores = reranker.score(query, [doc["content"] for doc in documents])
+    ranked = sorted(
+        ({**doc, "rerank_score": score} for doc, score in zip(documents, scores)),
+        key=lambda doc: doc["rerank_score"],
+        reverse=True
+    )
+    
+    kept, used = [], 0
+    for doc in ranked[:top_k]:
+        tokens = estimate_tokens(doc["content"])
+        if kept and token_budget and used + tokens > token_budget:
+            break
+        kept.append(doc)
+        used += tokens
+    return kept
+
+
+_reranker: Optional[BaseReranker] = None
+_reranker_name: Optional[str] = None
+_reranker_lock = threading.Lock()
+
+
+def get_reranker() -> Optional[BaseReranker]:
+    """
+    Get the shared reranker selected by settings.rag_reranker.
+    
+    Returns:
+        BaseReranker, or None when reranking is off
+    """
+    global _reranker, _reranker_name
+    
+    name = settings.rag_reranker
+    if name == "none":
+        return None
+    
+    with _reranker_lock:
+        if _reranker is None or _reranker_name != name:
+            if name == "cross-encoder":
+                _reranker = CrossEncoderReranker(settings.rag_reranker_model, use_fp16=settings.bge_m3_use_fp16)
+            elif name == "colbert":
+                _reranker = ColBERTReranker()
+            else:
+                raise ValueError(f"Unsupported reranker: {name}")
+            _reranker_name = name
+        return _reranker
+
+
+def reset_reranker():
+    """Drop the shared reranker (used in tests)."""
+    global _reranker, _reranker_name
+    
+    with _reranker_lock:
+        _reranker = None
+        _reranker_name = None
@@ -1,17 +1,20 @@
 """Retrieve-Reflect-Retry RAG implementation."""
 
-from typing import List, Optional, Dict, Any, Tuple
+from typing import Any, Dict, Generator, List, Optional, Tuple
 from dataclasses import dataclass
 from enum import Enum
+import asyncio
 import logging
+import re
+import threading
 
-from langchain_openai import ChatOpenAI
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser, JsonOutputParser
 from pydantic import BaseModel, Field
 
-from .vector_store import VectorStore
+from .vector_store import IngestReport, VectorStore
 from .embeddings import EmbeddingManager
+from .reranker import get_reranker, rerank
 from states.agent_state import Paper
 from config.settings import settings
 from config.logging_config import setup_logging
@@ -24,6 +27,16 @@ from prompts.rag_prompts import (
 
 logger = logging.getLogger(__name__)
 
+# Words ignored when measuring lexical overlap between a query and documents
+_STOPWORDS = frozenset(
+    "the and for with from that this what which how are was were has have into about "
+    "their its our your can does using use based between over under recent new".split()
+)
+
+
+def _terms(text: str) -> set:
+    return {t for t in re.findall(r"[a-z0-9]+", text.lower()) if len(t) > 2 and t not in _STOPWORDS}
+
 class RetrievalStatus(str, Enum):
     """Status of a retrieval attempt."""
     SUCCESS = "success"
@@ -50,6 +63,10 @@ class RetrievalResult:
     confidence: float = 0.0
 
 
+# Confidence reported for each retrieval outcome (other outcomes: 0.0)
+_CONFIDENCE = {RetrievalStatus.SUCCESS: 0.9, RetrievalStatus.INSUFFICIENT: 0.5}
+
+
 class RetrieveReflectRetryRAG:
     """
     RAG system implementing Retrieve-Reflect-Retry pattern.
@@ -68,18 +85,15 @@ class RetrieveReflectRetryRAG:
         self.max_retries = max_retries
         self.min_confidence = min_confidence
         self.min_documents = min_documents
+        self._stats = {"fast_accepts": 0, "fast_rejects": 0, "escalations": 0, "llm_calls_saved": 0}
+        self._stats_lock = threading.Lock()
         
         logger.info(f"Initializing RAG for field: {field}")
         
-        # Initialize LLM for reflection
-        llm_kwargs = {
-            "model": settings.openai_model,
-            "temperature": 0.1,
-            "openai_api_key": settings.openai_api_key
-        }
-        if settings.openai_base_url:
-            llm_kwargs["openai_api_base"] = settings.openai_base_url
-        self._llm = ChatOpenAI(**llm_kwargs)
+        # Shared LLMs for reflection and reformulation (imported lazily: agents imports rag)
+        from agents.llm import get_llm
+        self._llm = get_llm(temperature=0.1, cache=True, call_site="reflector")
+        self._reformulation_llm = get_llm(temperature=0.1, cache=True, call_site="reformulator")
         
         # Reflection Prompt
         self._reflection_parser = JsonOutputParser(pydantic_object=ReflectionResult)
@@ -97,10 +111,59 @@ class RetrieveReflectRetryRAG:
     def retrieve(
         self,
         query: str,
-        n_results: int = 10
+        n_results: int = 10,
+        query_variants: Optional[List[str]] = None
     ) -> RetrievalResult:
-        """Execute the Retrieve-Reflect-Retry cycle."""
+        """
+        Execute the Retrieve-Reflect-Retry cycle.
+        
+        With query_variants, the first round searches all variants in one
+        multi-vector query (merged by reciprocal-rank fusion); later rounds
+        search the reformulated query alone.
+        """
         logger.info(f"Starting retrieval for: {query}")
+        handlers = {"search": self._search, "reflect": self._reflect, "reformulate": self._reformulate_query}
+        steps = self._retrieval_steps(query, n_results, query_variants)
+        try:
+            step = next(steps)
+            while True:
+                kind, *args = step
+                step = steps.send(handlers[kind](*args))
+        except StopIteration as done:
+            return done.value
+    
+    async def aretrieve(
+        self,
+        query: str,
+        n_results: int = 10,
+        query_variants: Optional[List[str]] = None
+    ) -> RetrievalResult:
+        """Async version of retrieve: searches and LLM calls never block the event loop."""
+        logger.info(f"Starting async retrieval for: {query}")
+        handlers = {"search": self._asearch, "reflect": self._areflect, "reformulate": self._areformulate_query}
+        steps = self._retrieval_steps(query, n_results, query_variants)
+        try:
+            step = next(steps)
+            while True:
+                kind, *args = step
+                step = steps.send(await handlers[kind](*args))
+        except StopIteration as done:
+            return done.value
+    
+    def _retrieval_steps(
+        self,
+        query: str,
+        n_results: int,
+        query_variants: Optional[List[str]]
+    ) -> Generator[tuple, Any, RetrievalResult]:
+        """
+        The Retrieve-Reflect-Retry loop, without I/O.
+        
+        Yields ("search", query, n_results, variants), ("reflect", query,
+        documents) and ("reformulate", query, feedback) steps, is sent each
+        step's result and returns the RetrievalResult. retrieve and aretrieve
+        only differ in how they perform the steps.
+        """
         current_query = query
         attempt = 1
         
@@ -108,113 +171,227 @@ class RetrieveReflectRetryRAG:
             logger.info(f"Attempt {attempt}/{self.max_retries} with query: {current_query}")
             
             # RETRIEVE
-            documents = self.vector_store.search(
-                current_query,
-                n_results=n_results
-            )
+            documents = yield ("search", current_query, n_results, query_variants if attempt == 1 else None)
             
             if not documents:
                 logger.warning("No documents found.")
                 if attempt < self.max_retries:
-                    current_query = self._reformulate_query(current_query, "No documents found")
+                    current_query = yield ("reformulate", current_query, "No documents found")
                     attempt += 1
                     continue
-                else:
-                    return RetrievalResult(
-                        status=RetrievalStatus.NO_RESULTS,
-                        documents=[],
-                        papers=[],
-                        query=query,
-                        attempt=attempt
-                    )
+                return self._result(RetrievalStatus.NO_RESULTS, query, attempt)
             
-            # REFLECT
-            reflection = self._reflect(current_query, documents)
+            # REFLECT (the LLM is only asked when the heuristics are unsure)
+            reflection = self._heuristic_reflection(current_query, documents)
+            if reflection is None:
+                reflection = yield ("reflect", current_query, documents)
             
             if reflection.is_sufficient:
                 logger.info("Retrieval sufficient.")
-                papers = self._extract_papers(documents)
-                return RetrievalResult(
-                    status=RetrievalStatus.SUCCESS,
-                    documents=documents,
-                    papers=papers,
-                    query=query,
-                    reflection=reflection.explanation,
-                    attempt=attempt,
-                    confidence=0.9  # High confidence if sufficient
-                )
+                return self._result(RetrievalStatus.SUCCESS, query, attempt, documents, reflection.explanation)
             
             # RETRY
             logger.info(f"Retrieval insufficient: {reflection.explanation}")
             if attempt < self.max_retries:
-                current_query = reflection.reformulated_query or self._reformulate_query(
-                    current_query, reflection.explanation
+                current_query = reflection.reformulated_query or (
+                    yield ("reformulate", current_query, reflection.explanation)
                 )
                 attempt += 1
             else:
                 # Return best effort
-                papers = self._extract_papers(documents)
-                return RetrievalResult(
-                    status=RetrievalStatus.INSUFFICIENT,
-                    documents=documents,
-                    papers=papers,
-                    query=query,
-                    reflection=reflection.explanation,
-                    attempt=attempt,
-                    confidence=0.5
-                )
+                return self._result(RetrievalStatus.INSUFFICIENT, query, attempt, documents, reflection.explanation)
         
+        return self._result(RetrievalStatus.ERROR, query, attempt)
+    
+    def _result(
+        self,
+        status: RetrievalStatus,
+        query: str,
+        attempt: int,
+        documents: Optional[List[Dict[str, Any]]] = None,
+        reflection: Optional[str] = None
+    ) -> RetrievalResult:
+        documents = documents or []
         return RetrievalResult(
-            status=RetrievalStatus.ERROR,
-            documents=[],
-            papers=[],
+            status=status,
+            documents=documents,
+            papers=self.extract_papers(documents),
             query=query,
-            attempt=attempt
+            reflection=reflection,
+            attempt=attempt,
+            confidence=_CONFIDENCE.get(status, 0.0)
         )
     
-    def _reflect(self, query: str, documents: List[Dict[str, Any]]) -> ReflectionResult:
-        """Reflect on retrieved documents."""
+    def _search(
+        self,
+        query: str,
+        n_results: int,
+        query_variants: Optional[List[str]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Search the vector store, reranking an over-fetched candidate set when
+        settings.rag_reranker is configured.
+        """
+        reranker = get_reranker()
+        fetch = max(n_results, settings.rag_rerank_candidates) if reranker else n_results
+        
+        if query_variants:
+            documents = self.vector_store.multi_search(query_variants, n_results=fetch)
+        else:
+            documents = self.vector_store.search(query, n_results=fetch)
+        
+        if reranker is None:
+            return documents
+        return rerank(reranker, query, documents, n_results, settings.rag_context_token_budget)
+    
+    async def _asearch(
+        self,
+        query: str,
+        n_results: int,
+        query_variants: Optional[List[str]] = None
+    ) -> List[Dict[str, Any]]:
+        """Async version of _search (reranking runs in a worker thread)."""
+        reranker = get_reranker()
+        fetch = max(n_results, settings.rag_rerank_candidates) if reranker else n_results
+        
+        if query_variants:
+            documents = await self.vector_store.amulti_search(query_variants, n_results=fetch)
+        else:
+            documents = await self.vector_store.asearch(query, n_results=fetch)
+        
+        if reranker is None:
+            return documents
+        return await asyncio.to_thread(
+            rerank, reranker, query, documents, n_results, settings.rag_context_token_budget
+        )
+    
+    def _heuristic_reflection(self, query: str, documents: List[Dict[str, Any]]) -> Optional[ReflectionResult]:
+        """
+        Judge clear-cut retrievals without an LLM call.
+        
+        Accepts when enough results came back, the top ones are highly
+        similar and they share most of the query's terms; rejects when even
+        the best result is dissimilar and barely shares any terms. Anything
+        in between returns None and is escalated to LLM reflection.
+        """
+        if not settings.rag_fast_path_enabled:
+            return None
+        
+        similarities = sorted((doc.get("similarity", 0.0) for doc in documents), reverse=True)
+        top = similarities[:max(1, self.min_documents)]
+        mean_similarity = sum(top) / len(top)
+        
+        query_terms = _terms(query)
+        top_terms = set().union(*(_terms(doc["content"]) for doc in documents[:len(top)]))
+        overlap = len(query_terms & top_terms) / len(query_terms) if query_terms else 0.0
+        
+        signals = f"top similarity {mean_similarity:.2f}, best {similarities[0]:.2f}, term overlap {overlap:.0%}"
+        if (
+            len(documents) >= self.min_documents
+            and mean_similarity >= settings.rag_fast_accept_similarity
+            and overlap >= settings.rag_fast_min_overlap
+        ):
+            self._record("fast_accepts")
+            return ReflectionResult(is_sufficient=True, explanation=f"Heuristic accept: {signals}")
+        
+        if similarities[0] < settings.rag_fast_reject_similarity and overlap < settings.rag_fast_min_overlap / 2:
+            self._record("fast_rejects")
+            return ReflectionResult(is_sufficient=False, explanation=f"Heuristic reject: {signals}")
+        
+        self._record("escalations")
+        return None
+    
+    def _record(self, outcome: str):
+        with self._stats_lock:
+            self._stats[outcome] += 1
+            if outcome != "escalations":
+                self._stats["llm_calls_saved"] += 1
+    
+    def get_stats(self) -> Dict[str, int]:
+        """Get counts of heuristic accepts/rejects, LLM escalations and reflection calls saved."""
+        with self._stats_lock:
+            return dict(self._stats)
+    
+    def result_from_documents(self, query: str, documents: List[Dict[str, Any]]) -> RetrievalResult:
+        """
+        Judge documents retrieved elsewhere (e.g. by federated search) without reflection.
+        
+        They count as sufficient when there are at least min_documents, and
+        get the same result shape and confidence as retrieve.
+        """
+        if not documents:
+            return self._result(RetrievalStatus.NO_RESULTS, query, 1)
+        status = RetrievalStatus.SUCCESS if len(documents) >= self.min_documents else RetrievalStatus.INSUFFICIENT
+        return self._result(status, query, 1, documents)
+    
+    def _reflection_inputs(self, query: str, documents: List[Dict[str, Any]]) -> Dict[str, Any]:
         docs_text = "\n\n".join([
             f"Document {i+1}:\n{doc['content'][:500]}..."
             for i, doc in enumerate(documents[:5])
         ])
-        
-        chain = self._reflection_prompt | self._llm | self._reflection_parser
-        
+        return {
+            "query": query,
+            "field": self.field,
+            "documents": docs_text,
+            "format_instructions": self._reflection_parser.get_format_instructions()
+        }
+    
+    @staticmethod
+    def _reflection_fallback(error: Exception) -> ReflectionResult:
+        logger.error(f"Reflection failed: {error}")
+        return ReflectionResult(
+            is_sufficient=True,
+            explanation="Reflection failed, assuming sufficient."
+        )
+    
+    def _reflection_chain(self):
+        return self._reflection_prompt | self._llm | self._reflection_parser
+    
+    @staticmethod
+    def _reflection_from_response(response: Any) -> ReflectionResult:
+        if isinstance(response, dict):
+            return ReflectionResult(**response)
+        return response
+    
+    def _reflect(self, query: str, documents: List[Dict[str, Any]]) -> ReflectionResult:
+        """Reflect on retrieved documents."""
         try:
-            response = chain.invoke({
-                "query": query,
-                "field": self.field,
-                "documents": docs_text,
-                "format_instructions": self._reflection_parser.get_format_instructions()
-            })
-            
-            if isinstance(response, dict):
-                return ReflectionResult(**response)
-            return response
-            
+            response = self._reflection_chain().invoke(self._reflection_inputs(query, documents))
+            return self._reflection_from_response(response)
+        except Exception as e:
+            return self._reflection_fallback(e)
+    
+    async def _areflect(self, query: str, documents: List[Dict[str, Any]]) -> ReflectionResult:
+        """Async version of _reflect."""
+        try:
+            response = await self._reflection_chain().ainvoke(self._reflection_inputs(query, documents))
+            return self._reflection_from_response(response)
         except Exception as e:
-            logger.error(f"Reflection failed: {e}")
-            # Fallback
-            return ReflectionResult(
-                is_sufficient=True,
-                explanation="Reflection failed, assuming sufficient."
-            )
+            return self._reflection_fallback(e)
+    
+    def _reformulation_chain(self):
+        return self._reformulation_prompt | self._reformulation_llm | StrOutputParser()
+    
+    def _reformulation_inputs(self, query: str, feedback: str) -> Dict[str, Any]:
+        return {"query": query, "field": self.field, "feedback": feedback}
     
     def _reformulate_query(self, query: str, feedback: str) -> str:
         """Reformulate a query based on feedback."""
-        chain = self._reformulation_prompt | self._llm | StrOutputParser()
         try:
-            return chain.invoke({
-                "query": query,
-                "field": self.field,
-                "feedback": feedback
-            }).strip()
+            return self._reformulation_chain().invoke(self._reformulation_inputs(query, feedback)).strip()
         except Exception as e:
             logger.error(f"Reformulation failed: {e}")
             return query
     
-    def _extract_papers(self, documents: List[Dict[str, Any]]) -> List[Paper]:
+    async def _areformulate_query(self, query: str, feedback: str) -> str:
+        """Async version of _reformulate_query."""
+        try:
+            return (await self._reformulation_chain().ainvoke(self._reformulation_inputs(query, feedback))).strip()
+        except Exception as e:
+            logger.error(f"Reformulation failed: {e}")
+            return query
+    
+    def extract_papers(self, documents: List[Dict[str, Any]]) -> List[Paper]:
         """Extract Paper objects from documents."""
         papers = []
         for doc in documents:
@@ -230,8 +407,9 @@ class RetrieveReflectRetryRAG:
                 authors = []
                 if "Authors: " in content:
                     try:
-                        # content format: Title: ...\nAuthors: ...\nAbstract: ...
-                        parts = content.split("Authors: ")
+                        # content format: Title: ...\nAbstract: ...\nAuthors: ...
+                        # (older documents put Authors before Abstract)
+                        parts = content.rsplit("Authors: ", 1)
                         if len(parts) > 1:
                             authors_line = parts[1].split("\n")[0]
                             if authors_line and authors_line != "Unknown":
@@ -254,12 +432,28 @@ class RetrieveReflectRetryRAG:
                 papers.append(paper)
         return papers
     
-    def add_papers(self, papers: List[Paper]):
-        for paper in papers:
-            self.vector_store.add_paper(paper)
+    def add_papers(self, papers: List[Paper]) -> IngestReport:
+        report = self.vector_store.add_papers(papers)
+        for doc_id, error in report.errors.items():
+            logger.warning(f"Failed to add paper {doc_id} to RAG: {error}")
+        return report
+    
+    def get_context_for_query(
+        self,
+        query: str,
+        query_variants: Optional[List[str]] = None
+    ) -> Tuple[str, List[Paper], float]:
+        return self._context_from_result(self.retrieve(query, query_variants=query_variants))
+    
+    async def aget_context_for_query(
+        self,
+        query: str,
+        query_variants: Optional[List[str]] = None
+    ) -> Tuple[str, List[Paper], float]:
+        return self._context_from_result(await self.aretrieve(query, query_variants=query_variants))
     
-    def get_context_for_query(self, query: str) -> Tuple[str, List[Paper], float]:
-        result = self.retrieve(query)
+    @staticmethod
+    def _context_from_result(result: RetrievalResult) -> Tuple[str, List[Paper], float]:
         if result.status in [RetrievalStatus.NO_RESULTS, RetrievalStatus.ERROR]:
             return "", [], 0.0
         
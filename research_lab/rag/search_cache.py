@@ -0,0 +1,146 @@
+"""In-process LRU cache of VectorStore search results.
+
+Every collection has a monotonically increasing version that VectorStore
+bumps after each add, delete and clear. The version is part of every cache
+key, so a write makes all earlier results for that collection unreachable
+(they age out of the LRU) and repeat searches - including reflection
+retries on the same reformulated query - skip embedding and the HNSW query.
+
+Versions are tracked per process, so writes made by another process are
+not seen. The cache is therefore opt-in (settings.rag_search_cache_enabled),
+meant for deployments where one process writes to the store, and always
+off in client/server mode (settings.chroma_server_host).
+"""
+
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+from collections import OrderedDict
+import copy
+import json
+import threading
+
+from config.settings import settings
+
+# Collection scope: (client key, collection name)
+Scope = Tuple[str, str]
+
+_versions: Dict[Scope, int] = {}
+_versions_lock = threading.Lock()
+
+
+def collection_version(scope: Scope) -> int:
+    """Current write version of a collection."""
+    with _versions_lock:
+        return _versions.get(scope, 0)
+
+
+def bump_collection_version(scope: Scope) -> int:
+    """Record a write to a collection, invalidating its cached results."""
+    with _versions_lock:
+        _versions[scope] = _versions.get(scope, 0) + 1
+        return _versions[scope]
+
+
+def normalize_query(query: str) -> str:
+    """Case- and whitespace-insensitive form of a query used in cache keys."""
+    return " ".join(query.casefold().split())
+
+
+def search_key(scope: Scope, version: int, kind: str, query: Any, **params) -> Hashable:
+    """
+    Build the cache key for one search.
+    
+    Args:
+        scope: Collection scope
+        version: Collection version the results were read at
+        kind: Search method ("search", "multi_search", ...)
+        query: Query string or tuple of query strings
+        params: Remaining search arguments (n_results, where, ...)
+    """
+    if isinstance(query, str):
+        query = normalize_query(query)
+    else:
+        query = tuple(normalize_query(q) for q in query)
+    return (scope, version, kind, query, json.dumps(params, sort_keys=True, default=str))
+
+
+class SearchCache:
+    """
+    Thread-safe LRU map of search keys to result lists.
+    
+    Results are deep-copied on the way in and out so callers can annotate
+    them or their metadata (reranking, hybrid scores) without corrupting
+    cached entries.
+    """
+    
+    def __init__(self, capacity: int):
+        self.capacity = max(1, capacity)
+        self._entries: "OrderedDict[Hashable, List[Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0}
+    
+    def get(self, key: Hashable) -> Optional[List[Dict[str, Any]]]:
+        """Cached results for a key, or None."""
+        with self._lock:
+            results = self._entries.get(key)
+            if results is None:
+                self._stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+        return copy.deepcopy(results)
+    
+    def put(self, key: Hashable, results: List[Dict[str, Any]]):
+        """Store results, evicting the least recently used entries when full."""
+        results = copy.deepcopy(results)
+        with self._lock:
+            self._entries[key] = results
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.capacity:
+                self._entries.popitem(last=False)
+                self._stats["evictions"] += 1
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+    
+    def stats(self) -> Dict[str, float]:
+        """Get hit/miss counters and the number of cached searches."""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._entries)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
+
+
+_cache: Optional[SearchCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_search_cache() -> Optional[SearchCache]:
+    """
+    Get the shared search cache.
+    
+    Returns:
+        SearchCache, or None when settings.rag_search_cache_enabled is off or
+        collections live on a shared Chroma server
+    """
+    global _cache
+    
+    if not settings.rag_search_cache_enabled or settings.chroma_server_host:
+        return None
+    
+    with _cache_lock:
+        if _cache is None or _cache.capacity != max(1, settings.rag_search_cache_size):
+            _cache = SearchCache(settings.rag_search_cache_size)
+        return _cache
+
+
+def reset_search_cache():
+    """Drop cached results and collection versions (used in tests)."""
+    global _cache
+    
+    with _cache_lock:
+        _cache = None
+    with _versions_lock:
+        _versions.clear()
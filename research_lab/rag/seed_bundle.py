@@ -0,0 +1,236 @@
+"""Pre-embedded seed corpus bundles for instant, offline RAG cold starts.
+
+A bundle is a compressed .npz file holding, per field, the seed papers'
+document IDs, contents, metadata and embedding vectors, plus a JSON manifest
+recording the bundle format version and the embedding model that produced
+the vectors. Build one on a connected host and ship it with the deployment:
+
+    python -m rag.seed_bundle export --output data/seed_bundle.npz
+    python -m rag.seed_bundle import --input data/seed_bundle.npz
+
+When settings.rag_seed_bundle_path points at a bundle, seeding imports the
+field from it instead of fetching from Semantic Scholar and re-embedding.
+"""
+
+import argparse
+import json
+import os
+import threading
+import uuid
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from config.settings import settings
+
+BUNDLE_FORMAT_VERSION = 1
+
+# Loaded bundles keyed by (path, mtime) so every field shares one read
+_bundle_cache: Dict[tuple, Dict[str, Any]] = {}
+_bundle_cache_lock = threading.Lock()
+
+
+def current_embedding_model() -> str:
+    """Identifier of the configured embedding model, as recorded in bundles."""
+    # Same identifier as the embedding cache: int8 ONNX vectors need their own bundle
+    from .embeddings import embedding_model_id
+    return embedding_model_id()
+
+
+def export_seed_bundle(
+    path: str,
+    fields: Optional[List[str]] = None,
+    num_papers: Optional[int] = None,
+    embedding_manager=None
+) -> Dict[str, int]:
+    """
+    Fetch and embed seed papers for each field and write them to a bundle.
+    
+    Args:
+        path: Output .npz path
+        fields: Fields to include (default: every field with seed queries)
+        num_papers: Seed papers per field (default: settings.rag_seed_papers_per_field)
+        embedding_manager: Optional EmbeddingManager (default: the configured model)
+    
+    Returns:
+        Number of papers written per field
+    """
+    from rag.embeddings import EmbeddingManager
+    from rag.seed_rag import FIELD_SEED_QUERIES, fetch_seed_papers
+    from rag.vector_store import VectorStore
+    
+    fields = fields or list(FIELD_SEED_QUERIES.keys())
+    num_papers = num_papers or settings.rag_seed_papers_per_field
+    embedding_manager = embedding_manager or EmbeddingManager()
+    
+    manifest = {
+        "format_version": BUNDLE_FORMAT_VERSION,
+        "embedding_model": current_embedding_model(),
+        "created_at": datetime.now().isoformat(),
+        "fields": {},
+    }
+    arrays = {}
+    counts = {}
+    
+    for field in fields:
+        papers = fetch_seed_papers(field, num_papers)
+        if not papers:
+            print(f"[WARNING] No seed papers found for field '{field}', skipping")
+            continue
+        
+        documents = [VectorStore.paper_to_document(paper) for paper in papers]
+        contents = [content for content, _ in documents]
+        embeddings = np.asarray(embedding_manager.embed_documents(contents, doc_type="abstract"), dtype=np.float32)
+        
+        manifest["fields"][field] = {
+            "ids": [paper.id or str(uuid.uuid4()) for paper in papers],
+            "contents": contents,
+            "metadatas": [metadata for _, metadata in documents],
+        }
+        arrays[f"embeddings__{field}"] = embeddings
+        manifest["dimension"] = int(embeddings.shape[1])
+        counts[field] = len(papers)
+        print(f"[INFO] Bundled {len(papers)} seed papers for field '{field}'")
+    
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    np.savez_compressed(path, manifest=np.array(json.dumps(manifest)), **arrays)
+    print(f"[SUCCESS] Wrote seed bundle with {sum(counts.values())} papers to {path}")
+    return counts
+
+
+def load_seed_bundle(path: str) -> Dict[str, Any]:
+    """
+    Read and validate a seed bundle.
+    
+    Args:
+        path: Bundle .npz path
+    
+    Returns:
+        Manifest dict whose fields[field]["embeddings"] hold the vectors
+    
+    Raises:
+        ValueError: If the bundle format version is unsupported
+    """
+    key = (os.path.abspath(path), os.path.getmtime(path))
+    with _bundle_cache_lock:
+        if key in _bundle_cache:
+            return _bundle_cache[key]
+    
+    with np.load(path, allow_pickle=False) as data:
+        manifest = json.loads(str(data["manifest"]))
+        if manifest.get("format_version") != BUNDLE_FORMAT_VERSION:
+            raise ValueError(
+                f"Unsupported seed bundle format {manifest.get('format_version')} "
+                f"(expected {BUNDLE_FORMAT_VERSION}): {path}"
+            )
+        for field, entry in manifest["fields"].items():
+            entry["embeddings"] = data[f"embeddings__{field}"]
+    
+    with _bundle_cache_lock:
+        _bundle_cache[key] = manifest
+    return manifest
+
+
+def import_seed_bundle_field(vector_store, field: str, path: Optional[str] = None) -> int:
+    """
+    Bulk-load one field of a bundle into a vector store.
+    
+    Args:
+        vector_store: VectorStore for the field's collection
+        field: Research field
+        path: Bundle path (default: settings.rag_seed_bundle_path)
+    
+    Returns:
+        Number of papers imported (0 if the bundle is missing or lacks the field)
+    
+    Raises:
+        ValueError: If the bundle was embedded with a different model
+    """
+    path = path or settings.rag_seed_bundle_path
+    if not path or not os.path.exists(path):
+        return 0
+    
+    manifest = load_seed_bundle(path)
+    if manifest["embedding_model"] != current_embedding_model():
+        raise ValueError(
+            f"Seed bundle {path} was embedded with {manifest['embedding_model']}, "
+            f"but the configured model is {current_embedding_model()}"
+        )
+    
+    entry = manifest["fields"].get(field)
+    if not entry:
+        return 0
+    
+    now = datetime.now().isoformat()
+    metadatas = [dict(metadata, added_at=now) for metadata in entry["metadatas"]]
+    vector_store.add_embedded_documents(
+        entry["ids"],
+        entry["embeddings"].tolist(),
+        entry["contents"],
+        metadatas
+    )
+    return len(entry["ids"])
+
+
+def import_seed_bundle(
+    path: str,
+    fields: Optional[List[str]] = None,
+    force: bool = False,
+    persist_directory: Optional[str] = None
+) -> Dict[str, int]:
+    """
+    Import a bundle into the rag_{field} collections.
+    
+    Args:
+        path: Bundle .npz path
+        fields: Fields to import (default: every field in the bundle)
+        force: Import into collections that already contain documents
+        persist_directory: ChromaDB directory (default: settings.chroma_persist_directory)
+    
+    Returns:
+        Number of papers imported per field
+    """
+    from rag.vector_store import VectorStore
+    
+    manifest = load_seed_bundle(path)
+    counts = {}
+    
+    for field in fields or list(manifest["fields"].keys()):
+        vector_store = VectorStore(
+            collection_name=f"rag_{field}",
+            persist_directory=persist_directory
+        )
+        if vector_store.count > 0 and not force:
+            print(f"[INFO] Collection 'rag_{field}' already has documents, skipping")
+            continue
+        
+        counts[field] = import_seed_bundle_field(vector_store, field, path)
+        print(f"[INFO] Imported {counts[field]} seed papers into 'rag_{field}'")
+    
+    return counts
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Build or import pre-embedded RAG seed bundles")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    
+    export_parser = subparsers.add_parser("export", help="Fetch, embed and write seed papers")
+    export_parser.add_argument("--output", default=settings.rag_seed_bundle_path)
+    export_parser.add_argument("--fields", nargs="*", help="Fields to include (default: all)")
+    export_parser.add_argument("--papers", type=int, default=settings.rag_seed_papers_per_field)
+    
+    import_parser = subparsers.add_parser("import", help="Load a bundle into the rag_{field} collections")
+    import_parser.add_argument("--input", default=settings.rag_seed_bundle_path)
+    import_parser.add_argument("--fields", nargs="*", help="Fields to import (default: all in bundle)")
+    import_parser.add_argument("--force", action="store_true", help="Import into non-empty collections")
+    
+    args = parser.parse_args(argv)
+    if args.command == "export":
+        export_seed_bundle(args.output, fields=args.fields, num_papers=args.papers)
+    else:
+        import_seed_bundle(args.input, fields=args.fields, force=args.force)
+
+
+if __name__ == "__main__":
+    main()
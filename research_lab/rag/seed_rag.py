@@ -1,7 +1,10 @@
 """Automated RAG seeding - fetches top-cited papers from Semantic Scholar."""
 
 import threading
-from typing import List
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, asdict
+from typing import Any, Dict, List, Optional, Tuple
 from pathlib import Path
 from tools.semantic_scholar import SemanticScholarTool
 from states.agent_state import Paper
@@ -11,6 +14,37 @@ from config.settings import FIELD_DISPLAY_NAMES
 _seeding_locks: dict[str, threading.Lock] = {}
 _seeding_lock_global = threading.Lock()
 
+# Semantic Scholar requests in flight across all fields being seeded
+_search_slots: Optional[threading.BoundedSemaphore] = None
+_search_slots_size = 0
+# Seed fetches currently holding a reference to _search_slots
+_search_slots_users = 0
+
+
+@dataclass
+class SeedingProgress:
+    """Progress of seeding one field's RAG collection."""
+    field: str
+    status: str = "pending"  # pending, importing, fetching, embedding, done, skipped, failed
+    fetched: int = 0
+    added: int = 0
+    total: int = 0
+    error: Optional[str] = None
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    
+    @property
+    def running(self) -> bool:
+        return self.status in ("pending", "importing", "fetching", "embedding")
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+# Background seeding threads and their progress, keyed by field
+_seeding_threads: dict[str, threading.Thread] = {}
+_seeding_progress: dict[str, SeedingProgress] = {}
+
 
 # Field-specific seed queries to fetch foundational papers
 FIELD_SEED_QUERIES = {
@@ -73,10 +107,47 @@ FIELD_SEED_QUERIES = {
 }
 
 
+def _get_search_slots() -> Tuple[threading.BoundedSemaphore, int]:
+    """
+    Shared limit on concurrent Semantic Scholar seed requests.
+    
+    The semaphore is resized when the setting changes, but only while no
+    seed fetch is running, so fetches never hold slots on two semaphores
+    at once. Pair every call with _release_search_slots().
+    
+    Returns:
+        (semaphore, size)
+    """
+    global _search_slots, _search_slots_size, _search_slots_users
+    from config.settings import settings
+    
+    size = max(1, settings.rag_seed_max_concurrent_requests)
+    with _seeding_lock_global:
+        if _search_slots is None or (_search_slots_size != size and _search_slots_users == 0):
+            _search_slots = threading.BoundedSemaphore(size)
+            _search_slots_size = size
+        _search_slots_users += 1
+        return _search_slots, _search_slots_size
+
+
+def _release_search_slots():
+    """Mark a seed fetch started with _get_search_slots() as finished."""
+    global _search_slots_users
+    
+    with _seeding_lock_global:
+        _search_slots_users -= 1
+
+
 def fetch_seed_papers(field: str, num_papers: int = 10) -> List[Paper]:
     """
     Fetch foundational papers for a field from Semantic Scholar.
     
+    Seed queries are issued concurrently, at most
+    settings.rag_seed_max_concurrent_requests at a time across every field
+    being seeded (the unauthenticated API answers bursts with 429s), and
+    their results are interleaved round-robin, so the seed set covers every
+    sub-topic.
+    
     Args:
         field: Research field
         num_papers: Target number of papers
@@ -84,60 +155,106 @@ def fetch_seed_papers(field: str, num_papers: int = 10) -> List[Paper]:
     Returns:
         List of Paper objects
     """
-    if field not in FIELD_SEED_QUERIES:
+    if field not in FIELD_SEED_QUERIES or num_papers <= 0:
         return []
     
     queries = FIELD_SEED_QUERIES[field]
     tool = SemanticScholarTool()
     
-    papers = []
-    seen_paper_ids = set()
-    remaining = num_papers
+    # Over-fetch a little per query to make up for duplicates across queries
+    per_query = min(-(-num_papers // len(queries)) + 5, 15)
     
-    for query in queries:
-        if remaining <= 0:
-            break
-        
+    slots, slots_size = _get_search_slots()
+    
+    def search(query: str) -> List[Paper]:
         try:
-            results = tool.search(query, max_results=min(remaining + 5, 15))
-            
-            for paper in results:
-                if remaining <= 0:
-                    break
-                
-                # Skip duplicates
-                paper_id = paper.id or paper.title.lower()
-                if paper_id in seen_paper_ids:
-                    continue
-                seen_paper_ids.add(paper_id)
-                
-                # Update field
-                paper.field = field
-                
-                papers.append(paper)
-                remaining -= 1
-        
+            with slots:
+                return tool.search(query, max_results=per_query)
         except Exception as e:
             print(f"Warning: Failed to fetch papers for query '{query}': {e}")
-            continue
+            return []
+    
+    try:
+        with ThreadPoolExecutor(max_workers=min(len(queries), slots_size)) as executor:
+            results = list(executor.map(search, queries))
+    finally:
+        _release_search_slots()
+    
+    papers = []
+    seen_paper_ids = set()
+    
+    for rank in range(max((len(r) for r in results), default=0)):
+        for query_results in results:
+            if len(papers) >= num_papers:
+                return papers
+            if rank >= len(query_results):
+                continue
+            
+            paper = query_results[rank]
+            
+            # Skip duplicates
+            paper_id = paper.id or paper.title.lower()
+            if paper_id in seen_paper_ids:
+                continue
+            seen_paper_ids.add(paper_id)
+            
+            # Update field
+            paper.field = field
+            
+            papers.append(paper)
     
     return papers
 
 
-def seed_rag_if_empty(vector_store, field: str, num_papers: int = 10) -> bool:
+def _add_error_is_fatal(title: str, error: str, field: str) -> bool:
+    """Report a failed paper insert; return True if seeding should stop."""
+    from config.settings import settings
+    
+    if settings.embeddings_provider == "openai":
+        if "401" in error or "invalid_api_key" in error.lower() or "Incorrect API key" in error:
+            print(f"Warning: Failed to add paper '{title}': Authentication error - check your embeddings API key")
+            # If it's an auth error, might be key issue - continue trying other papers
+        elif "404" in error or "Not Found" in error:
+            print(f"Warning: Failed to add paper '{title}': Embeddings endpoint not found")
+            # If embeddings endpoint not found, stop trying
+            print(f"[WARNING] Embeddings API endpoint not available. Stopping RAG seeding for field '{field}'.")
+            return True
+        else:
+            print(f"Warning: Failed to add paper '{title}': {error}")
+    else:
+        # For BGE-M3, just log the error and continue
+        print(f"Warning: Failed to add paper '{title}': {error}")
+    return False
+
+
+def seed_rag_if_empty(
+    vector_store,
+    field: str,
+    num_papers: int = 10,
+    progress: Optional[SeedingProgress] = None
+) -> bool:
     """
     Seed RAG collection with foundational papers if it's empty.
     
     Uses a lock mechanism to prevent concurrent seeding of the same field.
+    Imports the field from settings.rag_seed_bundle_path when a bundle is
+    available; otherwise fetches papers and embeds them in batches of
+    settings.rag_seed_batch_size.
     
     Args:
         vector_store: VectorStore instance to seed
         field: Research field
         num_papers: Number of seed papers to fetch
+        progress: Optional SeedingProgress updated as seeding proceeds
         
     Returns:
         True if seeding was performed, False if collection already had papers
     """
+    from config.settings import settings
+    
+    progress = progress or SeedingProgress(field=field)
+    progress.started_at = progress.started_at or time.time()
+    
     # Get or create lock for this field
     with _seeding_lock_global:
         if field not in _seeding_locks:
@@ -146,61 +263,144 @@ def seed_rag_if_empty(vector_store, field: str, num_papers: int = 10) -> bool:
     
     # Check if collection is empty (with lock to prevent race conditions)
     with field_lock:
-        # Double-check pattern: check count again inside lock
-        if vector_store.count > 0:
-            return False
-        
-        # Only seed domain fields that have seed queries defined
-        if field not in FIELD_SEED_QUERIES:
-            # Silently skip support agents or unknown fields
-            return False
-        
-        print(f"[INFO] Seeding RAG for field '{field}' with foundational papers...")
-        
         try:
+            # Double-check pattern: check count again inside lock
+            # Only seed domain fields that have seed queries defined
+            # (silently skip support agents or unknown fields)
+            if vector_store.count > 0 or field not in FIELD_SEED_QUERIES:
+                progress.status = "skipped"
+                return False
+            
+            # Prefer a pre-embedded bundle: no network and no embedding work
+            progress.status = "importing"
+            try:
+                from rag.seed_bundle import import_seed_bundle_field
+                imported = import_seed_bundle_field(vector_store, field)
+            except Exception as e:
+                print(f"[WARNING] Could not import seed bundle for field '{field}': {e}")
+                imported = 0
+            
+            if imported > 0:
+                print(f"[SUCCESS] Seeded RAG with {imported} bundled papers for field '{field}'")
+                progress.fetched = progress.total = progress.added = imported
+                progress.status = "done"
+                return True
+            
+            print(f"[INFO] Seeding RAG for field '{field}' with foundational papers...")
+            
             # Fetch seed papers
+            progress.status = "fetching"
             seed_papers = fetch_seed_papers(field, num_papers)
+            progress.fetched = progress.total = len(seed_papers)
             
             if not seed_papers:
                 print(f"[WARNING] No seed papers found for field '{field}'")
+                progress.status = "failed"
+                progress.error = "No seed papers found"
                 return False
             
-            # Add papers to vector store
-            added_count = 0
-            for paper in seed_papers:
-                try:
-                    # Ensure paper has the correct field
+            # Add papers to vector store in batches
+            progress.status = "embedding"
+            batch_size = max(1, settings.rag_seed_batch_size)
+            for start in range(0, len(seed_papers), batch_size):
+                batch = seed_papers[start:start + batch_size]
+                # Ensure papers have the correct field
+                for paper in batch:
                     paper.field = field
-                    vector_store.add_paper(paper)
-                    added_count += 1
-                except Exception as e:
-                    # Check if it's an embeddings API error (only relevant for OpenAI)
-                    error_str = str(e)
-                    from config.settings import settings
-                    
-                    if settings.embeddings_provider == "openai":
-                        if "401" in error_str or "invalid_api_key" in error_str.lower() or "Incorrect API key" in error_str:
-                            print(f"Warning: Failed to add paper '{paper.title}': Authentication error - check your embeddings API key")
-                            # If it's an auth error, might be key issue - continue trying other papers
-                        elif "404" in error_str or "Not Found" in error_str:
-                            print(f"Warning: Failed to add paper '{paper.title}': Embeddings endpoint not found")
-                            # If embeddings endpoint not found, stop trying
-                            print(f"[WARNING] Embeddings API endpoint not available. Stopping RAG seeding for field '{field}'.")
-                            break
-                        else:
-                            print(f"Warning: Failed to add paper '{paper.title}': {e}")
-                    else:
-                        # For BGE-M3, just log the error and continue
-                        print(f"Warning: Failed to add paper '{paper.title}': {e}")
-                    continue
+                
+                report = vector_store.add_papers(batch, batch_size=len(batch))
+                progress.added += len(report.added)
+                print(f"[INFO] Seeding '{field}': {progress.added}/{progress.total} papers indexed")
+                
+                titles = {paper.id: paper.title for paper in batch}
+                if any(
+                    _add_error_is_fatal(titles.get(doc_id, doc_id), error, field)
+                    for doc_id, error in report.errors.items()
+                ):
+                    break
             
-            if added_count > 0:
-                print(f"[SUCCESS] Seeded RAG with {added_count} papers for field '{field}'")
+            if progress.added > 0:
+                print(f"[SUCCESS] Seeded RAG with {progress.added} papers for field '{field}'")
+                progress.status = "done"
             else:
                 print(f"[WARNING] No papers were successfully added to RAG for field '{field}'")
+                progress.status = "failed"
+                progress.error = "No papers were added"
             
-            return added_count > 0
+            return progress.added > 0
             
         except Exception as e:
             print(f"[ERROR] Error seeding RAG for field '{field}': {e}")
+            progress.status = "failed"
+            progress.error = str(e)
             return False
+        finally:
+            progress.finished_at = time.time()
+
+
+def start_background_seeding(vector_store, field: str, num_papers: int = 10) -> SeedingProgress:
+    """
+    Seed a field's RAG collection in a background thread.
+    
+    Returns immediately; research proceeds against whatever is already
+    indexed. At most one seeding thread runs per field - a call while one
+    is running returns its progress.
+    
+    Args:
+        vector_store: VectorStore instance to seed
+        field: Research field
+        num_papers: Number of seed papers to fetch
+        
+    Returns:
+        SeedingProgress for the field
+    """
+    with _seeding_lock_global:
+        thread = _seeding_threads.get(field)
+        if thread is not None and thread.is_alive():
+            return _seeding_progress[field]
+        
+        progress = SeedingProgress(field=field, started_at=time.time())
+        thread = threading.Thread(
+            target=seed_rag_if_empty,
+            args=(vector_store, field, num_papers, progress),
+            name=f"rag-seed-{field}",
+            daemon=True
+        )
+        _seeding_progress[field] = progress
+        _seeding_threads[field] = thread
+    
+    thread.start()
+    return progress
+
+
+def get_seeding_progress(field: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Get background seeding progress.
+    
+    Args:
+        field: Field to report (None reports every field seeded so far)
+        
+    Returns:
+        Progress dict for the field (empty if never seeded), or a dict of
+        progress dicts keyed by field
+    """
+    with _seeding_lock_global:
+        if field is not None:
+            progress = _seeding_progress.get(field)
+            return progress.to_dict() if progress else {}
+        return {name: progress.to_dict() for name, progress in _seeding_progress.items()}
+
+
+def wait_for_seeding(field: str, timeout: Optional[float] = None) -> bool:
+    """
+    Block until a field's background seeding finishes.
+    
+    Returns:
+        True if no seeding is running for the field when this returns
+    """
+    with _seeding_lock_global:
+        thread = _seeding_threads.get(field)
+    if thread is None:
+        return True
+    thread.join(timeout)
+    return not thread.is_alive()
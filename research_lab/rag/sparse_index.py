@@ -0,0 +1,209 @@
+"""BM25 keyword index stored alongside each Chroma collection.
+
+Dense embeddings blur exact technical terms (gene names, compound formulas,
+theorem names). The sparse index keeps a term -> document inverted index in
+a small SQLite file next to the collection so VectorStore.search can blend
+BM25 keyword scores with dense similarity.
+"""
+
+from typing import Dict, List, Optional, Sequence, Tuple
+from collections import Counter
+from pathlib import Path
+import math
+import os
+import re
+import sqlite3
+import threading
+
+from config.settings import settings
+
+# BM25 term-frequency saturation and length normalization
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+_STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in into is it its of on or that the their "
+    "this to was were which with".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased alphanumeric terms; single characters are kept only if they are digits."""
+    return [
+        t for t in re.findall(r"[a-z0-9]+", text.lower())
+        if t not in _STOPWORDS and (len(t) > 1 or t.isdigit())
+    ]
+
+
+class BM25Index:
+    """
+    Persistent BM25 inverted index for one collection.
+    
+    Thread-safe; documents are upserted by ID so re-adding a document
+    replaces its postings.
+    """
+    
+    def __init__(self, path: str):
+        """
+        Open (or create) the index.
+        
+        Args:
+            path: SQLite file for the index
+        """
+        self.path = path
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS docs (doc_id TEXT PRIMARY KEY, length INTEGER NOT NULL)")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS postings (
+                term TEXT NOT NULL,
+                doc_id TEXT NOT NULL,
+                tf INTEGER NOT NULL,
+                PRIMARY KEY (term, doc_id)
+            )"""
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_postings_doc ON postings (doc_id)")
+        self._conn.commit()
+    
+    def add(self, doc_ids: Sequence[str], contents: Sequence[str]):
+        """Index (or re-index) documents."""
+        with self._lock:
+            self._delete(doc_ids)
+            for doc_id, content in zip(doc_ids, contents):
+                counts = Counter(tokenize(content))
+                self._conn.execute("INSERT INTO docs (doc_id, length) VALUES (?, ?)", (doc_id, sum(counts.values())))
+                self._conn.executemany(
+                    "INSERT INTO postings (term, doc_id, tf) VALUES (?, ?, ?)",
+                    [(term, doc_id, tf) for term, tf in counts.items()]
+                )
+            self._conn.commit()
+    
+    def delete(self, doc_ids: Sequence[str]):
+        """Remove documents from the index."""
+        with self._lock:
+            self._delete(doc_ids)
+            self._conn.commit()
+    
+    def _delete(self, doc_ids: Sequence[str]):
+        rows = [(doc_id,) for doc_id in doc_ids]
+        self._conn.executemany("DELETE FROM postings WHERE doc_id = ?", rows)
+        self._conn.executemany("DELETE FROM docs WHERE doc_id = ?", rows)
+    
+    def clear(self):
+        """Remove all documents."""
+        with self._lock:
+            self._conn.execute("DELETE FROM postings")
+            self._conn.execute("DELETE FROM docs")
+            self._conn.commit()
+    
+    def search(self, query: str, n_results: int = 10) -> List[Tuple[str, float]]:
+        """
+        Rank documents by BM25 score.
+        
+        Returns:
+            (doc_id, score) pairs, best first; documents sharing no query term are omitted
+        """
+        terms = sorted(set(tokenize(query)))
+        if not terms:
+            return []
+        
+        with self._lock:
+            total, avg_length = self._conn.execute("SELECT COUNT(*), AVG(length) FROM docs").fetchone()
+            if not total:
+                return []
+            placeholders = ",".join("?" * len(terms))
+            postings = self._conn.execute(
+                f"""SELECT p.term, p.doc_id, p.tf, d.length
+                    FROM postings p JOIN docs d ON d.doc_id = p.doc_id
+                    WHERE p.term IN ({placeholders})""",
+                terms
+            ).fetchall()
+        
+        df = Counter(term for term, _, _, _ in postings)
+        avg_length = avg_length or 1.0
+        scores: Dict[str, float] = {}
+        for term, doc_id, tf, length in postings:
+            idf = math.log(1 + (total - df[term] + 0.5) / (df[term] + 0.5))
+            norm = tf + BM25_K1 * (1 - BM25_B + BM25_B * length / avg_length)
+            scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (BM25_K1 + 1) / norm
+        
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:n_results]
+    
+    @property
+    def count(self) -> int:
+        """Number of indexed documents."""
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM docs").fetchone()[0]
+    
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+# Per-session collections (e.g. temp_kg_{session_id}, dropped once the
+# knowledge graph is built) are not indexed
+UNINDEXED_PREFIX = "temp_"
+
+# Shared indexes keyed by file path
+_indexes: Dict[str, BM25Index] = {}
+_indexes_lock = threading.Lock()
+
+
+def get_sparse_index(collection_name: str, persist_directory: Optional[str] = None) -> Optional[BM25Index]:
+    """
+    Get the shared BM25 index for a collection.
+    
+    The index lives in <persist_directory>/sparse_index/<collection>.sqlite.
+    
+    Per-session temp_* collections are never indexed, and neither is a
+    shared Chroma server: the index is a local file, so writes made by other
+    workers would be missing from it.
+    
+    Returns:
+        BM25Index, or None when settings.rag_sparse_index_enabled is off or the
+        collection is not indexed
+    """
+    if (
+        not settings.rag_sparse_index_enabled
+        or settings.chroma_server_host
+        or collection_name.startswith(UNINDEXED_PREFIX)
+    ):
+        return None
+    
+    path = _index_path(collection_name, persist_directory)
+    with _indexes_lock:
+        if path not in _indexes:
+            _indexes[path] = BM25Index(path)
+        return _indexes[path]
+
+
+def _index_path(collection_name: str, persist_directory: Optional[str]) -> str:
+    return os.path.abspath(os.path.join(
+        persist_directory or settings.chroma_persist_directory,
+        "sparse_index",
+        f"{collection_name}.sqlite"
+    ))
+
+
+def drop_sparse_index(collection_name: str, persist_directory: Optional[str] = None):
+    """Close a collection's index and delete its files (when the collection is deleted)."""
+    path = _index_path(collection_name, persist_directory)
+    with _indexes_lock:
+        index = _indexes.pop(path, None)
+        if index is not None:
+            index.close()
+    for suffix in ("", "-wal", "-shm"):
+        try:
+            os.remove(path + suffix)
+        except FileNotFoundError:
+            pass
+
+
+def reset_sparse_indexes():
+    """Close and drop all shared indexes (used in tests)."""
+    with _indexes_lock:
+        for index in _indexes.values():
+            index.close()
+        _indexes.clear()
@@ -1,17 +1,29 @@
 """ChromaDB vector store wrapper for the RAG system."""
 
 from typing import List, Optional, Dict, Any, Tuple
+from dataclasses import dataclass, field
 from datetime import datetime
+import asyncio
 import uuid
 
-import chromadb
-from chromadb.config import Settings as ChromaSettings
+import numpy as np
 
+from .chroma_client import _client_key, delete_collection, get_chroma_client, get_collection
 from .embeddings import EmbeddingManager
+from .search_cache import bump_collection_version, collection_version, get_search_cache, search_key
+from .sparse_index import BM25Index, get_sparse_index
 from config.settings import settings
 from states.agent_state import Paper
 
 
+@dataclass
+class IngestReport:
+    """Outcome of a bulk paper ingestion."""
+    added: List[str] = field(default_factory=list)
+    skipped: List[str] = field(default_factory=list)
+    errors: Dict[str, str] = field(default_factory=dict)  # document ID -> error message
+
+
 class VectorStore:
     """
     ChromaDB vector store for research documents.
@@ -38,22 +50,26 @@ class VectorStore:
         self.persist_directory = persist_directory or settings.chroma_persist_directory
         self.embedding_manager = embedding_manager or EmbeddingManager()
         
-        # Initialize ChromaDB
-        self._client = chromadb.PersistentClient(
-            path=self.persist_directory,
-            settings=ChromaSettings(anonymized_telemetry=False)
-        )
-        
-        self._collection = self._client.get_or_create_collection(
-            name=collection_name,
+        # Shared ChromaDB client and collection handle
+        self._client = get_chroma_client(self.persist_directory)
+        self._collection = get_collection(
+            collection_name,
+            self.persist_directory,
             metadata={"created_at": datetime.now().isoformat()}
         )
+        
+        # BM25 keyword index for hybrid search is looked up through _sparse
+        self._sparse_checked = False
+        
+        # Search results are cached per collection version (bumped on every write)
+        self._cache_scope = (_client_key(self.persist_directory), collection_name)
     
     def add_document(
         self,
         content: str,
         doc_id: Optional[str] = None,
-        metadata: Optional[Dict[str, Any]] = None
+        metadata: Optional[Dict[str, Any]] = None,
+        doc_type: str = "full_text"
     ) -> str:
         """
         Add a document to the vector store.
@@ -62,6 +78,7 @@ class VectorStore:
             content: Document content
             doc_id: Optional document ID
             metadata: Optional metadata
+            doc_type: "abstract" or "full_text" (selects the embedding truncation limit)
             
         Returns:
             Document ID
@@ -70,7 +87,7 @@ class VectorStore:
         
         try:
             # Generate embedding - handle errors gracefully
-            embedding = self.embedding_manager.embed_query(content)
+            embedding = self.embedding_manager.embed_documents([content], doc_type=doc_type)[0]
         except Exception as e:
             # Re-raise with original error message for better debugging
             error_msg = str(e)
@@ -118,6 +135,7 @@ class VectorStore:
             documents=[content],
             metadatas=[metadata]
         )
+        self._after_write([doc_id], [content])
         
         return doc_id
     
@@ -125,7 +143,8 @@ class VectorStore:
         self,
         contents: List[str],
         doc_ids: Optional[List[str]] = None,
-        metadatas: Optional[List[Dict[str, Any]]] = None
+        metadatas: Optional[List[Dict[str, Any]]] = None,
+        doc_type: str = "full_text"
     ) -> List[str]:
         """
         Add multiple documents to the vector store.
@@ -134,12 +153,13 @@ class VectorStore:
             contents: List of document contents
             doc_ids: Optional list of document IDs
             metadatas: Optional list of metadata dicts
+            doc_type: "abstract" or "full_text" (selects the embedding truncation limit)
             
         Returns:
             List of document IDs
         """
         doc_ids = doc_ids or [str(uuid.uuid4()) for _ in contents]
-        embeddings = self.embedding_manager.embed_documents(contents)
+        embeddings = self.embedding_manager.embed_documents(contents, doc_type=doc_type)
         
         if metadatas is None:
             metadatas = [{} for _ in contents]
@@ -153,9 +173,77 @@ class VectorStore:
             documents=contents,
             metadatas=metadatas
         )
+        self._after_write(doc_ids, contents)
         
         return doc_ids
     
+    def add_embedded_documents(
+        self,
+        doc_ids: List[str],
+        embeddings: List[List[float]],
+        contents: List[str],
+        metadatas: List[Dict[str, Any]]
+    ) -> List[str]:
+        """
+        Upsert documents whose embeddings were computed elsewhere.
+        
+        Used to bulk-load pre-embedded corpora (e.g. seed bundles) without
+        running the embedding model.
+        
+        Args:
+            doc_ids: Document IDs
+            embeddings: Embedding vectors (must come from the configured model)
+            contents: Document contents
+            metadatas: Metadata dicts
+            
+        Returns:
+            List of document IDs
+        """
+        self._collection.upsert(
+            ids=doc_ids,
+            embeddings=embeddings,
+            documents=contents,
+            metadatas=metadatas
+        )
+        self._after_write(doc_ids, contents)
+        
+        return doc_ids
+    
+    @staticmethod
+    def paper_to_document(paper: Paper) -> Tuple[str, Dict[str, Any]]:
+        """
+        Build the searchable content and metadata stored for a paper.
+        
+        Authors come after the abstract: documents are embedded with a token limit
+        (bge_m3_abstract_max_length), and long collaboration author lists
+        would otherwise push the abstract past it.
+        
+        Args:
+            paper: Paper object
+            
+        Returns:
+            Tuple of (content, metadata)
+        """
+        content = f"Title: {paper.title}\n"
+        content += f"Abstract: {paper.abstract or 'No abstract available'}\n"
+        content += f"Authors: {', '.join(paper.authors) if paper.authors else 'Unknown'}"
+        
+        metadata = {
+            "paper_id": paper.id,
+            "title": paper.title,
+            "source": paper.source,
+            "field": paper.field,
+            "url": paper.url or "",
+            "citations": paper.citations or 0,
+            "doc_type": "paper",
+            "authors": ", ".join(paper.authors) if paper.authors else "Unknown"
+        }
+        
+        if paper.published_date:
+            metadata["published_date"] = paper.published_date.isoformat()
+        
+        return content, metadata
+    
     def add_paper(self, paper: Paper) -> str:
         """
         Add a research paper to the vector store.
@@ -167,57 +255,409 @@ class VectorStore:
             Document ID
         """
         try:
-            # Create searchable content
-            content = f"Title: {paper.title}\n"
-            content += f"Authors: {', '.join(paper.authors) if paper.authors else 'Unknown'}\n"
-            content += f"Abstract: {paper.abstract or 'No abstract available'}"
-            
-            metadata = {
-                "paper_id": paper.id,
-                "title": paper.title,
-                "source": paper.source,
-                "field": paper.field,
-                "url": paper.url or "",
-                "citations": paper.citations or 0,
-                "doc_type": "paper",
-                "authors": ", ".join(paper.authors) if paper.authors else "Unknown"
-            }
-            
-            if paper.published_date:
-                metadata["published_date"] = paper.published_date.isoformat()
+            content, metadata = self.paper_to_document(paper)
             
-            return self.add_document(content, doc_id=paper.id, metadata=metadata)
+            return self.add_document(content, doc_id=paper.id, metadata=metadata, doc_type="abstract")
         except Exception as e:
             # Re-raise with more context
             raise Exception(f"Failed to add paper '{paper.title}': {str(e)}")
     
+    def add_papers(
+        self,
+        papers: List[Paper],
+        batch_size: Optional[int] = None,
+        skip_existing: bool = True
+    ) -> IngestReport:
+        """
+        Add many papers with batched embedding and one upsert per batch.
+        
+        Papers whose IDs are already stored are skipped. A paper that fails
+        to embed is reported in the result instead of aborting its batch.
+        
+        Args:
+            papers: Papers to add
+            batch_size: Papers per embed/upsert batch (default: settings.rag_ingest_batch_size)
+            skip_existing: Skip papers whose IDs are already in the collection
+            
+        Returns:
+            IngestReport with added, skipped and failed document IDs
+        """
+        batch_size = max(1, batch_size or settings.rag_ingest_batch_size)
+        report = IngestReport()
+        
+        # Drop duplicates within the input, keeping the first occurrence
+        unique: Dict[str, Paper] = {}
+        for paper in papers:
+            doc_id = paper.id or str(uuid.uuid4())
+            if doc_id in unique:
+                report.skipped.append(doc_id)
+            else:
+                unique[doc_id] = paper
+        items = list(unique.items())
+        
+        for start in range(0, len(items), batch_size):
+            batch = items[start:start + batch_size]
+            
+            if skip_existing:
+                existing = set(self._collection.get(ids=[doc_id for doc_id, _ in batch], include=[])["ids"])
+                report.skipped.extend(doc_id for doc_id, _ in batch if doc_id in existing)
+                batch = [(doc_id, paper) for doc_id, paper in batch if doc_id not in existing]
+            if not batch:
+                continue
+            
+            ids, contents, metadatas = [], [], []
+            added_at = datetime.now().isoformat()
+            for doc_id, paper in batch:
+                try:
+                    content, metadata = self.paper_to_document(paper)
+                except Exception as e:
+                    report.errors[doc_id] = f"Failed to add paper '{paper.title}': {e}"
+                    continue
+                metadata["added_at"] = added_at
+                ids.append(doc_id)
+                contents.append(content)
+                metadatas.append(metadata)
+            
+            embeddings = self._embed_batch(ids, contents, report)
+            keep = [i for i, embedding in enumerate(embeddings) if embedding is not None]
+            if not keep:
+                continue
+            
+            try:
+                self._collection.upsert(
+                    ids=[ids[i] for i in keep],
+                    embeddings=[embeddings[i] for i in keep],
+                    documents=[contents[i] for i in keep],
+                    metadatas=[metadatas[i] for i in keep]
+                )
+                report.added.extend(ids[i] for i in keep)
+            except Exception as e:
+                for i in keep:
+                    report.errors[ids[i]] = f"Failed to store paper: {e}"
+                continue
+            self._after_write([ids[i] for i in keep], [contents[i] for i in keep])
+        
+        return report
+    
+    @property
+    def _sparse(self) -> Optional[BM25Index]:
+        """Shared keyword index (None when disabled); re-fetched so a dropped index is never reused."""
+        return get_sparse_index(self.collection_name, self.persist_directory)
+    
+    def _after_write(self, doc_ids: List[str], contents: List[str]):
+        """Index written documents for keyword search and invalidate cached searches."""
+        sparse = self._sparse
+        if sparse is not None:
+            sparse.add(doc_ids, contents)
+        bump_collection_version(self._cache_scope)
+    
+    def _ensure_sparse_index(self):
+        """Backfill the keyword index for collections filled before it existed."""
+        sparse = self._sparse
+        if sparse is None or self._sparse_checked:
+            return
+        self._sparse_checked = True
+        total = self._collection.count()
+        if sparse.count >= total:
+            return
+        for offset in range(0, total, 500):
+            page = self._collection.get(include=["documents"], limit=500, offset=offset)
+            sparse.add(page["ids"], [content or "" for content in page["documents"]])
+    
+    def _embed_batch(
+        self,
+        ids: List[str],
+        contents: List[str],
+        report: IngestReport
+    ) -> List[Optional[List[float]]]:
+        """Embed a batch of paper abstracts in one call, falling back to one text at a time to isolate failures."""
+        if not contents:
+            return []
+        try:
+            return self.embedding_manager.embed_documents(contents, doc_type="abstract")
+        except Exception:
+            pass
+        
+        embeddings = []
+        for doc_id, content in zip(ids, contents):
+            try:
+                embeddings.append(self.embedding_manager.embed_documents([content], doc_type="abstract")[0])
+            except Exception as e:
+                report.errors[doc_id] = f"Failed to embed paper: {e}"
+                embeddings.append(None)
+        return embeddings
+    
     def search(
         self,
         query: str,
         n_results: int = 5,
         where: Optional[Dict[str, Any]] = None,
-        include_distances: bool = True
+        include_distances: bool = True,
+        hybrid: Optional[bool] = None
     ) -> List[Dict[str, Any]]:
         """
         Search for similar documents.
         
+        In hybrid mode, dense similarity is blended with BM25 keyword scores
+        from the collection's sparse index, so documents matching exact terms
+        (gene names, formulas, theorem names) surface even when their
+        embeddings are not the closest.
+        
         Args:
             query: Search query
             n_results: Number of results to return
             where: Optional filter conditions
             include_distances: Whether to include distance scores
+            hybrid: Blend in keyword scores (default: settings.rag_hybrid_search)
             
         Returns:
             List of search results with documents, metadata, and optionally distances
+            (hybrid results also carry "bm25_score" and "hybrid_score")
         """
+        hybrid = settings.rag_hybrid_search if hybrid is None else hybrid
+        key = self._search_key("search", query, n_results=n_results, where=where,
+                               include_distances=include_distances, hybrid=hybrid)
+        cached = self._cached(key)
+        if cached is not None:
+            return cached
+        
         query_embedding = self.embedding_manager.embed_query(query)
+        return self._store(key, self._search_embedded(query, query_embedding, n_results, where, include_distances, hybrid))
+    
+    async def asearch(
+        self,
+        query: str,
+        n_results: int = 5,
+        where: Optional[Dict[str, Any]] = None,
+        include_distances: bool = True,
+        hybrid: Optional[bool] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Async version of search.
+        
+        The query is embedded through the embedding manager's async API (the
+        shared embedding worker for local models) and the Chroma query runs
+        in the default executor, so the event loop stays free.
+        """
+        hybrid = settings.rag_hybrid_search if hybrid is None else hybrid
+        key = self._search_key("search", query, n_results=n_results, where=where,
+                               include_distances=include_distances, hybrid=hybrid)
+        cached = self._cached(key)
+        if cached is not None:
+            return cached
+        
+        aembed_query = getattr(self.embedding_manager, "aembed_query", None)
+        if aembed_query is not None:
+            query_embedding = await aembed_query(query)
+        else:
+            query_embedding = await asyncio.to_thread(self.embedding_manager.embed_query, query)
+        return self._store(key, await asyncio.to_thread(
+            self._search_embedded, query, query_embedding, n_results, where, include_distances, hybrid
+        ))
+    
+    def _search_key(self, kind: str, query: Any, **params):
+        """Cache key for a search at the collection's current version (None when caching is off)."""
+        if get_search_cache() is None:
+            return None
+        return search_key(self._cache_scope, collection_version(self._cache_scope), kind, query, **params)
+    
+    @staticmethod
+    def _cached(key) -> Optional[List[Dict[str, Any]]]:
+        cache = get_search_cache()
+        if key is None or cache is None:
+            return None
+        return cache.get(key)
+    
+    @staticmethod
+    def _store(key, results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        cache = get_search_cache()
+        if key is not None and cache is not None:
+            cache.put(key, results)
+        return results
+    
+    def _search_embedded(
+        self,
+        query: str,
+        query_embedding: List[float],
+        n_results: int,
+        where: Optional[Dict[str, Any]],
+        include_distances: bool,
+        hybrid: Optional[bool]
+    ) -> List[Dict[str, Any]]:
+        hybrid = settings.rag_hybrid_search if hybrid is None else hybrid
+        if not hybrid or self._sparse is None:
+            return self._query([query_embedding], n_results, where, include_distances)[0]
         
+        results = self._hybrid_rank(query, query_embedding, n_results, where)
+        if not include_distances:
+            for result in results:
+                result.pop("similarity", None)
+        return results
+    
+    def _hybrid_rank(
+        self,
+        query: str,
+        query_embedding: List[float],
+        n_results: int,
+        where: Optional[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        """Blend dense similarity with normalized BM25 over both candidate sets."""
+        self._ensure_sparse_index()
+        fetch = max(n_results * 3, 10)
+        candidates = {r["id"]: r for r in self._query([query_embedding], fetch, where, True)[0]}
+        keyword_scores = dict(self._sparse.search(query, n_results=fetch))
+        
+        # Keyword-only hits still need their content and dense similarity
+        missing = [doc_id for doc_id in keyword_scores if doc_id not in candidates]
+        if missing:
+            found = self._collection.get(ids=missing, where=where, include=["documents", "metadatas", "embeddings"])
+            query_vector = np.asarray(query_embedding, dtype=np.float32)
+            for doc_id, content, metadata, embedding in zip(
+                found["ids"], found["documents"], found["metadatas"], found["embeddings"]
+            ):
+                distance = float(np.sum((np.asarray(embedding, dtype=np.float32) - query_vector) ** 2))
+                candidates[doc_id] = {
+                    "id": doc_id,
+                    "content": content,
+                    "metadata": metadata,
+                    "similarity": 1 / (1 + distance)
+                }
+        
+        best_keyword = max(keyword_scores.values(), default=0.0) or 1.0
+        for doc_id, result in candidates.items():
+            result["bm25_score"] = keyword_scores.get(doc_id, 0.0)
+            result["hybrid_score"] = (
+                settings.rag_hybrid_dense_weight * result["similarity"]
+                + settings.rag_hybrid_sparse_weight * result["bm25_score"] / best_keyword
+            )
+        
+        return sorted(candidates.values(), key=lambda r: r["hybrid_score"], reverse=True)[:n_results]
+    
+    def search_by_vector(
+        self,
+        query_embedding: List[float],
+        n_results: int = 5,
+        where: Optional[Dict[str, Any]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Dense search with a precomputed query embedding (e.g. one shared
+        across collections by federated search).
+        """
+        return self._query([query_embedding], n_results, where, True)[0]
+    
+    def multi_search(
+        self,
+        queries: List[str],
+        n_results: int = 5,
+        where: Optional[Dict[str, Any]] = None,
+        rrf_k: Optional[int] = None,
+        hybrid: Optional[bool] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Search with several query variants in one round-trip.
+        
+        All variants are embedded in one batch and sent as a single
+        multi-vector Chroma query; the per-variant rankings are merged with
+        reciprocal-rank fusion. In hybrid mode each variant is ranked with
+        blended dense and BM25 scores (see search) before fusion.
+        
+        Args:
+            queries: Query variants (e.g. an agent's get_specialized_queries)
+            n_results: Number of fused results to return
+            where: Optional filter conditions
+            rrf_k: RRF smoothing constant (default: settings.rag_rrf_k)
+            hybrid: Blend in keyword scores (default: settings.rag_hybrid_search)
+            
+        Returns:
+            Fused results, best first; "similarity" is the best similarity
+            across variants and "rrf_score" the fused score
+        """
+        if not queries:
+            return []
+        hybrid = settings.rag_hybrid_search if hybrid is None else hybrid
+        key = self._search_key("multi_search", queries, n_results=n_results, where=where, rrf_k=rrf_k, hybrid=hybrid)
+        cached = self._cached(key)
+        if cached is not None:
+            return cached
+        
+        embeddings = self.embedding_manager.embed_documents(queries, doc_type="query")
+        rankings = self._rank_variants(queries, embeddings, n_results, where, hybrid)
+        return self._store(key, self.fuse_rankings(rankings, n_results, rrf_k))
+    
+    async def amulti_search(
+        self,
+        queries: List[str],
+        n_results: int = 5,
+        where: Optional[Dict[str, Any]] = None,
+        rrf_k: Optional[int] = None,
+        hybrid: Optional[bool] = None
+    ) -> List[Dict[str, Any]]:
+        """Async version of multi_search."""
+        if not queries:
+            return []
+        hybrid = settings.rag_hybrid_search if hybrid is None else hybrid
+        key = self._search_key("multi_search", queries, n_results=n_results, where=where, rrf_k=rrf_k, hybrid=hybrid)
+        cached = self._cached(key)
+        if cached is not None:
+            return cached
+        
+        aembed_documents = getattr(self.embedding_manager, "aembed_documents", None)
+        if aembed_documents is not None:
+            embeddings = await aembed_documents(queries, doc_type="query")
+        else:
+            embeddings = await asyncio.to_thread(self.embedding_manager.embed_documents, queries, doc_type="query")
+        rankings = await asyncio.to_thread(self._rank_variants, queries, embeddings, n_results, where, hybrid)
+        return self._store(key, self.fuse_rankings(rankings, n_results, rrf_k))
+    
+    def _rank_variants(
+        self,
+        queries: List[str],
+        embeddings: List[List[float]],
+        n_results: int,
+        where: Optional[Dict[str, Any]],
+        hybrid: bool
+    ) -> List[List[Dict[str, Any]]]:
+        """Per-variant rankings: one multi-vector dense query, or hybrid ranking per variant."""
+        if not hybrid or self._sparse is None:
+            return self._query(embeddings, n_results, where, True)
+        return [
+            self._hybrid_rank(query, embedding, n_results, where)
+            for query, embedding in zip(queries, embeddings)
+        ]
+    
+    @staticmethod
+    def fuse_rankings(
+        rankings: List[List[Dict[str, Any]]],
+        n_results: int,
+        rrf_k: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """Merge ranked result lists with reciprocal-rank fusion."""
+        rrf_k = settings.rag_rrf_k if rrf_k is None else rrf_k
+        fused: Dict[str, Dict[str, Any]] = {}
+        for ranking in rankings:
+            for rank, result in enumerate(ranking):
+                entry = fused.get(result["id"])
+                if entry is None:
+                    entry = fused[result["id"]] = {**result, "rrf_score": 0.0}
+                entry["rrf_score"] += 1.0 / (rrf_k + rank + 1)
+                entry["similarity"] = max(entry.get("similarity", 0.0), result.get("similarity", 0.0))
+        
+        return sorted(fused.values(), key=lambda r: r["rrf_score"], reverse=True)[:n_results]
+    
+    def _query(
+        self,
+        query_embeddings: List[List[float]],
+        n_results: int,
+        where: Optional[Dict[str, Any]],
+        include_distances: bool
+    ) -> List[List[Dict[str, Any]]]:
+        """Run nearest-neighbour queries in one call and format each result list."""
         include = ["documents", "metadatas"]
         if include_distances:
             include.append("distances")
         
         results = self._collection.query(
-            query_embeddings=[query_embedding],
+            query_embeddings=query_embeddings,
             n_results=n_results,
             where=where,
             include=include
@@ -225,20 +665,23 @@ class VectorStore:
         
         # Format results
         formatted = []
-        if results["ids"] and results["ids"][0]:
-            for i, doc_id in enumerate(results["ids"][0]):
+        for q in range(len(query_embeddings)):
+            ranking = []
+            ids = results["ids"][q] if results["ids"] and len(results["ids"]) > q else []
+            for i, doc_id in enumerate(ids):
                 result = {
                     "id": doc_id,
-                    "content": results["documents"][0][i],
-                    "metadata": results["metadatas"][0][i]
+                    "content": results["documents"][q][i],
+                    "metadata": results["metadatas"][q][i]
                 }
                 
                 if include_distances:
                     # Convert L2 distance to similarity score
-                    distance = results["distances"][0][i]
+                    distance = results["distances"][q][i]
                     result["similarity"] = 1 / (1 + distance)
                 
-                formatted.append(result)
+                ranking.append(result)
+            formatted.append(ranking)
         
         return formatted
     
@@ -259,12 +702,38 @@ class VectorStore:
         Returns:
             List of (Paper, similarity_score) tuples
         """
+        results = self.search(query, n_results=n_results, where=self._paper_filter(field))
+        return self._results_to_papers(results)
+    
+    async def asearch_papers(
+        self,
+        query: str,
+        n_results: int = 5,
+        field: Optional[str] = None
+    ) -> List[Tuple[Paper, float]]:
+        """Async version of search_papers."""
+        results = await self.asearch(query, n_results=n_results, where=self._paper_filter(field))
+        return self._results_to_papers(results)
+    
+    @staticmethod
+    def _paper_filter(field: Optional[str]) -> Dict[str, Any]:
         where = {"doc_type": "paper"}
         if field:
             where["field"] = field
-        
-        results = self.search(query, n_results=n_results, where=where)
-        
+        return where
+    
+    @staticmethod
+    def _abstract_from_content(content: str) -> str:
+        """Abstract section of paper content (see paper_to_document)."""
+        if "Abstract: " not in content:
+            return ""
+        abstract = content.split("Abstract: ", 1)[1]
+        # Older documents put authors before the abstract, newer ones after it
+        return abstract.rsplit("\nAuthors: ", 1)[0]
+    
+    @staticmethod
+    def _results_to_papers(results: List[Dict[str, Any]]) -> List[Tuple[Paper, float]]:
+        """Convert search results into (Paper, similarity_score) tuples."""
         papers = []
         for result in results:
             metadata = result["metadata"]
@@ -273,7 +742,7 @@ class VectorStore:
                 id=metadata.get("paper_id", result["id"]),
                 title=metadata.get("title", ""),
                 authors=[],  # Would need to store authors list properly
-                abstract=result["content"].split("Abstract: ")[-1] if "Abstract: " in result["content"] else "",
+                abstract=VectorStore._abstract_from_content(result["content"]),
                 url=metadata.get("url", ""),
                 source=metadata.get("source", ""),
                 field=metadata.get("field", ""),
@@ -302,14 +771,27 @@ class VectorStore:
     def delete_document(self, doc_id: str):
         """Delete a document by ID."""
         self._collection.delete(ids=[doc_id])
+        sparse = self._sparse
+        if sparse is not None:
+            sparse.delete([doc_id])
+        bump_collection_version(self._cache_scope)
     
     def clear(self):
         """Clear all documents from the collection."""
-        self._client.delete_collection(self.collection_name)
-        self._collection = self._client.create_collection(
-            name=self.collection_name,
+        # Deleting the collection also drops and closes its keyword index
+        delete_collection(self.collection_name, self.persist_directory)
+        self._collection = get_collection(
+            self.collection_name,
+            self.persist_directory,
             metadata={"created_at": datetime.now().isoformat()}
         )
+        self._sparse_checked = False
+        bump_collection_version(self._cache_scope)
+    
+    def drop(self):
+        """Delete the collection for good (the store cannot be used afterwards)."""
+        delete_collection(self.collection_name, self.persist_directory)
+        bump_collection_version(self._cache_scope)
     
     @property
     def count(self) -> int:
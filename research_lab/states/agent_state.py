@@ -65,6 +65,8 @@ class ResearchResult(BaseModel):
         default_factory=list, 
         description="Notes from reflection phase"
     )
+    degraded: bool = Field(default=False, description="Result is partial (e.g. the agent hit its deadline)")
+    degraded_reason: str = Field(default="", description="Why the result is partial")
     timestamp: datetime = Field(default_factory=datetime.now, description="Result timestamp")
     
     def to_markdown(self) -> str:
@@ -72,6 +74,8 @@ class ResearchResult(BaseModel):
         md = f"## Research Result from {self.agent_field.title()} Agent\n\n"
         md += f"**Query:** {self.query}\n\n"
         md += f"**Confidence:** {self.confidence_score:.0%}\n\n"
+        if self.degraded:
+            md += f"**Partial result:** {self.degraded_reason}\n\n"
         
         if self.summary:
             md += f"### Summary\n{self.summary}\n\n"
@@ -28,7 +28,7 @@ async def test_research_execution(mock_settings, mock_llm, sample_query):
     # Mock internal components
     agent._llm = mock_llm
     agent._rag = MagicMock()
-    agent._rag.get_context_for_query = MagicMock(return_value=("Context", [], 0.8))
+    agent._rag.aget_context_for_query = AsyncMock(return_value=("Context", [], 0.8))
     agent._agent_executor = MagicMock()
     agent._agent_executor.ainvoke = AsyncMock(return_value={"output": "Research findings"})
     
@@ -37,3 +37,29 @@ async def test_research_execution(mock_settings, mock_llm, sample_query):
     assert result.summary == "Research findings"
     assert result.agent_id == "test_agent"
     assert agent.get_state().status == AgentStatus.RESPONDING
+
+@pytest.mark.asyncio
+async def test_research_timeout_returns_partial_result(mock_settings, sample_query, sample_paper, monkeypatch, tmp_path):
+    """A run past its deadline is cancelled and returns a degraded result with the papers found so far."""
+    import asyncio
+    from config.settings import settings
+    
+    # Offline construction: fake key, throwaway Chroma directory and an injected
+    # RAG, so no embedding model is loaded
+    monkeypatch.setattr(settings, "openai_api_key", "sk-test")
+    monkeypatch.setattr(settings, "chroma_persist_directory", str(tmp_path / "chroma"))
+    rag = MagicMock()
+    rag.aget_context_for_query = AsyncMock(return_value=("Context", [sample_paper], 0.8))
+    agent = TestAgent(agent_id="test_agent", rag=rag)
+    
+    async def slow_invoke(*args, **kwargs):
+        await asyncio.sleep(10)
+    
+    agent._agent_executor = MagicMock()
+    agent._agent_executor.ainvoke = AsyncMock(side_effect=slow_invoke)
+    
+    result = await asyncio.wait_for(agent.research(sample_query, timeout=0.1), timeout=5)
+    
+    assert result.degraded
+    assert "timed out" in result.degraded_reason
+    assert [p.id for p in result.papers] == [sample_paper.id]
@@ -0,0 +1,425 @@
+import pytest
+
+from agents import llm as llm_module
+from agents.llm import get_llm, get_llm_pool_stats, reset_llm_registry
+from config.settings import settings
+
+
+@pytest.fixture
+def llm_registry(monkeypatch):
+    """Fresh LLM registry with a fake API key."""
+    monkeypatch.setattr(settings, "openai_api_key", "sk-test")
+    reset_llm_registry()
+    yield
+    reset_llm_registry()
+
+
+def test_registry_shares_clients(llm_registry):
+    """Same configuration returns the same client instance."""
+    first = get_llm(temperature=0.1)
+    second = get_llm(temperature=0.1)
+    other = get_llm(temperature=0.7)
+
+    assert first is second
+    assert first is not other
+    assert first.http_async_client is other.http_async_client
+
+    stats = get_llm_pool_stats()
+    assert stats["clients"] == 2
+    assert stats["registry_hits"] == 1
+    assert stats["registry_misses"] == 2
+    assert stats["sync_pool"]["connections"] == 0
+    assert stats["async_pool"]["requests"] == 0
+
+
+def test_registry_keys_on_max_tokens(llm_registry):
+    """max_tokens is part of the registry key."""
+    assert get_llm(temperature=0.4, max_tokens=8000) is not get_llm(temperature=0.4)
+    assert get_llm(temperature=0.4, max_tokens=8000).max_tokens == 8000
+
+
+def test_reset_closes_pool(llm_registry):
+    """Resetting the registry drops clients and the shared pool."""
+    get_llm()
+    reset_llm_registry()
+
+    assert llm_module._http_client is None
+    assert get_llm_pool_stats()["clients"] == 0
+
+
+def test_stream_chunks_accumulate_reasoning(llm_registry):
+    """reasoning_content deltas are merged while content streams through."""
+    from langchain_core.messages import AIMessageChunk
+
+    llm = get_llm()
+    deltas = [
+        {"role": "assistant", "content": "", "reasoning_content": "Think "},
+        {"content": "", "reasoning_content": "harder."},
+        {"content": "Answer"},
+    ]
+    chunks = [
+        llm._convert_chunk_to_generation_chunk(
+            {"choices": [{"index": 0, "delta": delta}]}, AIMessageChunk, {}
+        )
+        for delta in deltas
+    ]
+
+    assert chunks[2].text == "Answer"
+    merged = chunks[0] + chunks[1] + chunks[2]
+    assert merged.message.content == "Answer"
+    assert merged.message.additional_kwargs["reasoning_content"] == "Think harder."
+
+
+def test_response_cache_hits_and_ttl(tmp_path):
+    """Cached generations are returned until they expire."""
+    from langchain_core.outputs import Generation
+    from agents.llm_cache import SQLiteLLMCache
+
+    cache = SQLiteLLMCache(str(tmp_path / "llm_cache.sqlite"), ttl_seconds=60)
+    assert cache.lookup("prompt", "model=a") is None
+
+    cache.update("prompt", "model=a", [Generation(text="cached")])
+    assert cache.lookup("prompt", "model=a")[0].text == "cached"
+    assert cache.lookup("prompt", "model=b") is None
+
+    stats = cache.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 2
+    assert stats["entries"] == 1
+
+    cache.ttl_seconds = -1
+    assert cache.lookup("prompt", "model=a") is None
+    assert cache.stats()["expired"] == 1
+    cache.close()
+
+
+def test_response_cache_evicts_least_recently_used(tmp_path):
+    """Entries beyond the size bound are evicted oldest-accessed first."""
+    from langchain_core.outputs import Generation
+    from agents.llm_cache import SQLiteLLMCache
+
+    cache = SQLiteLLMCache(str(tmp_path / "llm_cache.sqlite"), max_bytes=10 ** 6)
+    for name in ("first", "second", "third"):
+        cache.update(name, "llm", [Generation(text="x" * 300)])
+    cache.lookup("first", "llm")
+
+    entry_size = cache.stats()["size_bytes"] // 3
+    cache.max_bytes = 3 * entry_size
+    cache.update("fourth", "llm", [Generation(text="x" * 300)])
+
+    assert cache.lookup("first", "llm") is not None
+    assert cache.lookup("second", "llm") is None
+    assert cache.stats()["evictions"] >= 1
+    cache.close()
+
+
+def test_registry_attaches_cache_when_enabled(llm_registry, monkeypatch, tmp_path):
+    """cache=True wires the shared response cache only when enabled."""
+    from agents.llm import get_llm_cache
+
+    assert get_llm(temperature=0.1, cache=True).cache is None
+
+    monkeypatch.setattr(settings, "llm_cache_enabled", True)
+    monkeypatch.setattr(settings, "llm_cache_path", str(tmp_path / "llm_cache.sqlite"))
+    cached = get_llm(temperature=0.1, cache=True)
+
+    assert cached.cache is get_llm_cache()
+    assert get_llm(temperature=0.1) is not cached
+    assert "response_cache" in get_llm_pool_stats()
+
+
+def test_rate_limiter_bounds_in_flight_and_records_waits():
+    """No more than max_in_flight calls run at once; queue waits are measured."""
+    import asyncio
+    from agents.rate_limiter import LLMRateLimiter
+
+    limiter = LLMRateLimiter("test", requests_per_minute=10_000, tokens_per_minute=10 ** 7, max_in_flight=2)
+    peak = 0
+
+    async def call():
+        nonlocal peak
+        async with limiter.aslot(tokens=10):
+            peak = max(peak, limiter.stats()["in_flight"])
+            await asyncio.sleep(0.05)
+
+    async def main():
+        await asyncio.gather(*(call() for _ in range(6)))
+
+    asyncio.run(main())
+
+    stats = limiter.stats()
+    assert peak == 2
+    assert stats["in_flight"] == 0
+    assert stats["granted"] == 6
+    assert stats["wait_max_seconds"] > 0
+    assert sum(stats["wait_histogram"].values()) == 6
+
+
+def test_rate_limiter_wakes_sync_waiters_and_forgets_idle_sessions():
+    """Blocked sync callers are woken by a release; finished sessions are not kept forever."""
+    import threading
+    import time
+    from agents.rate_limiter import LLMRateLimiter, llm_session
+
+    limiter = LLMRateLimiter("test", requests_per_minute=10_000, tokens_per_minute=10 ** 7, max_in_flight=1)
+    for i in range(100):
+        with llm_session(f"run-{i}"), limiter.slot(tokens=1):
+            pass
+    assert limiter._session_finish == limiter._session_tickets == {}
+
+    holder = limiter.acquire(tokens=1)
+    granted = threading.Event()
+    waiter = threading.Thread(target=lambda: (limiter.release(limiter.acquire(tokens=1)), granted.set()))
+    waiter.start()
+    time.sleep(0.05)
+    assert not granted.is_set() and limiter.stats()["queued"] == 1
+    limiter.release(holder)
+    assert granted.wait(1.0)
+    waiter.join()
+    assert limiter.stats()["in_flight"] == 0
+
+
+def test_rate_limiter_wakes_async_waiters_without_polling():
+    """An async waiter sleeps until a release on another thread resolves its future."""
+    import asyncio
+    import threading
+    from agents.rate_limiter import LLMRateLimiter
+
+    limiter = LLMRateLimiter("test", requests_per_minute=10_000, tokens_per_minute=10 ** 7, max_in_flight=1)
+    holder = limiter.acquire(tokens=1)
+    checks = 0
+    try_grant = limiter._try_grant
+
+    def counting_try_grant(ticket):
+        nonlocal checks
+        checks += 1
+        return try_grant(ticket)
+
+    limiter._try_grant = counting_try_grant
+
+    async def main():
+        threading.Timer(0.3, limiter.release, args=(holder,)).start()
+        ticket = await asyncio.wait_for(limiter.aacquire(tokens=1), timeout=2)
+        limiter.release(ticket)
+
+    asyncio.run(main())
+    assert checks == 2
+    assert limiter.stats()["in_flight"] == 0
+
+
+def test_rate_limiter_fair_across_sessions_with_priority():
+    """Sessions alternate in the queue and high-priority calls jump ahead."""
+    import asyncio
+    from agents.rate_limiter import LLMRateLimiter, LLM_PRIORITY_HIGH, llm_session
+
+    limiter = LLMRateLimiter("test", requests_per_minute=10_000, tokens_per_minute=10 ** 7, max_in_flight=1)
+    order = []
+
+    async def call(label, priority=0):
+        async with limiter.aslot(tokens=1, priority=priority):
+            order.append(label)
+            await asyncio.sleep(0.01)
+
+    async def session(name, count, priority=0):
+        with llm_session(name):
+            await asyncio.gather(*(call(name, priority) for _ in range(count)))
+
+    async def main():
+        blocker = asyncio.create_task(call("blocker"))
+        await asyncio.sleep(0)
+        await asyncio.gather(session("a", 3), session("b", 3), session("synthesis", 1, LLM_PRIORITY_HIGH))
+        await blocker
+
+    asyncio.run(main())
+
+    assert order[0] == "blocker"
+    assert order[1] == "synthesis"
+    assert order[2:] == ["a", "b", "a", "b", "a", "b"]
+
+
+def test_rate_limiter_token_budget_reconciled():
+    """Unused estimated tokens are refunded when the actual usage is known."""
+    from agents.rate_limiter import LLMRateLimiter
+
+    limiter = LLMRateLimiter("test", requests_per_minute=10_000, tokens_per_minute=1000, max_in_flight=4)
+    with limiter.slot(tokens=800) as ticket:
+        ticket.actual_tokens = 100
+
+    assert limiter._tokens.tokens >= 899
+
+
+def test_llm_call_log_sampling_redaction_and_caps(monkeypatch, caplog):
+    """Prompt dumps are opt-in, redacted and truncated; sampling skips successful calls only."""
+    import logging
+    from langchain_core.messages import HumanMessage
+    from agents.llm_logging import log_llm_call
+
+    messages = [HumanMessage(content="key sk-abcdefghijklmnop " + "x" * 500)]
+    caplog.set_level(logging.DEBUG, logger="research_lab.llm")
+
+    log_llm_call("m", messages, 0.5, sampled=False, output="ok")
+    assert not caplog.records
+
+    log_llm_call("m", messages, 0.5, sampled=False, error=TimeoutError())
+    assert caplog.records[-1].levelno == logging.WARNING
+    caplog.clear()
+
+    log_llm_call("m", messages, 0.5, sampled=True, output="ok")
+    assert len(caplog.records) == 1
+    assert caplog.records[0].llm_call["prompt_chars"] == len(messages[0].content)
+    caplog.clear()
+
+    monkeypatch.setattr(settings, "llm_log_prompts", True)
+    monkeypatch.setattr(settings, "llm_log_max_chars", 100)
+    log_llm_call("m", messages, 0.5, sampled=True, output="ok")
+    dump = caplog.records[1].getMessage()
+    assert "sk-abcdefghijklmnop" not in dump
+    assert "[REDACTED]" in dump
+    assert "chars truncated" in dump
+
+
+def test_call_site_tiers(llm_registry, monkeypatch):
+    """Call sites resolve their model and max_tokens from settings.llm_model_tiers."""
+    monkeypatch.setattr(settings, "openai_model", "big-model")
+    monkeypatch.setattr(settings, "llm_fast_model", "small-model")
+    monkeypatch.setattr(settings, "llm_model_tiers", {
+        "router": {"model": "fast", "max_tokens": 200},
+        "hypothesis_*": {"model": "default", "max_tokens": 4000},
+        "synthesis": {"model": "custom-model"},
+    })
+
+    router = get_llm(temperature=0.3, call_site="router")
+    assert (router.model_name, router.max_tokens, router.call_site) == ("small-model", 200, "router")
+
+    critic = get_llm(call_site="hypothesis_critic")
+    assert (critic.model_name, critic.max_tokens) == ("big-model", 4000)
+
+    assert get_llm(call_site="synthesis").model_name == "custom-model"
+    assert get_llm(call_site="router", max_tokens=50).max_tokens == 50
+    assert get_llm(call_site="unknown").model_name == "big-model"
+
+    monkeypatch.setattr(settings, "llm_fast_model", "")
+    assert get_llm(temperature=0.1, call_site="router").model_name == "big-model"
+
+
+def test_hedged_call_and_stream(monkeypatch):
+    """A stalled request is duplicated after the hedge delay and the loser is cancelled."""
+    import asyncio
+    from agents.hedging import get_hedging_stats, hedged_call, hedged_stream, reset_hedging_stats
+
+    monkeypatch.setattr(settings, "llm_hedge_initial_delay", 0.05)
+    monkeypatch.setattr(settings, "llm_hedge_min_delay", 0.01)
+    reset_hedging_stats()
+    attempts = []
+    cancelled = []
+
+    async def call():
+        attempt = len(attempts)
+        attempts.append(attempt)
+        try:
+            await asyncio.sleep(1.0 if attempt == 0 else 0.01)
+        except asyncio.CancelledError:
+            cancelled.append(attempt)
+            raise
+        return f"answer {attempt}"
+
+    async def stream():
+        attempt = len(attempts)
+        attempts.append(attempt)
+        await asyncio.sleep(1.0 if attempt == 0 else 0.01)
+        for token in ("a", "b", "c"):
+            yield f"{token}{attempt}"
+
+    async def main():
+        fast = await hedged_call("router", lambda: asyncio.sleep(0, result="quick"))
+        slow = await hedged_call("router", call)
+        attempts.clear()
+        tokens = [token async for token in hedged_stream("synthesis", stream)]
+        return fast, slow, tokens
+
+    fast, slow, tokens = asyncio.run(main())
+
+    assert fast == "quick"
+    assert slow == "answer 1"
+    assert cancelled == [0]
+    assert tokens == ["a1", "b1", "c1"]
+
+    stats = get_hedging_stats()
+    assert stats["router"]["calls"] == 2
+    assert stats["router"]["hedges_fired"] == 1
+    assert stats["router"]["hedges_won"] == 1
+    assert stats["synthesis"]["hedges_won"] == 1
+    # Calls are hedged on completion latency, streams on time to the first chunk
+    assert stats["router"]["samples"] == {"first_token": 0, "completion": 2}
+    assert stats["synthesis"]["samples"] == {"first_token": 1, "completion": 0}
+
+    class FailingStream:
+        closed = False
+
+        def __aiter__(self):
+            return self
+
+        async def __anext__(self):
+            raise ValueError("connection reset")
+
+        async def aclose(self):
+            self.closed = True
+
+    failing = FailingStream()
+
+    async def consume():
+        return [token async for token in hedged_stream("synthesis", lambda: failing)]
+
+    with pytest.raises(ValueError):
+        asyncio.run(consume())
+    assert failing.closed
+
+
+def test_registry_enables_hedging_per_call_site(llm_registry, monkeypatch):
+    """Only call sites listed in llm_hedge_call_sites are hedged."""
+    assert not get_llm(call_site="router").hedge
+
+    monkeypatch.setattr(settings, "llm_hedging_enabled", True)
+    assert get_llm(call_site="router").hedge
+    assert not get_llm(call_site="reflector").hedge
+
+
+def test_rate_limiter_reserves_estimates_and_exempts_hedges(llm_registry, monkeypatch):
+    """Calls reserve a typical completion, not max_tokens, and hedged duplicates take no second slot."""
+    import asyncio
+    from langchain_core.messages import AIMessage, HumanMessage
+    from langchain_core.outputs import ChatGeneration, ChatResult
+    from langchain_openai import ChatOpenAI
+    from agents.hedging import reset_hedging_stats
+    from agents.rate_limiter import get_rate_limiter
+
+    messages = [HumanMessage(content="x" * 400)]
+    assert llm_module._estimate_tokens(messages, 8000) == 101 + settings.llm_completion_token_estimate
+    assert llm_module._estimate_tokens(messages, 50) == 151
+
+    monkeypatch.setattr(settings, "llm_hedging_enabled", True)
+    monkeypatch.setattr(settings, "llm_hedge_initial_delay", 0.05)
+    monkeypatch.setattr(settings, "llm_hedge_min_delay", 0.01)
+    reset_hedging_stats()
+    attempts = []
+
+    async def fake_agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        attempts.append(len(attempts))
+        await asyncio.sleep(1.0 if len(attempts) == 1 else 0.01)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content="y" * 40))])
+
+    monkeypatch.setattr(ChatOpenAI, "_agenerate", fake_agenerate)
+    llm = get_llm(call_site="router")
+    result = asyncio.run(llm._agenerate(messages))
+
+    assert result.generations[0].text == "y" * 40
+    assert len(attempts) == 2
+    limiter = get_rate_limiter(llm.model_name, llm.openai_api_base)
+    stats = limiter.stats()
+    assert (stats["granted"], stats["in_flight"]) == (1, 0)
+
+    # Without reported usage the reservation is reconciled from the text
+    llm.hedge = False
+    tokens = limiter._tokens.tokens
+    asyncio.run(llm._agenerate(messages))
+    assert limiter._tokens.tokens >= tokens - 120
@@ -41,3 +41,116 @@ async def test_route_query(mock_team_config, mock_settings):
     assert decision.domain_agents == ["ai_ml"]
     assert decision.parallel is True
     assert decision.reasoning == "Test reasoning"
+
+@pytest.mark.asyncio
+async def test_lazy_agent_registry_builds_once():
+    """Agents are built on first access, exactly once, and failures are remembered."""
+    import asyncio
+    import time
+    from agents.orchestrator import LazyAgentRegistry
+    
+    built = []
+    
+    def make_agent():
+        time.sleep(0.05)
+        built.append(1)
+        return MagicMock()
+    
+    def broken_agent():
+        raise RuntimeError("no API key")
+    
+    registry = LazyAgentRegistry({"ai_ml": make_agent, "physics": broken_agent}, kind="domain")
+    
+    assert "ai_ml" in registry
+    assert registry.built() == {}
+    
+    agents = await asyncio.gather(*(registry.aget("ai_ml") for _ in range(5)))
+    assert len(built) == 1
+    assert all(agent is agents[0] for agent in agents)
+    
+    with pytest.raises(KeyError):
+        registry["physics"]
+    assert "physics" not in registry
+    assert list(registry) == ["ai_ml"]
+    assert list(registry.built()) == ["ai_ml"]
+
+@pytest.mark.asyncio
+async def test_domain_research_deadline_includes_agent_construction(monkeypatch, sample_query):
+    """Time spent building an agent on first use comes out of its own deadline, so it still returns partial results."""
+    import asyncio
+    from config.settings import settings
+    from graphs.research_graph import ResearchGraph
+    from agents.orchestrator import LazyAgentRegistry
+    from states.agent_state import ResearchResult
+    
+    timeouts = []
+    
+    class SlowAgent:
+        async def research(self, query, timeout=None):
+            timeouts.append(timeout)
+            try:
+                await asyncio.wait_for(asyncio.sleep(10), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
+            return ResearchResult(
+                agent_id="ai_ml_agent", agent_field="ai_ml", query=query.query,
+                summary="partial", degraded=True, degraded_reason="timed out"
+            )
+    
+    def make_agent():
+        # Building takes longer than the node's grace period
+        import time
+        time.sleep(0.5)
+        return SlowAgent()
+    
+    monkeypatch.setattr(settings, "node_timeout", 1.0)
+    monkeypatch.setattr(settings, "agent_timeout", 60)
+    graph = ResearchGraph.__new__(ResearchGraph)
+    graph.orchestrator = MagicMock()
+    graph.orchestrator.domain_agents = LazyAgentRegistry({"ai_ml": make_agent}, kind="domain")
+    state = {
+        "current_query": sample_query,
+        "active_domain_agents": ["ai_ml"],
+        "domain_results": [],
+        "phase_details": {},
+        "node_outputs": {}
+    }
+    
+    state = await graph._domain_research_node(state)
+    
+    assert [r.summary for r in state["domain_results"]] == ["partial"]
+    assert timeouts[0] < 0.5
+
+@pytest.mark.asyncio
+async def test_domain_research_degrades_agents_that_cancel_themselves(sample_query):
+    """An agent exiting through CancelledError gets a degraded placeholder instead of failing the node."""
+    import asyncio
+    from graphs.research_graph import ResearchGraph
+    from agents.orchestrator import LazyAgentRegistry
+    
+    class CancellingAgent:
+        async def research(self, query, timeout=None):
+            raise asyncio.CancelledError()
+    
+    class FailingAgent:
+        async def research(self, query, timeout=None):
+            raise RuntimeError("boom")
+    
+    graph = ResearchGraph.__new__(ResearchGraph)
+    graph.orchestrator = MagicMock()
+    graph.orchestrator.domain_agents = LazyAgentRegistry(
+        {"ai_ml": CancellingAgent, "physics": FailingAgent}, kind="domain"
+    )
+    state = {
+        "current_query": sample_query,
+        "active_domain_agents": ["ai_ml", "physics"],
+        "domain_results": [],
+        "phase_details": {},
+        "node_outputs": {}
+    }
+    
+    state = await graph._domain_research_node(state)
+    
+    assert [(r.agent_field, r.degraded_reason) for r in state["domain_results"]] == [
+        ("ai_ml", "cancelled"), ("physics", "failed: boom")
+    ]
@@ -0,0 +1,931 @@
+import asyncio
+import os
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from rag import seed_rag
+from rag.vector_store import VectorStore
+from states.agent_state import Paper
+from config.settings import settings
+
+
+class FakeEmbeddingManager:
+    """Deterministic bag-of-characters embeddings that record their calls."""
+
+    def __init__(self, dimension: int = 16):
+        self.dimension = dimension
+        self.document_batches = []
+        self.doc_types = []
+        self.queries = []
+
+    def _embed(self, text):
+        vector = [0.0] * self.dimension
+        for char in text.lower():
+            vector[ord(char) % self.dimension] += 1.0
+        norm = sum(v * v for v in vector) ** 0.5 or 1.0
+        return [v / norm for v in vector]
+
+    def embed_query(self, text):
+        self.queries.append(text)
+        return self._embed(text)
+
+    def embed_documents(self, texts, doc_type=None):
+        self.document_batches.append(len(texts))
+        self.doc_types.append(doc_type)
+        return [self._embed(text) for text in texts]
+
+    def get_embedding_dimension(self):
+        return self.dimension
+
+
+@pytest.fixture
+def vector_store(tmp_path):
+    """VectorStore on a temporary Chroma directory with fake embeddings."""
+    return VectorStore(
+        "test_collection",
+        persist_directory=str(tmp_path / "chroma"),
+        embedding_manager=FakeEmbeddingManager()
+    )
+
+
+def make_papers(prefix, count):
+    return [
+        Paper(id=f"{prefix}_{i}", title=f"{prefix} paper {i}", abstract=f"About {prefix} {i}", source="test")
+        for i in range(count)
+    ]
+
+
+class FakeSemanticScholar:
+    """Semantic Scholar stand-in that tracks concurrent searches."""
+
+    active = 0
+    peak = 0
+    lock = threading.Lock()
+
+    def search(self, query, max_results=10):
+        with self.lock:
+            FakeSemanticScholar.active += 1
+            FakeSemanticScholar.peak = max(FakeSemanticScholar.peak, FakeSemanticScholar.active)
+        time.sleep(0.05)
+        with self.lock:
+            FakeSemanticScholar.active -= 1
+        # Every query also returns a shared duplicate
+        return make_papers(query.split()[0], max_results - 1) + make_papers("shared", 1)
+
+
+def test_fetch_seed_papers_concurrent_round_robin(monkeypatch):
+    """Seed queries run concurrently under a shared cap; results are deduplicated and interleaved."""
+    monkeypatch.setattr(seed_rag, "SemanticScholarTool", FakeSemanticScholar)
+    monkeypatch.setattr(settings, "rag_seed_max_concurrent_requests", 2)
+    FakeSemanticScholar.peak = 0
+
+    # Two fields seeding at once still share the cap
+    other = threading.Thread(target=seed_rag.fetch_seed_papers, args=("biology", 10))
+    other.start()
+    papers = seed_rag.fetch_seed_papers("physics", num_papers=10)
+    other.join()
+
+    assert FakeSemanticScholar.peak == 2
+    assert len(papers) == 10
+    assert len({paper.id for paper in papers}) == 10
+    assert [paper.id for paper in papers[:5]] == ["quantum_0", "general_0", "particle_0", "condensed_0", "astrophysics_0"]
+    assert all(paper.field == "physics" for paper in papers)
+
+
+def test_seed_search_slots_resize_only_when_idle(monkeypatch):
+    """Changing the cap while a seed fetch runs keeps the shared semaphore until the fetches finish."""
+    monkeypatch.setattr(settings, "rag_seed_max_concurrent_requests", 2)
+    running, size = seed_rag._get_search_slots()
+    try:
+        assert size == 2
+        monkeypatch.setattr(settings, "rag_seed_max_concurrent_requests", 5)
+        assert seed_rag._get_search_slots() == (running, 2)
+        seed_rag._release_search_slots()
+    finally:
+        seed_rag._release_search_slots()
+
+    resized, size = seed_rag._get_search_slots()
+    seed_rag._release_search_slots()
+    assert resized is not running and size == 5
+
+
+def test_background_seeding_batches_and_reports_progress(monkeypatch, vector_store):
+    """Seeding returns immediately, embeds in batches and reports progress."""
+    started = threading.Event()
+    release = threading.Event()
+
+    def fetch(field, num_papers):
+        started.set()
+        release.wait(5)
+        return make_papers("seed", num_papers)
+
+    monkeypatch.setattr(seed_rag, "fetch_seed_papers", fetch)
+    monkeypatch.setattr(settings, "rag_seed_batch_size", 4)
+
+    progress = seed_rag.start_background_seeding(vector_store, "biology", num_papers=10)
+    assert progress.running
+    assert seed_rag.start_background_seeding(vector_store, "biology") is progress
+    assert started.wait(5)
+    assert seed_rag.get_seeding_progress("biology")["status"] == "fetching"
+
+    release.set()
+    assert seed_rag.wait_for_seeding("biology", timeout=10)
+
+    report = seed_rag.get_seeding_progress("biology")
+    assert report["status"] == "done"
+    assert (report["fetched"], report["added"], report["total"]) == (10, 10, 10)
+    assert vector_store.count == 10
+    assert vector_store.embedding_manager.document_batches == [4, 4, 2]
+
+    # A populated collection is not seeded again
+    again = seed_rag.start_background_seeding(vector_store, "biology", num_papers=10)
+    assert seed_rag.wait_for_seeding("biology", timeout=10)
+    assert again.status == "skipped"
+
+
+def test_seed_bundle_round_trip(monkeypatch, tmp_path, vector_store):
+    """Exported bundles seed a collection without fetching or embedding."""
+    from rag import seed_bundle
+
+    monkeypatch.setattr(seed_rag, "fetch_seed_papers", lambda field, num_papers: make_papers(field, num_papers))
+    path = str(tmp_path / "bundle" / "seed_bundle.npz")
+    counts = seed_bundle.export_seed_bundle(
+        path, fields=["physics", "biology"], num_papers=3, embedding_manager=FakeEmbeddingManager()
+    )
+    assert counts == {"physics": 3, "biology": 3}
+
+    def no_fetch(field, num_papers):
+        raise AssertionError("bundle should be used")
+
+    monkeypatch.setattr(seed_rag, "fetch_seed_papers", no_fetch)
+    monkeypatch.setattr(settings, "rag_seed_bundle_path", path)
+
+    assert seed_rag.seed_rag_if_empty(vector_store, "physics", num_papers=3)
+    assert vector_store.count == 3
+    assert vector_store.embedding_manager.document_batches == []
+    content, _ = VectorStore.paper_to_document(make_papers("physics", 3)[1])
+    assert vector_store.search(content, n_results=1)[0]["id"] == "physics_1"
+
+    monkeypatch.setattr(settings, "bge_m3_model_name", "other-model")
+    with pytest.raises(ValueError, match="embedded with"):
+        seed_bundle.import_seed_bundle_field(vector_store, "biology")
+
+
+def test_chroma_registry_shares_clients_and_collections(monkeypatch, tmp_path):
+    """Stores on one directory share a client and collection handles."""
+    from rag.chroma_client import get_chroma_client
+    from memory.long_term import LongTermMemory
+
+    monkeypatch.setattr(settings, "openai_api_key", "sk-test")
+
+    directory = str(tmp_path / "chroma")
+    first = VectorStore("shared_collection", persist_directory=directory, embedding_manager=FakeEmbeddingManager())
+    second = VectorStore("shared_collection", persist_directory=directory, embedding_manager=FakeEmbeddingManager())
+    memory = LongTermMemory("agent_1", persist_directory=directory)
+
+    assert first._client is second._client is memory._client is get_chroma_client(directory)
+    assert first._collection is second._collection
+    assert get_chroma_client(str(tmp_path / "other")) is not first._client
+
+    first.add_documents(["some text"])
+    first.clear()
+    assert first.count == 0
+    assert VectorStore("shared_collection", persist_directory=directory, embedding_manager=FakeEmbeddingManager()).count == 0
+
+
+@pytest.mark.skipif(not __import__("shutil").which("chroma"), reason="chroma CLI not installed")
+def test_chroma_client_server_mode(monkeypatch, tmp_path):
+    """Client/server mode autostarts a local server that all stores share."""
+    import socket
+    from rag.chroma_client import get_chroma_client, reset_chroma_clients
+
+    with socket.socket() as sock:
+        sock.bind(("localhost", 0))
+        port = sock.getsockname()[1]
+
+    monkeypatch.setattr(settings, "chroma_persist_directory", str(tmp_path / "server"))
+    monkeypatch.setattr(settings, "chroma_server_host", "localhost")
+    monkeypatch.setattr(settings, "chroma_server_port", port)
+    monkeypatch.setattr(settings, "chroma_server_autostart", True)
+    try:
+        store = VectorStore("server_collection", embedding_manager=FakeEmbeddingManager())
+        store.add_documents(["served text"])
+
+        assert get_chroma_client(str(tmp_path / "ignored")) is store._client
+        assert VectorStore("server_collection", embedding_manager=FakeEmbeddingManager()).count == 1
+    finally:
+        reset_chroma_clients()
+
+
+def test_chroma_autostart_runs_outside_the_registry_and_tolerates_lost_races(monkeypatch):
+    """A worker that loses the port to another worker's server uses that server."""
+    from rag import chroma_client
+
+    monkeypatch.setattr(settings, "chroma_server_host", "localhost")
+    monkeypatch.setattr(settings, "chroma_server_autostart", True)
+    monkeypatch.setattr(chroma_client.shutil, "which", lambda name: "/usr/bin/chroma")
+    monkeypatch.setattr(chroma_client.chromadb, "HttpClient", lambda **kwargs: object())
+    server_up = []
+    starts = []
+
+    def losing_start(timeout=30.0):
+        starts.append(chroma_client._registry_lock.locked())
+        server_up.append(True)  # the other worker's server comes up
+        raise RuntimeError("Chroma server exited with code 1")
+
+    monkeypatch.setattr(chroma_client, "start_local_chroma_server", losing_start)
+    monkeypatch.setattr(chroma_client, "_server_is_up", lambda: bool(server_up))
+    try:
+        client = chroma_client.get_chroma_client()
+        assert chroma_client.get_chroma_client() is client
+        assert starts == [False]
+        assert chroma_client._server_process is None
+    finally:
+        chroma_client.reset_chroma_clients()
+
+
+def test_add_papers_batches_skips_existing_and_reports_errors(vector_store):
+    """Bulk ingestion embeds per batch, upserts once per batch and isolates failures."""
+    manager = vector_store.embedding_manager
+    papers = make_papers("bulk", 5)
+
+    report = vector_store.add_papers(papers + papers[:1], batch_size=2)
+    assert report.added == [p.id for p in papers]
+    assert report.skipped == ["bulk_0"]
+    assert manager.document_batches == [2, 2, 1]
+
+    # Existing IDs are skipped without re-embedding
+    manager.document_batches.clear()
+    report = vector_store.add_papers(papers[:3] + make_papers("late", 2), batch_size=10)
+    assert report.skipped == ["bulk_0", "bulk_1", "bulk_2"]
+    assert report.added == ["late_0", "late_1"]
+    assert manager.document_batches == [2]
+
+    assert set(manager.doc_types) == {"abstract"}
+
+    # One failing paper does not abort its batch
+    embed_documents = manager.embed_documents
+
+    def flaky_embed_documents(texts, doc_type=None):
+        if len(texts) > 1:
+            raise RuntimeError("batch failed")
+        if "broken" in texts[0]:
+            raise RuntimeError("bad text")
+        return embed_documents(texts, doc_type)
+
+    manager.embed_documents = flaky_embed_documents
+    report = vector_store.add_papers(make_papers("fine", 2) + make_papers("broken", 1))
+    assert report.added == ["fine_0", "fine_1"]
+    assert list(report.errors) == ["broken_0"]
+    assert "bad text" in report.errors["broken_0"]
+    assert vector_store.count == 9
+
+
+def test_paper_documents_put_authors_after_the_abstract(vector_store):
+    """Long author lists cannot push the abstract past the embedding token limit."""
+    paper = Paper(
+        id="collab", title="Higgs", authors=[f"Author {i}" for i in range(3000)],
+        abstract="We observe a new boson.", source="test"
+    )
+    content, _ = VectorStore.paper_to_document(paper)
+    assert content.index("Abstract: ") < content.index("Authors: ")
+
+    vector_store.add_papers([paper])
+    (found, _), = vector_store.search_papers("new boson", n_results=1)
+    assert found.abstract == "We observe a new boson."
+
+    # Documents stored before authors moved still parse
+    legacy = "Title: Higgs\nAuthors: A, B\nAbstract: We observe a new boson."
+    assert VectorStore._abstract_from_content(legacy) == "We observe a new boson."
+
+
+def test_embedding_cache_lru_and_namespaces(tmp_path):
+    """Vectors round-trip through float16, evict LRU-first and stay per model."""
+    from rag.embedding_cache import EmbeddingCache
+
+    cache = EmbeddingCache(str(tmp_path), "bge-m3:BAAI/bge-m3", dimension=4, capacity=2)
+    cache.put_many(["a", "b"], [[0.1, 0.2, 0.3, 0.4], [1.0, 0.0, 0.0, 0.0]])
+    assert cache.get_many(["a", "missing"])[1] is None
+    assert cache.get_many(["a"])[0] == pytest.approx([0.1, 0.2, 0.3, 0.4], abs=1e-3)
+
+    # "b" is least recently used, so it is evicted first
+    cache.put_many(["c"], [[0.0, 1.0, 0.0, 0.0]])
+    assert cache.get_many(["b"]) == [None]
+    assert cache.get_many(["c"])[0] == [0.0, 1.0, 0.0, 0.0]
+    assert cache.stats()["evictions"] == 1
+    cache.close()
+
+    reopened = EmbeddingCache(str(tmp_path), "bge-m3:BAAI/bge-m3", dimension=4, capacity=2)
+    assert reopened.get_many(["c"])[0] == [0.0, 1.0, 0.0, 0.0]
+    other_model = EmbeddingCache(str(tmp_path), "openai:text-embedding-3-small", dimension=4, capacity=2)
+    assert other_model.get_many(["c"]) == [None]
+
+
+def test_embedding_cache_grows_on_demand_and_is_shared_safely(tmp_path):
+    """The vector file starts small, reads do not write, and caches sharing a directory never mix up slots."""
+    from rag import embedding_cache
+    from rag.embedding_cache import EmbeddingCache
+
+    first = EmbeddingCache(str(tmp_path), "m", dimension=4, capacity=50000)
+    assert first.stats()["allocated_slots"] == embedding_cache.GROW_SLOTS
+    texts = [f"t{i}" for i in range(embedding_cache.GROW_SLOTS + 5)]
+    first.put_many(texts, [[float(i), 0.0, 0.0, 1.0] for i in range(len(texts))])
+    assert first.stats()["allocated_slots"] == 2 * embedding_cache.GROW_SLOTS
+
+    # A second handle (as another process would open) sees the grown file
+    second = EmbeddingCache(str(tmp_path), "m", dimension=4, capacity=50000)
+    changes = second._conn.total_changes
+    assert second.get_many(["t1028"])[0] == [1028.0, 0.0, 0.0, 1.0]
+    assert second._conn.total_changes == changes
+
+    # Slots reused by one handle are never served under the old key by the other
+    small_a = EmbeddingCache(str(tmp_path), "small", dimension=4, capacity=2)
+    small_b = EmbeddingCache(str(tmp_path), "small", dimension=4, capacity=2)
+    small_a.put_many(["a", "b"], [[1.0, 0, 0, 0], [0, 1.0, 0, 0]])
+    small_b.put_many(["c"], [[0, 0, 1.0, 0]])
+    assert small_a.get_many(["a", "b", "c"]) == [None, [0, 1.0, 0, 0], [0, 0, 1.0, 0]]
+
+    # A slot caught mid-write by another process reads as a miss
+    slot = small_a._conn.execute("SELECT slot FROM entries WHERE key = ?", (EmbeddingCache.key("b"),)).fetchone()[0]
+    small_a._vectors["tag"][slot] = 0
+    assert small_b.get_many(["b"]) == [None]
+
+
+def test_embedding_manager_only_embeds_cache_misses(monkeypatch, tmp_path):
+    """EmbeddingManager serves repeated texts from the cache."""
+    from rag import embeddings
+    from rag.embedding_cache import reset_embedding_caches
+    from rag.embedding_worker import reset_embedding_workers
+
+    model = FakeEmbeddingManager()
+    monkeypatch.setattr(embeddings, "get_embeddings_model", lambda model_name=None: model)
+    monkeypatch.setattr(settings, "embedding_cache_dir", str(tmp_path))
+    reset_embedding_caches()
+    try:
+        manager = embeddings.EmbeddingManager()
+        first = manager.embed_documents(["alpha", "beta"])
+        second = manager.embed_documents(["beta", "gamma", "alpha"])
+        manager.embed_query("gamma")
+        manager.embed_query("gamma")
+        delta = asyncio.run(manager.aembed_query("delta"))
+        asyncio.run(manager.aembed_query("gamma"))
+
+        # Queries use their own truncation limit, so they are cached apart from documents
+        assert model.document_batches == [2, 1, 1, 1]
+        assert model.doc_types == [None, None, "query", "query"]
+        assert model.queries == []
+        assert second[0] == pytest.approx(first[1], abs=1e-3)
+        assert delta == model._embed("delta")
+    finally:
+        reset_embedding_caches()
+        reset_embedding_workers()
+
+
+def test_embedding_worker_coalesces_concurrent_requests():
+    """Single-text requests from many threads run as a few batched encode calls."""
+    from rag.embedding_worker import EmbeddingWorker
+
+    model = FakeEmbeddingManager()
+    worker = EmbeddingWorker(model.embed_documents, max_batch_size=16, max_wait=0.2)
+    try:
+        texts = [f"query {i}" for i in range(8)]
+        results = {}
+        start = threading.Barrier(len(texts))
+
+        def embed(text):
+            start.wait()
+            results[text] = worker.embed_query(text)
+
+        threads = [threading.Thread(target=embed, args=(text,)) for text in texts]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert len(model.document_batches) < len(texts)
+        assert sum(model.document_batches) == len(texts)
+        assert all(results[text] == model._embed(text) for text in texts)
+
+        # Very different lengths go to separate buckets
+        long_text = "x" * 1000
+        embedded = asyncio.run(worker.aembed_documents(["short", long_text]))
+        assert embedded == [model._embed("short"), model._embed(long_text)]
+        assert model.document_batches[-2:] == [1, 1]
+
+        stats = worker.stats()
+        assert stats["requests"] == len(texts) + 2
+        assert sum(stats["batch_size_histogram"].values()) == stats["batches"]
+        assert sum(stats["latency_histogram"].values()) == stats["requests"]
+    finally:
+        worker.shutdown(timeout=5)
+
+
+def test_bge_m3_encodes_length_sorted_batches(monkeypatch):
+    """Texts are encoded in token-length order, each batch padded to its own longest text."""
+    from rag import embeddings
+
+    class FakeTokenizer:
+        def __call__(self, texts, truncation=True, max_length=None):
+            return {"input_ids": [list(range(min(len(text.split()), max_length))) for text in texts]}
+
+    class FakeBGEM3:
+        def __init__(self, *args, **kwargs):
+            self.tokenizer = FakeTokenizer()
+            self.calls = []
+
+        def encode(self, texts, batch_size, max_length, **kwargs):
+            self.calls.append((len(texts), max_length))
+            return {"dense_vecs": [np.full(4, len(text.split()), dtype=np.float32) for text in texts]}
+
+    monkeypatch.setattr(embeddings, "BGE_M3_AVAILABLE", True)
+    monkeypatch.setattr(embeddings, "BGEM3FlagModel", FakeBGEM3)
+    monkeypatch.setattr(settings, "bge_m3_batch_size", 2)
+    monkeypatch.setattr(settings, "bge_m3_abstract_max_length", 50)
+
+    model = embeddings.BGEM3Embeddings()
+    texts = ["w " * 300, "w " * 3, "w " * 40, "w " * 5, "w " * 1]
+    vectors = model.embed_documents(texts)
+
+    # Results come back in input order
+    assert [v[0] for v in vectors] == [300, 3, 40, 5, 1]
+    assert model.model.calls == [(2, 3), (2, 40), (1, 300)]
+
+    # Abstracts are truncated to their own limit
+    model.model.calls.clear()
+    model.embed_documents(texts, doc_type="abstract")
+    assert model.model.calls[-1] == (1, 50)
+
+
+def test_colbert_reranker_shares_the_bge_m3_model_lock(monkeypatch):
+    """The ColBERT reranker does not load the model up front and scores under the encode lock."""
+    from rag import embeddings
+    from rag.reranker import ColBERTReranker
+
+    class FakeBGEM3:
+        loads = 0
+
+        def __init__(self, *args, **kwargs):
+            FakeBGEM3.loads += 1
+
+        def compute_score(self, pairs, **kwargs):
+            assert model._lock._is_owned()
+            return {"colbert": [float(len(doc)) for _, doc in pairs]}
+
+    monkeypatch.setattr(embeddings, "BGE_M3_AVAILABLE", True)
+    monkeypatch.setattr(embeddings, "BGEM3FlagModel", FakeBGEM3)
+
+    model = embeddings.BGEM3Embeddings()
+    reranker = ColBERTReranker(model)
+    assert FakeBGEM3.loads == 0
+    assert reranker.score("q", ["ab", "abcd"]) == [2.0, 4.0]
+    assert FakeBGEM3.loads == 1
+
+    with pytest.raises(ValueError):
+        ColBERTReranker(object())
+
+
+def test_onnx_backend_pools_normalizes_and_batches_by_length(monkeypatch):
+    """The ONNX backend CLS-pools, L2-normalizes and pads each batch to its own longest text."""
+    from types import SimpleNamespace
+    from rag import embeddings
+
+    if not embeddings.ONNX_RUNTIME_AVAILABLE:
+        pytest.skip("onnxruntime is not installed")
+
+    class FakeTokenizer:
+        def no_padding(self):
+            pass
+
+        def enable_truncation(self, max_length):
+            self.max_length = max_length
+
+        def encode_batch(self, texts):
+            return [SimpleNamespace(ids=[0] + [5] * min(len(t.split()), self.max_length - 1)) for t in texts]
+
+        def token_to_id(self, token):
+            return 1
+
+    class FakeSession:
+        def __init__(self):
+            self.widths = []
+
+        def get_inputs(self):
+            return [SimpleNamespace(name="input_ids"), SimpleNamespace(name="attention_mask")]
+
+        def get_outputs(self):
+            return [SimpleNamespace(name="last_hidden_state")]
+
+        def run(self, names, feed):
+            self.widths.append(feed["input_ids"].shape[1])
+            hidden = np.zeros(feed["input_ids"].shape + (2,), dtype=np.float32)
+            hidden[:, 0, 0] = feed["attention_mask"].sum(axis=1)
+            hidden[:, 0, 1] = feed["attention_mask"].sum(axis=1)
+            return [hidden]
+
+    monkeypatch.setattr(settings, "bge_m3_batch_size", 2)
+    model = embeddings.ONNXBGEM3Embeddings(model_path="unused")
+    model._session, model._tokenizer = FakeSession(), FakeTokenizer()
+
+    vectors = model.embed_documents(["w " * 9, "w", "w " * 4])
+    assert vectors == [pytest.approx([2 ** -0.5, 2 ** -0.5])] * 3
+    assert model._session.widths == [5, 10]
+
+    model.embed_query("w " * 1000)
+    assert model._session.widths[-1] == settings.bge_m3_query_max_length
+
+
+def test_int8_onnx_is_its_own_model_and_quantizes_into_the_cache_dir(monkeypatch, tmp_path):
+    """Cache and bundles agree that int8 vectors are a separate model; the int8 copy never lands in the source dir."""
+    import sys
+    from types import SimpleNamespace
+    from rag import embeddings, seed_bundle
+
+    monkeypatch.setattr(settings, "embeddings_provider", "bge-m3-onnx")
+    monkeypatch.setattr(settings, "bge_m3_onnx_quantize", True)
+    assert seed_bundle.current_embedding_model() == embeddings.embedding_model_id() == f"bge-m3:{settings.bge_m3_model_name}:int8"
+    monkeypatch.setattr(settings, "bge_m3_onnx_quantize", False)
+    assert seed_bundle.current_embedding_model() == f"bge-m3:{settings.bge_m3_model_name}"
+
+    if not embeddings.ONNX_RUNTIME_AVAILABLE:
+        pytest.skip("onnxruntime is not installed")
+    calls = []
+
+    def quantize_dynamic(source, target, **kwargs):
+        calls.append(source)
+        open(target, "wb").close()
+
+    monkeypatch.setitem(sys.modules, "onnxruntime.quantization", SimpleNamespace(
+        QuantType=SimpleNamespace(QInt8="int8"), quantize_dynamic=quantize_dynamic
+    ))
+    monkeypatch.setattr(settings, "bge_m3_onnx_cache_dir", str(tmp_path / "onnx_cache"))
+    source = tmp_path / "snapshot" / "model.onnx"
+    source.parent.mkdir()
+    source.touch()
+
+    model = embeddings.ONNXBGEM3Embeddings(model_path=str(source.parent))
+    quantized = model._quantized_model(source)
+    assert quantized.parent.parent == tmp_path / "onnx_cache"
+    assert model._quantized_model(source) == quantized
+    assert calls == [str(source)]
+    assert sorted(p.name for p in source.parent.iterdir()) == ["model.onnx"]
+
+
+def test_onnx_int8_backend_parity_with_reference_model():
+    """Int8 ONNX vectors stay within a small cosine drift of the FP32 reference model."""
+    pytest.importorskip("FlagEmbedding")
+    pytest.importorskip("onnx")
+    from rag import embeddings
+
+    texts = [
+        "Graph neural networks for molecular property prediction",
+        "Title: Attention Is All You Need\nAbstract: We propose the Transformer, based solely on attention.",
+        "Effects of intermittent fasting on insulin sensitivity in adults",
+    ]
+    reference = embeddings.BGEM3Embeddings(use_fp16=False).embed_documents(texts, doc_type="abstract")
+    quantized = embeddings.ONNXBGEM3Embeddings(quantize=True).embed_documents(texts, doc_type="abstract")
+
+    for ref, quant in zip(reference, quantized):
+        cosine = float(np.dot(ref, quant) / (np.linalg.norm(ref) * np.linalg.norm(quant)))
+        assert cosine >= 0.98
+
+
+def test_async_search_runs_off_the_event_loop(vector_store):
+    """Concurrent asearch calls overlap instead of queueing behind each other."""
+    vector_store.add_papers(make_papers("async", 3))
+    manager = vector_store.embedding_manager
+    embed_query = manager.embed_query
+
+    def slow_embed_query(text):
+        time.sleep(0.3)
+        return embed_query(text)
+
+    manager.embed_query = slow_embed_query
+
+    async def run():
+        started = time.monotonic()
+        results = await asyncio.gather(*(vector_store.asearch("About async 1", n_results=2) for _ in range(3)))
+        return results, time.monotonic() - started
+
+    results, elapsed = asyncio.run(run())
+    assert elapsed < 0.8
+    assert all(r == vector_store.search("About async 1", n_results=2) for r in results)
+
+
+def test_aget_context_for_query_reflects_asynchronously(monkeypatch, vector_store):
+    """The async Retrieve-Reflect-Retry loop reformulates and retries like the sync one."""
+    from langchain_core.language_models.fake_chat_models import FakeListChatModel
+    from rag.retriever import RetrieveReflectRetryRAG, RetrievalStatus
+
+    monkeypatch.setattr(settings, "openai_api_key", "sk-test")
+    monkeypatch.setattr(settings, "rag_fast_path_enabled", False)
+    vector_store.add_papers(make_papers("reflect", 3))
+    rag = RetrieveReflectRetryRAG(vector_store, field="test")
+    rag._llm = FakeListChatModel(responses=[
+        '{"is_sufficient": false, "explanation": "too broad", "reformulated_query": "About reflect 2"}',
+        '{"is_sufficient": true, "explanation": "ok"}',
+    ])
+
+    result = asyncio.run(rag.aretrieve("reflect papers", n_results=2))
+    assert result.status == RetrievalStatus.SUCCESS
+    assert result.attempt == 2
+    assert vector_store.embedding_manager.queries == ["reflect papers", "About reflect 2"]
+
+    # The sync loop takes the same steps
+    rag._llm = FakeListChatModel(responses=[
+        '{"is_sufficient": false, "explanation": "too broad", "reformulated_query": "About reflect 2"}',
+        '{"is_sufficient": true, "explanation": "ok"}',
+    ])
+    assert rag.retrieve("reflect papers", n_results=2) == result
+
+    # Documents retrieved elsewhere get the same confidence policy
+    assert rag.result_from_documents("reflect papers", result.documents).confidence == result.confidence
+    assert rag.result_from_documents("reflect papers", result.documents[:1]).confidence == 0.5
+
+    rag._llm = FakeListChatModel(responses=['{"is_sufficient": true, "explanation": "ok"}'])
+    context, papers, confidence = asyncio.run(rag.aget_context_for_query("About reflect 0"))
+    assert "About reflect 0" in context
+    assert confidence == 0.9
+    assert papers
+
+
+def test_heuristic_fast_path_skips_clear_cut_reflections(monkeypatch):
+    """Clearly good or bad retrievals are judged without the LLM; only ambiguous ones escalate."""
+    from rag.retriever import RetrieveReflectRetryRAG, ReflectionResult, RetrievalStatus
+
+    def docs(similarity, content, count=3):
+        return [{"id": f"d{i}", "content": content, "metadata": {}, "similarity": similarity} for i in range(count)]
+
+    class ScriptedStore:
+        def __init__(self, rounds):
+            self.rounds = list(rounds)
+
+        def search(self, query, n_results=10):
+            return self.rounds.pop(0)
+
+    monkeypatch.setattr(settings, "openai_api_key", "sk-test")
+    relevant = "Transformer attention for protein structure prediction"
+    store = ScriptedStore([docs(0.2, "Medieval poetry and rhyme"), docs(0.8, relevant), docs(0.5, relevant)])
+    rag = RetrieveReflectRetryRAG(store, field="test")
+    reflections = []
+
+    def reflect(query, documents):
+        reflections.append(query)
+        return ReflectionResult(is_sufficient=True, explanation="LLM says ok")
+
+    monkeypatch.setattr(rag, "_reflect", reflect)
+    monkeypatch.setattr(rag, "_reformulate_query", lambda query, feedback: "protein structure transformer attention")
+
+    # Rejected without the LLM, reformulated, then accepted without the LLM
+    result = rag.retrieve("attention models for protein structure")
+    assert result.status == RetrievalStatus.SUCCESS
+    assert result.attempt == 2
+    assert result.reflection.startswith("Heuristic accept")
+    assert reflections == []
+
+    # Middling similarity is escalated to the LLM
+    result = rag.retrieve("attention models for protein structure")
+    assert reflections == ["attention models for protein structure"]
+    assert rag.get_stats() == {"fast_accepts": 1, "fast_rejects": 1, "escalations": 1, "llm_calls_saved": 2}
+
+
+def test_multi_search_fuses_variants_in_one_query(vector_store):
+    """Query variants are embedded in one batch, queried together and merged by RRF."""
+    papers = {p.id: p for p in make_papers("alpha", 3) + make_papers("omega", 3)}
+    vector_store.add_papers(list(papers.values()))
+    manager = vector_store.embedding_manager
+    manager.document_batches.clear()
+    calls = []
+    query = vector_store._collection.query
+
+    def counting_query(**kwargs):
+        calls.append(len(kwargs["query_embeddings"]))
+        return query(**kwargs)
+
+    vector_store._collection.query = counting_query
+    variants = [VectorStore.paper_to_document(papers[i])[0] for i in ("alpha_1", "omega_2")]
+    results = vector_store.multi_search(variants, n_results=4)
+
+    assert manager.document_batches == [2]
+    assert manager.doc_types[-1] == "query"
+    assert calls == [2]
+    ids = [r["id"] for r in results]
+    assert len(ids) == len(set(ids)) == 4
+    assert {"alpha_1", "omega_2"} <= set(ids)
+    assert results == sorted(results, key=lambda r: r["rrf_score"], reverse=True)
+    assert asyncio.run(vector_store.amulti_search(variants, n_results=4)) == results
+
+    # A document ranked well by several variants beats one ranked first by a single variant
+    fused = VectorStore.fuse_rankings(
+        [[{"id": "a"}, {"id": "b"}], [{"id": "c"}, {"id": "b"}], [{"id": "b"}]], n_results=3, rrf_k=1
+    )
+    assert [r["id"] for r in fused] == ["b", "a", "c"]
+
+
+def test_hybrid_search_surfaces_exact_terms(monkeypatch, tmp_path):
+    """BM25 scores lift exact-term matches that dense similarity ranks last; old collections are backfilled."""
+    from rag.chroma_client import list_collection_names
+
+    monkeypatch.setattr(settings, "rag_sparse_index_enabled", False)
+    persist_directory = str(tmp_path / "chroma")
+    papers = make_papers("filler", 30) + [
+        Paper(id="gene", title="Tumour suppressor study", abstract="Loss of BRCA1 function in breast cancer cohorts", source="test")
+    ]
+    VectorStore("hybrid_test", persist_directory=persist_directory, embedding_manager=FakeEmbeddingManager()).add_papers(papers)
+
+    monkeypatch.setattr(settings, "rag_sparse_index_enabled", True)
+    store = VectorStore("hybrid_test", persist_directory=persist_directory, embedding_manager=FakeEmbeddingManager())
+    dense = store.search("brca1 zzz", n_results=31, hybrid=False)
+    assert dense[-1]["id"] == "gene"
+
+    hybrid = store.search("brca1 zzz", n_results=3, hybrid=True)
+    assert hybrid[0]["id"] == "gene"
+    assert hybrid[0]["bm25_score"] > 0
+    assert hybrid[1]["bm25_score"] == 0
+    assert store._sparse.count == 31
+
+    # The index follows deletes
+    store.delete_document("gene")
+    assert store.search("brca1 zzz", n_results=1, hybrid=True)[0]["id"] != "gene"
+
+    # Clearing the collection drops the index file; a fresh one is opened on the next write
+    index_path = store._sparse.path
+    store.clear()
+    assert not os.path.exists(index_path)
+    store.add_papers(make_papers("after", 2))
+    assert store._sparse.count == 2
+
+    # Per-session temp collections and shared servers are never indexed
+    temp = VectorStore("temp_kg_session", persist_directory=persist_directory, embedding_manager=FakeEmbeddingManager())
+    assert temp._sparse is None
+    temp.drop()
+    assert "temp_kg_session" not in list_collection_names(persist_directory)
+    monkeypatch.setattr(settings, "chroma_server_host", "localhost")
+    assert store._sparse is None
+
+
+def test_hybrid_search_reaches_multi_query_retrieval(monkeypatch, tmp_path):
+    """With query variants (the default agent path), hybrid mode still surfaces keyword-only matches."""
+    from rag.retriever import ReflectionResult, RetrieveReflectRetryRAG
+
+    monkeypatch.setattr(settings, "openai_api_key", "sk-test")
+    monkeypatch.setattr(settings, "rag_fast_path_enabled", False)
+    monkeypatch.setattr(settings, "rag_multi_query_enabled", True)
+    monkeypatch.setattr(settings, "rag_sparse_index_enabled", True)
+    monkeypatch.setattr(settings, "rag_hybrid_search", True)
+    monkeypatch.setattr(settings, "rag_search_cache_enabled", True)
+    store = VectorStore("hybrid_multi_test", persist_directory=str(tmp_path / "chroma"), embedding_manager=FakeEmbeddingManager())
+    store.add_papers(make_papers("filler", 30) + [
+        Paper(id="gene", title="Tumour suppressor study", abstract="Loss of BRCA1 function in breast cancer cohorts", source="test")
+    ])
+    rag = RetrieveReflectRetryRAG(store, field="test")
+
+    async def sufficient(query, documents):
+        return ReflectionResult(is_sufficient=True, explanation="ok")
+
+    monkeypatch.setattr(rag, "_areflect", sufficient)
+
+    # Base agents pass [base_query] as their specialized queries
+    result = asyncio.run(rag.aretrieve("brca1 zzz", n_results=3, query_variants=["brca1 zzz"]))
+    assert result.documents[0]["id"] == "gene"
+
+    # Cached multi-query results are kept apart per mode
+    dense = store.multi_search(["brca1 zzz"], n_results=3, hybrid=False)
+    assert "gene" not in [r["id"] for r in dense]
+
+
+def test_retrieve_reranks_over_fetched_candidates_within_token_budget(monkeypatch):
+    """With a reranker, retrieval over-fetches, reorders by rerank score and cuts to n_results and the token budget."""
+    from rag.reranker import BaseReranker
+    from rag.retriever import ReflectionResult, RetrieveReflectRetryRAG
+
+    class KeywordReranker(BaseReranker):
+        def score(self, query, documents):
+            return [float(doc.count("protein")) for doc in documents]
+
+    class RecordingStore:
+        def __init__(self):
+            self.requested = []
+
+        def search(self, query, n_results=10):
+            self.requested.append(n_results)
+            return [
+                {"id": f"d{i}", "content": "protein " * i + "x" * 40, "metadata": {}, "similarity": 1.0 - i / 10}
+                for i in range(n_results)
+            ]
+
+        async def asearch(self, query, n_results=10):
+            return self.search(query, n_results)
+
+    monkeypatch.setattr(settings, "openai_api_key", "sk-test")
+    monkeypatch.setattr(settings, "rag_fast_path_enabled", False)
+    monkeypatch.setattr(settings, "rag_rerank_candidates", 6)
+    monkeypatch.setattr(settings, "rag_context_token_budget", 0)
+    monkeypatch.setattr("rag.retriever.get_reranker", lambda: KeywordReranker())
+    store = RecordingStore()
+    rag = RetrieveReflectRetryRAG(store, field="test")
+    monkeypatch.setattr(rag, "_reflect", lambda query, documents: ReflectionResult(is_sufficient=True, explanation="ok"))
+
+    result = rag.retrieve("protein folding", n_results=3)
+    assert store.requested == [6]
+    assert [doc["id"] for doc in result.documents] == ["d5", "d4", "d3"]
+    assert result.documents[0]["rerank_score"] == 5.0
+
+    # A tight budget keeps fewer (but always at least one) documents
+    monkeypatch.setattr(settings, "rag_context_token_budget", 40)
+    result = asyncio.run(rag.aretrieve("protein folding", n_results=3))
+    assert [doc["id"] for doc in result.documents] == ["d5", "d4"]
+    monkeypatch.setattr(settings, "rag_context_token_budget", 1)
+    assert [doc["id"] for doc in rag.retrieve("protein folding", n_results=3).documents] == ["d5"]
+
+
+def test_search_cache_hits_until_the_collection_changes(monkeypatch, vector_store):
+    """Repeat searches skip embedding and querying; any write to the collection invalidates them."""
+    monkeypatch.setattr(settings, "rag_search_cache_enabled", True)
+    vector_store.add_papers(make_papers("cache", 3))
+    manager = vector_store.embedding_manager
+
+    first = vector_store.search("About cache 1", n_results=2)
+    first[0]["rerank_score"] = 1.0
+    first[0]["metadata"]["annotated"] = True
+    again = vector_store.search("  about CACHE 1 ", n_results=2)
+    assert manager.queries == ["About cache 1"]
+    assert "rerank_score" not in again[0]
+    assert "annotated" not in again[0]["metadata"]
+    assert [r["id"] for r in again] == [r["id"] for r in first]
+
+    # Different arguments are cached separately
+    vector_store.search("About cache 1", n_results=3)
+    assert len(manager.queries) == 2
+
+    # Writes bump the collection version
+    vector_store.add_papers(make_papers("fresh", 1))
+    assert "fresh_0" in [r["id"] for r in vector_store.search("About fresh 0", n_results=4)]
+    vector_store.search("About cache 1", n_results=2)
+    assert len(manager.queries) == 4
+    vector_store.delete_document("fresh_0")
+    assert "fresh_0" not in [r["id"] for r in asyncio.run(vector_store.asearch("About fresh 0", n_results=4))]
+
+    # Another store on the same collection shares the cache and its invalidation
+    vector_store.search("About cache 1", n_results=2)
+    assert len(manager.queries) == 6
+    other = VectorStore("test_collection", persist_directory=vector_store.persist_directory,
+                        embedding_manager=FakeEmbeddingManager())
+    other.search("About cache 1", n_results=2)
+    assert other.embedding_manager.queries == []
+    other.add_papers(make_papers("late", 1))
+    vector_store.search("About cache 1", n_results=2)
+    assert len(manager.queries) == 7
+
+    # Versions are per process, so a shared server is never cached
+    from rag.search_cache import get_search_cache
+    monkeypatch.setattr(settings, "chroma_server_host", "chroma.internal")
+    assert get_search_cache() is None
+
+
+def test_federated_search_embeds_once_and_applies_field_quotas(tmp_path):
+    """One query embedding is shared across field collections; results merge by similarity under per-field caps."""
+    from rag.federated_search import afederated_search, afederated_search_papers, federated_search, field_stores
+
+    manager = FakeEmbeddingManager()
+    stores = field_stores(["biology", "physics", "chemistry"], manager, persist_directory=str(tmp_path / "chroma"))
+    stores["biology"].add_papers(make_papers("cell", 4))
+    stores["physics"].add_papers(make_papers("quark", 4))
+
+    results = federated_search("About cell 2", stores, n_results=5, per_field=2)
+    assert manager.queries == ["About cell 2"]
+    assert [r["field"] for r in results] == ["biology", "biology", "physics", "physics"]
+    assert results[0]["id"] == "cell_2"
+    assert results == sorted(results, key=lambda r: r["similarity"], reverse=True)
+
+    # The quota caps a dominant field; n_results caps the merged list
+    assert len(federated_search("About cell 2", stores, n_results=3, per_field=4)) == 3
+    assert asyncio.run(afederated_search("About cell 2", stores, n_results=5, per_field=2)) == results
+
+    papers = asyncio.run(afederated_search_papers("About quark 1", stores, n_results=2, per_field=1))
+    assert papers[0][0].id == "quark_1"
+    assert papers[0][0].relevance_score == papers[0][1]
+
+
+def test_existing_field_stores_are_cached_and_skip_unseeded_fields(monkeypatch, tmp_path):
+    """The default federated stores cover only collections that exist and are built once."""
+    from rag import federated_search as federated
+
+    directory = str(tmp_path / "chroma")
+    monkeypatch.setattr(settings, "chroma_persist_directory", directory)
+    monkeypatch.setattr(federated, "EmbeddingManager", FakeEmbeddingManager)
+    federated.reset_field_stores()
+    try:
+        federated.field_stores(["biology"], FakeEmbeddingManager())["biology"].add_papers(make_papers("cell", 2))
+
+        stores = federated.existing_field_stores()
+        assert list(stores) == ["biology"]
+        assert federated.existing_field_stores()["biology"] is stores["biology"]
+        assert federated.federated_search("About cell 1", n_results=1)[0]["id"] == "cell_1"
+
+        from rag.chroma_client import list_collection_names
+        assert sorted(list_collection_names(directory)) == ["rag_biology"]
+    finally:
+        federated.reset_field_stores()
@@ -0,0 +1,43 @@
+import pytest
+
+from tools.web_search import get_research_toolkit, reset_research_toolkit
+from tools.http_client import get_tool_transport
+
+
+@pytest.fixture
+def toolkit():
+    """Fresh shared toolkit."""
+    reset_research_toolkit()
+    yield get_research_toolkit()
+    reset_research_toolkit()
+
+
+def test_toolkit_is_shared_with_per_field_views(toolkit):
+    """Agents share one toolkit; field views reuse the same tool objects."""
+    assert get_research_toolkit() is toolkit
+
+    physics = toolkit.get_tools_for_field("physics")
+    ai_ml = toolkit.get_tools_for_field("ai_ml")
+    medicine = toolkit.get_tools_for_field("medicine")
+
+    assert [t.name for t in physics] == [t.name for t in ai_ml]
+    assert all(a is b for a, b in zip(physics, ai_ml))
+    assert "pubmed_search" in {t.name for t in medicine}
+    assert "arxiv_search" not in {t.name for t in medicine}
+    assert physics[0] is medicine[0]
+
+    # Views are copies, so an agent can extend its own list
+    physics.append("custom")
+    assert "custom" not in toolkit.get_tools_for_field("physics")
+
+
+def test_tool_clients_share_one_pool(toolkit):
+    """HTTP-backed tools keep their own settings but share the pooled transport."""
+    transport = get_tool_transport()
+
+    assert toolkit.semantic_scholar._client._transport is transport
+    assert toolkit.web._client._transport is transport
+    assert toolkit.web._client.timeout.read == 30.0
+    if toolkit.url_context:
+        assert toolkit.url_context._client._transport is transport
+        assert toolkit.url_context._client.follow_redirects
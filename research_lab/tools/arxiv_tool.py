@@ -2,6 +2,7 @@
 
 from typing import List, Optional
 from datetime import datetime
+import threading
 import arxiv
 
 from langchain_core.tools import tool
@@ -35,6 +36,9 @@ class ArxivSearchTool:
         """
         self.max_results = max_results or settings.arxiv_max_results
         self.client = arxiv.Client()
+        # arxiv.Client paces its requests but is not thread-safe; the
+        # toolkit shares one instance across agents, so serialize searches
+        self._lock = threading.Lock()
     
     def search(
         self,
@@ -77,8 +81,11 @@ class ArxivSearchTool:
             sort_by=sort_criterion
         )
         
+        with self._lock:
+            results = list(self.client.results(search))
+        
         papers = []
-        for result in self.client.results(search):
+        for result in results:
             paper = Paper(
                 id=result.entry_id,
                 title=result.title,
@@ -136,7 +143,8 @@ class ArxivSearchTool:
         """
         search = arxiv.Search(id_list=[arxiv_id])
         
-        results = list(self.client.results(search))
+        with self._lock:
+            results = list(self.client.results(search))
         if results:
             result = results[0]
             return Paper(
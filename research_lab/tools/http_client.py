@@ -0,0 +1,63 @@
+"""Shared, pooled HTTP transport for research tools."""
+
+from typing import Any, Optional
+import threading
+
+import httpx
+
+from config.settings import settings
+
+_transport: Optional[httpx.HTTPTransport] = None
+_transport_lock = threading.Lock()
+
+
+def get_tool_transport() -> httpx.HTTPTransport:
+    """Create (once) the connection pool shared by every research tool."""
+    global _transport
+    
+    with _transport_lock:
+        if _transport is None:
+            limits = httpx.Limits(
+                max_connections=settings.tool_max_connections,
+                max_keepalive_connections=settings.tool_max_keepalive_connections,
+                keepalive_expiry=settings.tool_keepalive_expiry
+            )
+            _transport = httpx.HTTPTransport(limits=limits, retries=1)
+        return _transport
+
+
+def create_tool_client(**kwargs: Any) -> httpx.Client:
+    """
+    Create a lightweight httpx.Client over the shared tool transport.
+    
+    Each tool keeps its own timeout, headers and redirect policy, but all of
+    them reuse one thread-safe connection pool. Never close these clients:
+    closing a client closes the shared transport.
+    
+    Args:
+        **kwargs: httpx.Client options (timeout, headers, follow_redirects, ...)
+    """
+    return httpx.Client(transport=get_tool_transport(), **kwargs)
+
+
+def get_tool_pool_stats() -> dict:
+    """Get connection counts for the shared tool pool."""
+    if _transport is None:
+        return {"connections": 0, "idle_connections": 0, "active_connections": 0}
+    
+    total = idle = 0
+    for connection in _transport._pool.connections:
+        total += 1
+        if connection.is_idle():
+            idle += 1
+    return {"connections": total, "idle_connections": idle, "active_connections": total - idle}
+
+
+def reset_tool_transport():
+    """Close the shared tool pool (used on shutdown and in tests)."""
+    global _transport
+    
+    with _transport_lock:
+        if _transport is not None:
+            _transport.close()
+            _transport = None
@@ -2,7 +2,6 @@
 
 from typing import Optional, Dict, Any
 import io
-import httpx
 from pathlib import Path
 
 try:
@@ -16,6 +15,7 @@ from langchain_core.tools import tool
 from pydantic import BaseModel, Field
 
 from config.settings import settings
+from .http_client import create_tool_client
 
 
 class PDFReaderInput(BaseModel):
@@ -39,7 +39,7 @@ class PDFReaderTool:
             raise ImportError(
                 "PyMuPDF is not installed. Install it with: pip install pymupdf"
             )
-        self._client = httpx.Client(timeout=60.0, follow_redirects=True)
+        self._client = create_tool_client(timeout=60.0, follow_redirects=True)
     
     def read_pdf(
         self,
@@ -188,9 +188,3 @@ class PDFReaderTool:
             return f"{metadata}\n\n{text}"
         
         return read_pdf
-    
-    def __del__(self):
-        """Clean up HTTP client."""
-        if hasattr(self, '_client'):
-            self._client.close()
-
@@ -2,7 +2,6 @@
 
 from typing import List, Optional, Dict, Any
 from datetime import datetime
-import httpx
 from tenacity import retry, stop_after_attempt, wait_exponential
 
 from langchain_core.tools import tool
@@ -10,6 +9,7 @@ from pydantic import BaseModel, Field
 
 from states.agent_state import Paper
 from config.settings import settings
+from .http_client import create_tool_client
 
 
 class SemanticScholarTool:
@@ -30,7 +30,7 @@ class SemanticScholarTool:
             max_results: Default maximum results per search
         """
         self.max_results = max_results or settings.semantic_scholar_max_results
-        self._client = httpx.Client(timeout=30.0)
+        self._client = create_tool_client(timeout=30.0)
     
     @retry(stop=stop_after_attempt(3), wait=wait_exponential(min=1, max=10))
     def search(
@@ -314,9 +314,3 @@ class SemanticScholarTool:
             return result
         
         return semantic_scholar_search
-    
-    def __del__(self):
-        """Cleanup HTTP client."""
-        if hasattr(self, '_client'):
-            self._client.close()
-
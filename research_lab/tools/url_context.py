@@ -5,7 +5,6 @@ with fallback to web scraping + LLM processing for other providers (DeepSeek, Op
 """
 
 from typing import Optional, Dict, Any, List
-import httpx
 from urllib.parse import urlparse
 
 try:
@@ -53,6 +52,7 @@ from langchain_core.output_parsers import StrOutputParser
 from pydantic import BaseModel, Field
 
 from config.settings import settings
+from .http_client import create_tool_client
 
 
 class URLContextInput(BaseModel):
@@ -97,7 +97,7 @@ class URLContextTool:
             "Connection": "keep-alive",
             "Upgrade-Insecure-Requests": "1"
         }
-        self._client = httpx.Client(timeout=30.0, follow_redirects=True, headers=headers)
+        self._client = create_tool_client(timeout=30.0, follow_redirects=True, headers=headers)
         self.gemini_api_key = gemini_api_key
         self._gemini_client = None
         self.use_llm_processing = use_llm_processing
@@ -114,14 +114,9 @@ class URLContextTool:
         # Initialize LLM for processing scraped content (DeepSeek/OpenAI)
         if self.use_llm_processing and LANGCHAIN_AVAILABLE:
             try:
-                llm_kwargs = {
-                    "model": settings.openai_model,
-                    "openai_api_key": settings.openai_api_key,
-                    "temperature": 0.3
-                }
-                if settings.openai_base_url:
-                    llm_kwargs["openai_api_base"] = settings.openai_base_url
-                self._llm = ChatOpenAI(**llm_kwargs)
+                # Shared, pooled client from the LLM registry
+                from agents.llm import get_llm
+                self._llm = get_llm(temperature=0.3, call_site="url_context")
             except Exception:
                 # LLM not configured
                 self._llm = None
@@ -654,9 +649,3 @@ Provide a clear, structured summary of the main information.""")
             return f"{header}\n\n{content}"
         
         return extract_url_content
-    
-    def __del__(self):
-        """Clean up HTTP client."""
-        if hasattr(self, '_client'):
-            self._client.close()
-
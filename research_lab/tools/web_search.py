@@ -2,12 +2,14 @@
 
 from typing import List, Optional, Dict, Any
 from dataclasses import dataclass
+import threading
 import httpx
 from tenacity import retry, stop_after_attempt, wait_exponential
 
 from langchain_core.tools import tool
 
 from config.settings import settings
+from .http_client import create_tool_client
 
 
 @dataclass
@@ -38,7 +40,7 @@ class WebSearchTool:
             api_key: Tavily API key (defaults to settings)
         """
         self.api_key = api_key or settings.tavily_api_key
-        self._client = httpx.Client(timeout=30.0)
+        self._client = create_tool_client(timeout=30.0)
     
     @retry(stop=stop_after_attempt(3), wait=wait_exponential(min=1, max=10))
     def search(
@@ -193,11 +195,6 @@ class WebSearchTool:
             return output
         
         return web_search
-    
-    def __del__(self):
-        """Cleanup HTTP client."""
-        if hasattr(self, '_client'):
-            self._client.close()
 
 
 class ResearchToolkit:
@@ -205,8 +202,14 @@ class ResearchToolkit:
     Combined toolkit with all research tools.
     
     Provides a unified interface for all research search capabilities.
+    Use get_research_toolkit() to share one instance (and its pooled
+    connections, Gemini client and LLM) across every agent in the process.
     """
     
+    # Fields served by each field-specific search tool
+    ARXIV_FIELDS = ["ai_ml", "physics", "mathematics", "computer_science"]
+    PUBMED_FIELDS = ["biology", "medicine", "neuroscience", "chemistry"]
+    
     def __init__(self):
         """Initialize all research tools."""
         from .arxiv_tool import ArxivSearchTool
@@ -231,46 +234,80 @@ class ResearchToolkit:
             # URL context tool not available
             self.url_context = None
     
+        # LangChain tool wrappers are built once and shared by every field view
+        self._langchain_tools: Dict[str, Any] = {}
+        self._field_tools: Dict[str, tuple] = {}
+        self._lock = threading.Lock()
+    
+    def _tool(self, name: str):
+        """Get the cached LangChain wrapper for a tool attribute."""
+        if name not in self._langchain_tools:
+            self._langchain_tools[name] = getattr(self, name).as_langchain_tool()
+        return self._langchain_tools[name]
+    
     def get_tools_for_field(self, field: str) -> List:
         """
         Get appropriate tools for a research field.
         
+        The tool objects are shared across agents; each call returns a new
+        list, so callers may append their own tools.
+        
         Args:
             field: Research field
             
         Returns:
             List of LangChain tools
         """
-        tools = []
+        with self._lock:
+            if field not in self._field_tools:
+                # All fields get web search, PDF reader, and URL context
+                names = ["web"]
+                if self.pdf_reader:
+                    names.append("pdf_reader")
+                if self.url_context:
+                    names.append("url_context")
         
-        # All fields get web search, PDF reader, and URL context
-        tools.append(self.web.as_langchain_tool())
-        if self.pdf_reader:
-            tools.append(self.pdf_reader.as_langchain_tool())
-        if self.url_context:
-            tools.append(self.url_context.as_langchain_tool())
+                # Field-specific tools
+                if field in self.ARXIV_FIELDS:
+                    names.extend(["arxiv", "semantic_scholar"])
         
-        # Field-specific tools
-        if field in ["ai_ml", "physics", "mathematics", "computer_science"]:
-            tools.append(self.arxiv.as_langchain_tool())
-            tools.append(self.semantic_scholar.as_langchain_tool())
+                if field in self.PUBMED_FIELDS:
+                    names.extend(["pubmed", "semantic_scholar"])
         
-        if field in ["biology", "medicine", "neuroscience", "chemistry"]:
-            tools.append(self.pubmed.as_langchain_tool())
-            tools.append(self.semantic_scholar.as_langchain_tool())
-        
-        return tools
+                self._field_tools[field] = tuple(self._tool(name) for name in names)
+            
+            return list(self._field_tools[field])
     
     def get_all_tools(self) -> List:
         """Get all available tools."""
-        tools = [
-            self.arxiv.as_langchain_tool(),
-            self.semantic_scholar.as_langchain_tool(),
-            self.pubmed.as_langchain_tool(),
-            self.web.as_langchain_tool()
-        ]
+        names = ["arxiv", "semantic_scholar", "pubmed", "web"]
         if self.pdf_reader:
-            tools.append(self.pdf_reader.as_langchain_tool())
+            names.append("pdf_reader")
         if self.url_context:
-            tools.append(self.url_context.as_langchain_tool())
-        return tools
+            names.append("url_context")
+        with self._lock:
+            return [self._tool(name) for name in names]
+
+
+_toolkit: Optional[ResearchToolkit] = None
+_toolkit_lock = threading.Lock()
+
+
+def get_research_toolkit() -> ResearchToolkit:
+    """Get the process-wide ResearchToolkit (created on first use)."""
+    global _toolkit
+    
+    with _toolkit_lock:
+        if _toolkit is None:
+            _toolkit = ResearchToolkit()
+        return _toolkit
+
+
+def reset_research_toolkit():
+    """Drop the shared toolkit and close the pooled tool connections (used in tests)."""
+    global _toolkit
+    from .http_client import reset_tool_transport
+    
+    with _toolkit_lock:
+        _toolkit = None
+    reset_tool_transport()
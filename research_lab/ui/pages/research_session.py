@@ -3,6 +3,7 @@
 import streamlit as st
 from typing import Optional, Dict, Any
 from datetime import datetime
+import time
 
 from ui.components import (
     render_sidebar,
@@ -277,12 +278,25 @@ def render_research_session_page():
                             st.write("Routing query to domain experts...")
                             st.write("Searching academic databases...")
                         
+                        # Render the synthesis as it streams in (throttled redraws)
+                        synthesis_placeholder = st.empty()
+                        streamed = {"text": "", "last_render": 0.0}
+                        
+                        def on_synthesis_token(token: str):
+                            streamed["text"] += token
+                            now = time.monotonic()
+                            if now - streamed["last_render"] >= 0.15:
+                                streamed["last_render"] = now
+                                synthesis_placeholder.markdown(streamed["text"])
+                        
                         # Run the research
                         result = graph.run_sync(
                             query, 
                             thread_id=f"session_{datetime.now().timestamp()}",
-                            workflow_mode=workflow_mode
+                            workflow_mode=workflow_mode,
+                            on_synthesis_token=on_synthesis_token
                         )
+                        synthesis_placeholder.empty()
                         
                         st.write("Synthesizing findings...")
                         